@@ -10,22 +10,26 @@
 
 import time
 
-from multiprocessing import Process, Manager
-
 from pysmt.shortcuts import And, Or, Solver, TRUE, FALSE, Not, EqualsOrIff, Implies, Iff, Symbol, BOOL, simplify
 from pysmt.shortcuts import Interpolator
 from pysmt.oracles import get_logic
 
 from cosa.utils.logger import Logger
-from cosa.utils.formula_mngm import substitute, get_free_variables
+from cosa.utils.formula_mngm import substitute, get_free_variables, to_portable, from_portable
 from cosa.utils.generic import status_bar
+from cosa.utils.profiler import dag_size
 from cosa.representation import TS, HTS
 
 from cosa.problem import VerificationStatus
 from cosa.analyzers.mcsolver import TraceSolver, BMCSolver, VerificationStrategy
+from cosa.analyzers.pdr import PDR
+from cosa.analyzers.portfolio import Portfolio
 
 FWDK = "FWD-K"
 
+PORTFOLIO_STRATEGIES = [VerificationStrategy.FWD, FWDK, VerificationStrategy.BWD, VerificationStrategy.ZZ, \
+                        VerificationStrategy.INT, VerificationStrategy.PDR]
+
 class BMCSafety(BMCSolver):
 
     hts = None
@@ -90,7 +94,7 @@ class BMCSafety(BMCSolver):
 
     def solve_safety(self, hts, prop, k, k_min=0, lemmas=None, processes=1):
         if lemmas is not None:
-            (hts, res) = self.add_lemmas(hts, prop, lemmas)
+            (hts, res) = self.add_lemmas(hts, prop, lemmas, processes)
             if res:
                 Logger.log("Lemmas imply the property", 1)
                 Logger.log("", 0, not(Logger.level(1)))
@@ -125,93 +129,82 @@ class BMCSafety(BMCSolver):
             Logger.warning("Multithreaded is not available in not incremental mode. Switching to incremental")
             return self.solve_safety_inc(hts, prop, k, 0)
 
+        if self.config.strategy == VerificationStrategy.PDR:
+            Logger.warning("PDR is not available in not incremental mode. Switching to incremental")
+            return self.solve_safety_inc(hts, prop, k, 0)
+
         Logger.error("Invalid configuration strategy")
 
         return None
 
-    def _run_as_process(self, function, name, ret, *args):
-        if ret is None: ret = {}
-        ret[name] = function(*args)
-
-    def _status_checker(self, status, threads):
-
-        terminated = 0
-
-        while True:
-            time.sleep(0.1)
-
-            if len(status.keys()) > terminated:
-                terminated = len(status.keys())
-                Logger.log("Solver done: %s"%(list(status.keys())), 1)
-
-            if (len(status.keys()) >= threads):
-                return False
-            if (status is not None) and (len(status.keys()) > 0):
-                (t, model) = [val for key,val in status.items() if val is not None][0]
-                if (model != None):
-                    return True
-
-    def solve_safety_inc(self, hts, prop, k, k_min, processes=1):
-        retdic = {}
-
-        if self.config.strategy == VerificationStrategy.MULTI:
-            solvers = []
-
+    def _portfolio_tasks(self, processes):
+        if self.config.portfolio is None:
             if self.config.prove:
-                active_workers = [FWDK, VerificationStrategy.INT, VerificationStrategy.BWD, VerificationStrategy.FWD]
+                strategies = [FWDK, VerificationStrategy.INT, VerificationStrategy.BWD, VerificationStrategy.FWD]
             else:
-                active_workers = [VerificationStrategy.FWD, VerificationStrategy.BWD]
-
-            active_workers = active_workers[:min(processes, len(active_workers))]
-            workers = len(active_workers)
-
-            with Manager() as manager:
-                ret = manager.dict({})
-
-                # Forward
-                if VerificationStrategy.FWD in active_workers:
-                    Logger.log("Starting \"%s\""%(VerificationStrategy.FWD), 1)
-                    solvers.append(Process(target=self._run_as_process, \
-                                           args=(self.solve_safety_inc_fwd, VerificationStrategy.FWD, ret, \
-                                                 *[hts, prop, k, k_min, False, None, False])))
-
-                # Backward
-                if VerificationStrategy.BWD in active_workers:
-                    Logger.log("Starting \"%s\""%(VerificationStrategy.BWD), 1)
-                    solvers.append(Process(target=self._run_as_process, \
-                                           args=(self.solve_safety_inc_bwd, VerificationStrategy.BWD, ret, \
-                                                 *[hts, prop, k, False])))
-
-                # K-Induction
-                if FWDK in active_workers:
-                    Logger.log("Starting \"%s\""%(FWDK), 1)
-                    solvers.append(Process(target=self._run_as_process, \
-                                           args=(self.solve_safety_inc_fwd, FWDK, ret, \
-                                                 *[hts, prop, k, k_min, False, None, True])))
-
-
-                # Interpolation
-                if VerificationStrategy.INT in active_workers:
-                    Logger.log("Starting \"%s\""%(VerificationStrategy.INT), 1)
-                    solvers.append(Process(target=self._run_as_process, \
-                                           args=(self.solve_safety_inc_int, VerificationStrategy.INT, ret, \
-                                                 *[hts, prop, k])))
+                strategies = [VerificationStrategy.FWD, VerificationStrategy.BWD]
+
+            strategies = strategies[:max(1, min(processes, len(strategies)))]
+            return [(strategy, self.config.solver_name) for strategy in strategies]
+
+        tasks = []
+        for task in self.config.portfolio.split(","):
+            task = task.strip().split(":")
+            if (len(task) > 2) or (task[0] not in PORTFOLIO_STRATEGIES):
+                Logger.error("Invalid portfolio entry \"%s\", expecting <strategy>[:<solver>] with strategy in %s"\
+                             %(":".join(task), ", ".join(PORTFOLIO_STRATEGIES)))
+            tasks.append((task[0], task[1] if len(task) > 1 else self.config.solver_name))
+
+        return tasks
+
+    def _solve_portfolio_task(self, strategy, solver_name, hts, prop, k, k_min):
+        # executed by a forked worker, hence the solver can be replaced
+        # without affecting the parent process
+        if solver_name != self.solver.solver_name:
+            self.solver = TraceSolver(solver_name, self.solver.name, self.solver.logic, self.solver.incremental, \
+                                      self.solver.solver_options, self.solver.basename)
+
+        if strategy == VerificationStrategy.FWD:
+            (t, model) = self.solve_safety_inc_fwd(hts, prop, k, k_min, prove=False)
+        elif strategy == FWDK:
+            (t, model) = self.solve_safety_inc_fwd(hts, prop, k, k_min, prove=True)
+        elif strategy == VerificationStrategy.BWD:
+            (t, model) = self.solve_safety_inc_bwd(hts, prop, k)
+        elif strategy == VerificationStrategy.ZZ:
+            (t, model) = self.solve_safety_inc_zz(hts, prop, k)
+        elif strategy == VerificationStrategy.INT:
+            (t, model) = self.solve_safety_inc_int(hts, prop, k)
+        elif strategy == VerificationStrategy.PDR:
+            (t, model) = self.solve_safety_pdr(hts, prop, k)
+
+        if isinstance(model, dict):
+            # the models are returned as forward models, since the
+            # strategy of the parent is MULTI
+            if strategy == VerificationStrategy.BWD:
+                model = self._remap_model_bwd(hts.vars, model, t)
+            elif strategy == VerificationStrategy.ZZ:
+                model = self._remap_model_zz(hts.vars, model, t)
+
+            model = [(to_portable(var), to_portable(value)) for (var, value) in model.items()]
+
+        return (t, model)
 
-                # Monitoring of the status
-                status_checker = Process(target=self._status_checker, args=[ret, workers])
-
-
-                for solver in solvers:
-                    solver.start()
+    def solve_safety_inc(self, hts, prop, k, k_min, processes=1):
+        if self.config.strategy == VerificationStrategy.MULTI:
+            portfolio = Portfolio()
 
-                status_checker.start()
-                status_checker.join()
+            for (strategy, solver_name) in self._portfolio_tasks(processes):
+                name = strategy if solver_name == self.config.solver_name else "%s:%s"%(strategy, solver_name)
+                Logger.log("Starting \"%s\""%(name), 1)
+                portfolio.add_task(name, self._solve_portfolio_task, strategy, solver_name, hts, prop, k, k_min)
 
-                for solver in solvers:
-                    solver.terminate()
+            results = portfolio.run(lambda res: res[1] is not None)
 
-                for key,val in ret.items():
-                    retdic[key] = val
+            retdic = {}
+            for (name, (t, model)) in results:
+                if isinstance(model, list):
+                    model = dict([(from_portable(var), from_portable(value)) for (var, value) in model])
+                retdic[name] = (t, model)
 
             tru_res = [(key,val) for key,val in retdic.items() if (val is not None) and (val[1] is not None) and (val[1] == True)]
             fal_res = [(key,val) for key,val in retdic.items() if (val is not None) and (val[1] is not None) and (val[1] != True)]
@@ -231,11 +224,6 @@ class BMCSafety(BMCSolver):
 
             Logger.msg("(%s)"%(winning[0]), 0, not(Logger.level(1)))
 
-            # TODO: figure out a better way to handle this
-            #       config object is not settable anymore
-            # if winning[0] == VerificationStrategy.BWD:
-            #     self.config.strategy = VerificationStrategy.BWD
-
             return winning[1]
 
         if self.config.strategy == VerificationStrategy.ALL:
@@ -266,6 +254,9 @@ class BMCSafety(BMCSolver):
         if self.config.strategy == VerificationStrategy.INT:
             return self.solve_safety_inc_int(hts, prop, k)
 
+        if self.config.strategy == VerificationStrategy.PDR:
+            return self.solve_safety_pdr(hts, prop, k)
+
         Logger.error("Invalid configuration strategy")
 
         return None
@@ -436,6 +427,9 @@ class BMCSafety(BMCSolver):
 
         return (t-1, None)
 
+    def solve_safety_pdr(self, hts, prop, k):
+        return PDR(self, hts).solve(prop, k)
+
     def solve_safety_fwd(self, hts, prop, k, k_min):
         init = hts.single_init()
         trans = hts.single_trans()
@@ -783,12 +777,26 @@ class BMCSafety(BMCSolver):
         return (t-1, None)
 
     def solve_safety_inc_zz(self, hts, prop, k):
+        '''
+        Bidirectional BMC: the forward unrolling (from the initial states)
+        and the backward one (from the negated property) are extended
+        independently on the same solver, and at each step a query checks
+        whether they meet, i.e., whether the last forward state is equal to
+        the last backward one. Only the meeting equality is popped, hence
+        the frames and what the solver learned on them are kept.
+
+        The side to extend is the one whose last extension led to the
+        cheaper meeting query, breaking ties with the size of the unrolled
+        formulae. The length of a counterexample is the sum of the two depths
+        '''
+
         solver = self.solver.copy("inc_zz")
 
         self._reset_assertions(solver)
 
-        if TS.has_next(prop):
-            Logger.error("Invariant checking with next variables only supports FWD strategy")
+        has_next = TS.has_next(prop)
+        if has_next:
+            prop = TS.to_prev(prop)
 
         init = hts.single_init()
         trans = hts.single_trans()
@@ -802,41 +810,57 @@ class BMCSafety(BMCSolver):
         Logger.log("Add property pat_%d"%0, 2)
         self._add_assertion(solver, propt)
 
-        t = 0
-        while (t < k+1):
-            self._push(solver)
-            even = (t % 2) == 0
-            th = int(t/2)
+        # depth, size of the unrolled formulae, and time of the last
+        # meeting query of the forward and backward unrollings
+        (fwd, bwd) = (0, 1)
+        depth = [0, 0]
+        size = [dag_size(initt), dag_size(propt)]
+        cost = [0.0, 0.0]
+        last = None
 
-            if even:
-                eq = And([EqualsOrIff(self.at_time(v, th), self.at_ptime(v, th-1)) for v in hts.vars])
-            else:
-                eq = And([EqualsOrIff(self.at_time(v, th+1), self.at_ptime(v, th-1)) for v in hts.vars])
+        while True:
+            (f, b) = depth
+            t = f+b
 
-            Logger.log("Add equivalence time %d"%t, 2)
-            self._add_assertion(solver, eq)
+            if (not has_next) or (b > 0):
+                self._push(solver)
+                eq = And([EqualsOrIff(self.at_time(v, f), self.at_ptime(v, b-1)) for v in hts.vars])
+                Logger.log("Add equivalence time %d (forward %d, backward %d)"%(t, f, b), 2)
+                self._add_assertion(solver, eq, "Meeting")
+
+                start = time.time()
+                res = self._solve(solver)
+                if last is not None:
+                    cost[last] = time.time()-start
+
+                if res:
+                    Logger.log("Counterexample found with k=%s"%(t), 1)
+                    model = self._get_model(solver)
+                    self.zz_forward = f
+                    return (t, model)
 
-            if self._solve(solver):
-                Logger.log("Counterexample found with k=%s"%(t), 1)
-                model = self._get_model(solver)
-                return (t, model)
-            else:
                 Logger.log("No counterexample found with k=%s"%(t), 1)
                 Logger.msg(".", 0, not(Logger.level(1)))
+                self._pop(solver)
 
-            self._pop(solver)
+            if t >= k:
+                break
 
-            if even:
-                trans_t = self.unroll(trans, invar, th+1, th)
+            if has_next and (b == 0):
+                last = bwd
             else:
-                trans_t = self.unroll(trans, invar, th, th+1)
-
-            self._add_assertion(solver, trans_t)
+                last = min([fwd, bwd], key=lambda side: (cost[side], size[side]))
 
-            t += 1
+            if last == fwd:
+                trans_t = self.unroll(trans, invar, f+1, f)
+            else:
+                trans_t = self.unroll(trans, invar, b, b+1)
 
-        return (t-1, None)
+            self._add_assertion(solver, trans_t)
+            size[last] += dag_size(trans_t)
+            depth[last] += 1
 
+        return (k, None)
 
     def safety(self, prop, k, k_min, processes=1):
         lemmas = self.hts.lemmas
@@ -852,6 +876,106 @@ class BMCSafety(BMCSolver):
         else:
             return (VerificationStatus.UNK, None, t)
 
+    def safety_multi(self, props, k, k_min):
+        '''
+        Checks a list of properties on a single (incremental) unrolling,
+        which is forward unless the strategy is BWD. At each depth, one query checks whether any of the
+        pending properties fails, the failing ones are retired with the
+        trace of the model, and the query is repeated on the remaining ones.
+
+        In the backward unrolling the frames do not depend on the
+        properties (asserted in the first frame), while the initial states
+        are asserted in the query of each depth
+        '''
+
+        backward = self.config.strategy == VerificationStrategy.BWD
+
+        hts = self.hts
+        hts.reset_formulae()
+        self._init_at_time(hts.vars, k)
+
+        init = hts.single_init()
+        trans = hts.single_trans()
+        invar = hts.single_invar()
+
+        solver = self.solver.copy("multi_prop%s"%("_bwd" if backward else ""))
+        self._reset_assertions(solver)
+
+        has_next = [TS.has_next(prop) for prop in props]
+        xvars = [get_free_variables(prop) for prop in props]
+
+        if backward:
+            # the properties with next are checked on the previous state
+            props = [TS.to_prev(prop) if has_next[i] else prop for (i, prop) in enumerate(props)]
+            Logger.log("Add invar", 2)
+            self._add_assertion(solver, self.at_ptime(invar, -1))
+        else:
+            Logger.log("Add init and invar", 2)
+            self._add_assertion(solver, self.at_time(And(init, invar), 0))
+
+        results = [None]*len(props)
+        pending = list(range(len(props)))
+
+        t = 0
+        while (t < k+1) and (len(pending) > 0):
+            if t > 0:
+                if backward:
+                    self._add_assertion(solver, self.unroll(trans, invar, t-1, t))
+                else:
+                    self._add_assertion(solver, self.unroll(trans, invar, t, t-1))
+
+            if t < k_min:
+                Logger.log("\nSkipping solving for k=%s (k_min=%s)"%(t,k_min), 1)
+                t += 1
+                continue
+
+            Logger.log("\nSolving for k=%s (%s properties)"%(t, len(pending)), 1)
+
+            while len(pending) > 0:
+                nprops = []
+                for i in pending:
+                    if has_next[i] and (t == 0):
+                        continue
+                    if backward:
+                        nprops.append((i, self.at_ptime(Not(props[i]), -1)))
+                    else:
+                        nprops.append((i, self.at_time(Not(props[i]), t-1 if has_next[i] else t)))
+
+                if len(nprops) == 0:
+                    break
+
+                self._push(solver)
+                self._add_assertion(solver, Or([nprop for (_, nprop) in nprops]), "Properties")
+                if backward:
+                    self._add_assertion(solver, self.at_ptime(init, t-1), "Init")
+
+                if not self._solve(solver):
+                    self._pop(solver)
+                    break
+
+                values = solver.solver.get_model()
+                model = dict(values)
+                if backward:
+                    model = self._remap_model_bwd(hts.vars, model, t)
+                failed = [i for (i, nprop) in nprops if values.get_value(nprop).is_true()]
+                assert len(failed) > 0, "The model should falsify at least one property"
+                self._pop(solver)
+
+                Logger.log("Counterexample found with k=%s for %s properties"%(t, len(failed)), 1)
+                for i in failed:
+                    trace = self.generate_trace(model, t, xvars[i])
+                    results[i] = (VerificationStatus.FALSE, trace, t)
+                    pending.remove(i)
+
+            Logger.log("No counterexample found with k=%s"%(t), 1)
+            Logger.msg(".", 0, not(Logger.level(1)))
+            t += 1
+
+        for i in pending:
+            results[i] = (VerificationStatus.UNK, None, k)
+
+        return results
+
     def sim_no_unroll(self, hts, cover, k, all_vars=True, inc=False):
         init = hts.single_init()
         invar = hts.single_invar()
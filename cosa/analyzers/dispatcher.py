@@ -10,20 +10,21 @@
 
 import copy
 import os
-import pickle
+import sys
 
 from collections import Sequence
 from pathlib import Path
 from typing import List, NamedTuple, Optional, Union
 
 from pysmt.fnode import FNode
-from pysmt.shortcuts import Symbol, Implies, get_free_variables, BV, TRUE, simplify, And, EqualsOrIff, Array
+from pysmt.shortcuts import Implies, get_free_variables, BV, TRUE, simplify, And, EqualsOrIff, Array
 
 from cosa.utils.logger import Logger
-from cosa.analyzers.mcsolver import CONST_ARRAYS_SUPPORT
+from cosa.analyzers.mcsolver import CONST_ARRAYS_SUPPORT, VerificationStrategy
 from cosa.analyzers.bmc_safety import BMCSafety
 from cosa.analyzers.bmc_parametric import BMCParametric
 from cosa.analyzers.bmc_ltl import BMCLTL
+from cosa.analyzers.portfolio import ProcessPool, ERROR
 from cosa.problem import VerificationType, VerificationStatus, Trace
 from cosa.encoders.miter import Miter
 from cosa.encoders.formulae import StringParser
@@ -34,14 +35,16 @@ from cosa.encoders.ltl import LTLParser
 from cosa.encoders.factory import ModelParsersFactory, ClockBehaviorsFactory, GeneratorsFactory
 from cosa.modifiers.factory import ModelModifiersFactory
 from cosa.modifiers.coi import ConeOfInfluence
+from cosa.modifiers.reduction import ModelReducer
 from cosa.encoders.template import ModelInformation
 from cosa.encoders.parametric_behavior import ParametricBehavior
 from cosa.printers.trace import TextTracePrinter, VCDTracePrinter
 from cosa.modifiers.model_extension import ModelExtension
-from cosa.encoders.symbolic_transition_system import SymbolicSimpleTSParser
-from cosa.printers.factory import HTSPrintersFactory
-from cosa.printers.hts import STSHTSPrinter
 from cosa.problem import ProblemsManager, MODEL_SP, FILE_SP
+from cosa.utils.formula_mngm import to_portable, from_portable
+from cosa.utils.model_cache import ModelCache
+from cosa.utils.result_cache import ResultCache
+from cosa.utils.profiler import Profiler, PARSING, REDUCTION, COI, PROBLEM, TRACE_PRINTING
 
 
 FLAG_SR = "["
@@ -49,6 +52,7 @@ FLAG_ST = "]"
 FLAG_SP = "+"
 
 COSACACHEDIR = ".CoSA/cache"
+COSARESULTSDIR = ".CoSA/results"
 
 class ProblemSolver(object):
     parser = None
@@ -56,12 +60,20 @@ class ProblemSolver(object):
     lparser = None
     model_info = None
     coi = None
+    reducer = None
+    model_keys = None
+    result_cache = None
+    result_keys = None
 
     def __init__(self):
         self.sparser = None
         self.lparser = None
         self.coi = None
+        self.reducer = None
         self.model_info = ModelInformation()
+        self.model_keys = []
+        self.result_cache = None
+        self.result_keys = {}
         self.properties = [] # contains the parsed properties -- PySMT objects
 
         GeneratorsFactory.init_generators()
@@ -69,6 +81,10 @@ class ProblemSolver(object):
 
 
     def __process_trace(self, hts, trace, config, problem):
+        with Profiler.span(TRACE_PRINTING):
+            return self.__print_traces(hts, trace, config, problem)
+
+    def __print_traces(self, hts, trace, config, problem):
         prevass = []
 
         full_trace = problem.full_trace
@@ -109,18 +125,17 @@ class ProblemSolver(object):
         traces.append(traceH)
 
         # VCD format
-        vcd_trace = None
         if config.vcd:
             vcd_printer = VCDTracePrinter()
             vcd_printer.all_vars = all_vars
-            vcd_trace = vcd_printer.print_trace(hts=hts, \
-                                                model=trace.model, \
-                                                length=trace.length, \
-                                                map_function=self.parser.remap_an2or, \
-                                                abstract_clock_list=self.model_info.abstract_clock_list)
-            traceV = Trace(vcd_trace, trace.length)
+            # the VCD trace is streamed on the file when printed
+            traceV = vcd_printer.print_trace(hts=hts, \
+                                             model=trace.model, \
+                                             length=trace.length, \
+                                             map_function=self.parser.remap_an2or, \
+                                             abstract_clock_list=self.model_info.abstract_clock_list)
+            traceV.length = trace.length
             traceV.extension = vcd_printer.get_file_ext()
-            traceV.human_readable = vcd_trace.human_readable
             traces.append(traceV)
 
         return traces
@@ -192,82 +207,6 @@ class ProblemSolver(object):
         (strfile, flags) = (strfile[:strfile.index(FLAG_SR)], strfile[strfile.index(FLAG_SR)+1:strfile.index(FLAG_ST)].split(FLAG_SP))
         return (strfile, flags)
 
-    def md5(self, fname:Path):
-        import hashlib
-        hash_md5 = hashlib.md5()
-        with fname.open('rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-
-    def _is_cached(self, cachedir, filename, clean):
-        hts_file = "%s/%s.ssts"%(cachedir, filename)
-        mi_file = "%s/%s.mi"%(cachedir, filename)
-        inv_file = "%s/%s.inv"%(cachedir, filename)
-        ltl_file = "%s/%s.ltl"%(cachedir, filename)
-
-        if clean:
-            if os.path.isfile(hts_file):
-                os.remove(hts_file)
-            if os.path.isfile(mi_file):
-                os.remove(mi_file)
-            if os.path.isfile(inv_file):
-                os.remove(inv_file)
-            if os.path.isfile(ltl_file):
-                os.remove(ltl_file)
-
-        return os.path.isfile(hts_file) and \
-            os.path.isfile(mi_file) and \
-            os.path.isfile(inv_file) and \
-            os.path.isfile(ltl_file)
-
-    def _to_cache(self, cachedir, filename, hts, inv, ltl, model_info):
-        if not os.path.isdir(cachedir):
-            os.makedirs(cachedir)
-
-        hts_file = "%s/%s.ssts"%(cachedir, filename)
-        mi_file = "%s/%s.mi"%(cachedir, filename)
-        inv_file = "%s/%s.inv"%(cachedir, filename)
-        ltl_file = "%s/%s.ltl"%(cachedir, filename)
-
-        printer = HTSPrintersFactory.printer_by_name(STSHTSPrinter().get_name())
-        with open(hts_file, "w") as f:
-            f.write(printer.print_hts(hts, properties=[], ftrans=True))
-
-        with open(mi_file, 'wb') as f:
-            pickle.dump(model_info, f)
-
-        with open(inv_file, 'wb') as f:
-            pickle.dump(inv, f)
-
-        with open(ltl_file, 'wb') as f:
-            pickle.dump(ltl, f)
-
-    def _from_cache(self, cachedir, filename, config, flags):
-        hts_file = "%s/%s.ssts"%(cachedir, filename)
-        mi_file = "%s/%s.mi"%(cachedir, filename)
-        inv_file = "%s/%s.inv"%(cachedir, filename)
-        ltl_file = "%s/%s.ltl"%(cachedir, filename)
-
-        parser = SymbolicSimpleTSParser()
-
-        hts = parser.parse_file(Path(hts_file), config, flags)[0]
-
-        with open(mi_file, 'rb') as f:
-            model_info = pickle.load(f)
-            if model_info is not None:
-                # Symbols have to be re-defined to match the current object addresses
-                model_info.abstract_clock_list = [(Symbol(x[0].symbol_name(), x[0].symbol_type()), x[1]) for x in model_info.abstract_clock_list]
-                model_info.clock_list = [Symbol(x.symbol_name(), x.symbol_type()) for x in model_info.clock_list]
-
-        with open(inv_file, 'rb') as f:
-            inv = pickle.load(f)
-
-        with open(ltl_file, 'rb') as f:
-            ltl = pickle.load(f)
-
-        return (hts, inv, ltl, model_info)
-
     def parse_model(self, \
                     model_files,
                     relative_path, \
@@ -283,6 +222,8 @@ class ProblemSolver(object):
         cache_files = general_config.cache_files
         clean_cache = general_config.clean_cache
 
+        TS.ftrans_encoding = general_config.ftrans_encoding
+
         for strfile in models:
             (strfile, flags) = self.get_file_flags(strfile)
             if len(strfile) > 1 and strfile[:2] == '~/':
@@ -305,20 +246,23 @@ class ProblemSolver(object):
                 if not filepath.is_file():
                     Logger.error("File \"%s\" does not exist"%filepath)
 
+                cached = None
+                if cache_files or general_config.result_cache:
+                    cachekey = ModelCache.key(parser.get_input_files(filepath, flags), general_config, flags)
+                    self.model_keys.append(cachekey)
+
                 if cache_files:
-                    md5 = self.md5(filepath)
-                    cf = "-".join(["1" if general_config.abstract_clock else "0", \
-                                   "1" if general_config.add_clock else "0", \
-                                   "1" if general_config.boolean else "0"])
-                    cachefile = "%s-%s"%(md5, cf)
-                    cachedir = filepath.parent / COSACACHEDIR
-
-                if cache_files and self._is_cached(cachedir, cachefile, clean_cache):
-                    Logger.msg("Loading from cache file \"%s\"... "%(filepath), 0)
-                    (hts_a, inv_a, ltl_a, model_info) = self._from_cache(cachedir, cachefile, general_config, flags)
+                    cache = ModelCache(filepath.parent / COSACACHEDIR)
+                    if cache.is_cached(cachekey, clean_cache):
+                        Logger.msg("Loading from cache file \"%s\"... "%(filepath), 0)
+                        cached = cache.load(cachekey)
+
+                if cached is not None:
+                    (hts_a, inv_a, ltl_a, model_info) = cached
                 else:
                     Logger.msg("Parsing file \"%s\"... "%(filepath), 0)
-                    (hts_a, inv_a, ltl_a) = parser.parse_file(filepath, general_config, flags)
+                    with Profiler.span(PARSING):
+                        (hts_a, inv_a, ltl_a) = parser.parse_file(filepath, general_config, flags)
 
                     model_info = parser.get_model_info()
 
@@ -326,7 +270,7 @@ class ProblemSolver(object):
                         modifier(hts_a)
 
                     if cache_files and not clean_cache:
-                        self._to_cache(cachedir, cachefile, hts_a, inv_a, ltl_a, model_info)
+                        cache.store(cachekey, (hts_a, inv_a, ltl_a, model_info))
 
                 self.model_info.combine(model_info)
                 hts.combine(hts_a)
@@ -354,6 +298,7 @@ class ProblemSolver(object):
         self.lparser = LTLParser()
 
         self.coi = ConeOfInfluence()
+        self.reducer = ModelReducer()
 
         modifier = None
         if general_config.model_extension is not None:
@@ -475,121 +420,41 @@ class ProblemSolver(object):
         Logger.log("Solving with abstract_clock=%s, add_clock=%s"%(general_config.abstract_clock,
                                                                    general_config.add_clock), 2)
 
-        # ensure the miter_out variable exists
-        miter_out = None
+        problems = problems_config.problems
 
-        for problem in problems_config.problems:
-            if problem.name is not None:
-                Logger.log("\n*** Analyzing problem \"%s\" ***"%(problem.name), 1)
-                Logger.msg("Solving \"%s\" "%problem.name, 0, not(Logger.level(1)))
+        if general_config.result_cache:
+            if assume_if_true:
+                Logger.warning("Result cache disabled, since assume_if_true requires solving all problems")
+            else:
+                self.result_cache = ResultCache(problems_config.relative_path / COSARESULTSDIR, \
+                                                self.model_keys, general_config, problems_config.relative_path)
+                problems = self.__solve_problems_from_cache(problems_config, problems)
 
-            # apply parametric behaviors (such as toggling the clock)
-            # Note: This is supposed to be *before* creating the combined system for equivalence checking
-            #       we want this assumption to be applied to both copies of the clock
-            problem_hts = ParametricBehavior.apply_to_problem(problems_config.hts, problem, general_config, self.model_info)
+        if general_config.multi_property:
+            if assume_if_true:
+                Logger.warning("Solving properties separately, since assume_if_true requires ordering")
+            else:
+                problems = self.__solve_problems_combined(problems_config, problems)
 
-            if problem.verification == VerificationType.EQUIVALENCE:
-                hts2 = problems_config.get_second_model(problem)
-                problem_hts, miter_out = Miter.combine_systems(hts,
-                                                               hts2,
-                                                               problem.bmc_length,
-                                                               general_config.symbolic_init,
-                                                               problem.properties,
-                                                               True)
+        parallel = general_config.parallel_problems and (len(problems) > 1)
 
-            try:
-                # convert the formulas to PySMT FNodes
-                # lemmas, assumptions and precondition always use the regular parser
-                lemmas, assumptions, precondition = self.convert_formulae([problem.lemmas,
-                                                                           problem.assumptions,
-                                                                           problem.precondition],
-                                                                          parser=self.sparser,
-                                                                          relative_path=problems_config.relative_path)
-
-                if problem.verification != VerificationType.LTL:
-                    parser = self.sparser
-                else:
-                    parser = self.lparser
-
-                prop = None
-                if problem.properties is not None:
-                    prop = self.convert_formula(problem.properties,
-                                                relative_path=problems_config.relative_path,
-                                                parser=parser)
-                    assert len(prop) == 1, "Properties should already have been split into " \
-                        "multiple problems but found {} properties here".format(len(prop))
-                    prop = prop[0]
-                    self.properties.append(prop)
-                else:
-                    if problem.verification == VerificationType.SIMULATION:
-                        prop = TRUE()
-                    elif (problem.verification is not None) and (problem.verification != VerificationType.EQUIVALENCE):
-                        Logger.error("Property not provided for problem {}".format(problem.name))
-
-                if problem.verification == VerificationType.EQUIVALENCE:
-                    assert miter_out is not None
-                    # set property to be the miter output
-                    # if user provided a different equivalence property, this has already
-                    # been incorporated in the miter_out
-                    prop = miter_out
-                    # reset the miter output
-                    miter_out = None
-
-                if precondition:
-                    assert len(precondition) == 1, "There should only be one precondition"
-                    prop = Implies(precondition[0], prop)
-
-                # TODO: keep assumptions separate from the hts
-                # IMPORTANT: CLEAR ANY PREVIOUS ASSUMPTIONS AND LEMMAS
-                #   This was previously done in __solve_problem and has been moved here
-                #   during the frontend refactor in April 2019
-                # this is necessary because the problem hts is just a reference to the
-                #   overall (shared) HTS
-                problem_hts.assumptions = None
-                problem_hts.lemmas = None
-
-                # Compute the Cone Of Influence
-                # Returns a *new* hts (not pointing to the original one anymore)
-                if problem.coi:
-                    if Logger.level(2):
-                        timer = Logger.start_timer("COI")
-                    hts = self.coi.compute(hts, prop)
-                    if Logger.level(2):
-                        Logger.get_timer(timer)
+        if parallel and assume_if_true:
+            Logger.warning("Solving problems sequentially, since assume_if_true requires ordering")
+            parallel = False
 
-                if general_config.time:
-                    timer_solve = Logger.start_timer("Problem %s"%problem.name, False)
-
-                status, trace, traces, region =  self.__solve_problem(problem_hts,
-                                                              prop,
-                                                              lemmas,
-                                                              assumptions,
-                                                              problem)
-
-                # set status for this problem
-                problems_config.set_problem_status(problem, status)
-
-                # TODO: Determine whether we need both trace and traces
-                assert trace is None or traces is None, "Expecting either a trace or a list of traces"
-                if trace is not None:
-                    problem_traces = self.__process_trace(hts, trace, general_config, problem)
-                    problems_config.set_problem_traces(problem, problem_traces)
-
-                if traces is not None:
-                    traces_to_add = []
-                    for trace in traces:
-                        problem_trace = self.__process_trace(hts, trace, general_config, problem)
-                        for pt in problem_trace:
-                            traces_to_add.append(pt)
-                    problems_config.set_problem_traces(problem, traces_to_add)
-
-                if problem.verification == VerificationType.PARAMETRIC:
-                    assert region is not None
-                    problems_config.set_problem_region(problem, region)
-
-                if status is not None:
-                    Logger.msg(" %s\n"%status, 0, not(Logger.level(1)))
+        if parallel:
+            self.__solve_problems_parallel(problems_config, problems, max([p.processes for p in problems]))
+            return
+
+        for problem in problems:
+            self.__print_problem_header(problem)
 
+            try:
+                (problem_hts, prop, lemmas, assumptions) = self.__setup_problem(problems_config, problem)
+                result = self.__run_problem(problems_config, problem, problem_hts, prop, lemmas, assumptions)
+                self.__store_result(problems_config, problem, result)
+
+                status = result[0]
                 if (assume_if_true) and \
                    (status == VerificationStatus.TRUE) and \
                    (problem.assumptions == None) and \
@@ -607,13 +472,374 @@ class ProblemSolver(object):
                     problem_hts.reset_formulae()
                     problem_hts.add_ts(ass_ts)
 
+            except KeyboardInterrupt as e:
+                Logger.msg("\b\b Skipped!\n", 0)
+
+    def __solve_problems_from_cache(self, problems_config:ProblemsManager, problems:List[NamedTuple])->List[NamedTuple]:
+        '''
+        Stores the results of the problems that are available in the result
+        cache, and returns the ones that have to be solved
+        '''
+
+        general_config = problems_config.general_config
+        unsolved = []
+
+        for problem in problems:
+            key = self.result_cache.key(problem)
+            self.result_keys[problem.idx] = key
+
+            if general_config.time:
+                timer_solve = Logger.start_timer("Problem %s"%problem.name, False)
+
+            result = None
+            if self.result_cache.is_cached(key, general_config.clean_result_cache):
+                result = self.result_cache.load(key)
+
+            if result is None:
+                unsolved.append(problem)
+                continue
+
+            (status, traces, region, time) = result
+            if isinstance(region, list):
+                region = [from_portable(r) for r in region]
+            elif region is not None:
+                region = from_portable(region)
+
+            time = None
+            if general_config.time:
+                time = Logger.get_timer(timer_solve, False)
+
+            self.__print_problem_header(problem)
+            Logger.log("\n*** Problem \"%s\" is %s (cached result) ***"%(problem.name, status), 1)
+            self.__store_result(problems_config, problem, (status, traces, region, time), cached=True)
+
+        return unsolved
+
+    def __solve_problems_combined(self, problems_config:ProblemsManager, problems:List[NamedTuple])->List[NamedTuple]:
+        '''
+        Solves together the safety problems that share the same system and
+        BMC configuration, using a single unrolling for all their properties.
+        Returns the problems that cannot be combined, which are left to the
+        regular solving
+        '''
+
+        general_config = problems_config.general_config
+
+        def group_key(problem):
+            if (problem.verification != VerificationType.SAFETY) or \
+               (problem.strategy not in [VerificationStrategy.FWD, VerificationStrategy.AUTO, VerificationStrategy.BWD]) or \
+               (problem.prove) or (problem.lemmas is not None) or (problem.coi) or (problem.reduce_model) or \
+               (not problem.incremental):
+                return None
+
+            # forward and backward problems are unrolled separately
+            return (problem.strategy == VerificationStrategy.BWD, \
+                    problem.solver_name, str(problem.solver_options), problem.bmc_length, \
+                    problem.bmc_length_min, problem.assumptions, problem.generators, \
+                    problem.simplify, problem.skip_solving, problem.smt2_tracing)
+
+        groups = {}
+        for problem in problems:
+            key = group_key(problem)
+            if key is not None:
+                groups.setdefault(key, []).append(problem)
+
+        groups = [group for group in groups.values() if len(group) > 1]
+        combined = set([id(problem) for group in groups for problem in group])
+
+        for group in groups:
+            Logger.log("\n*** Analyzing %s properties on a single unrolling ***"%(len(group)), 1)
+            Logger.msg("Unrolling %s properties "%(len(group)), 0, not(Logger.level(1)))
+
+            try:
+                props = []
+                for problem in group:
+                    (problem_hts, prop, lemmas, assumptions) = self.__setup_problem(problems_config, problem)
+                    props.append(prop)
+
+                # the assumptions are the same for all the problems of the group
+                for assump in assumptions:
+                    problem_hts.add_assumption(assump)
+
                 if general_config.time:
-                    problems_config.set_problem_time(problem,
-                                                     Logger.get_timer(timer_solve, False))
+                    timer_solve = Logger.start_timer("Problems %s"%(", ".join([p.name for p in group])), False)
+
+                previous = Profiler.set_problem(", ".join([p.name for p in group]))
+                with Profiler.span(PROBLEM):
+                    bmc_safety = BMCSafety(problem_hts, group[0])
+                    results = bmc_safety.safety_multi(props, group[0].bmc_length, group[0].bmc_length_min)
+                Profiler.set_problem(previous)
+
+                time = None
+                if general_config.time:
+                    time = Logger.get_timer(timer_solve, False)
+
+                Logger.msg("\n", 0, not(Logger.level(1)))
+
+                for (problem, (status, trace, _)) in zip(group, results):
+                    self.__print_problem_header(problem)
+                    Logger.log("\n*** Problem \"%s\" is %s ***"%(problem.name, status), 1)
 
+                    problem_traces = None
+                    if trace is not None:
+                        problem_traces = self.__process_trace(problems_config.hts, trace, general_config, problem)
+
+                    self.__store_result(problems_config, problem, (status, problem_traces, None, time))
             except KeyboardInterrupt as e:
                 Logger.msg("\b\b Skipped!\n", 0)
 
+        return [problem for problem in problems if id(problem) not in combined]
+
+    def __solve_problems_parallel(self, problems_config:ProblemsManager, problems:List[NamedTuple], processes:int)->None:
+        '''
+        Solves the problems in a pool of processes. The setup of each problem
+        is done by the parent, in the same order of the sequential solving,
+        right before forking the process that solves it, while the results
+        are stored in the ProblemsManager in the order of the problems
+        '''
+
+        started = []
+
+        def problem_setups():
+            for problem in problems:
+                setup = self.__setup_problem(problems_config, problem)
+                started.append(problem)
+                yield (problem, setup)
+
+        def solve(item):
+            # the progress of each problem is printed by the parent
+            if not Logger.level(1):
+                sys.stdout = open(os.devnull, "w")
+
+            (problem, (problem_hts, prop, lemmas, assumptions)) = item
+            (status, traces, region, time) = self.__run_problem(problems_config, problem, problem_hts, \
+                                                               prop, lemmas, assumptions)
+            if isinstance(region, list):
+                region = [to_portable(r) for r in region]
+            elif region is not None:
+                region = to_portable(region)
+
+            # the measures of the worker are reported by the parent
+            return ((status, traces, region, time), Profiler.take())
+
+        pool = ProcessPool(processes)
+
+        try:
+            for (i, (status, result)) in enumerate(pool.imap(solve, problem_setups())):
+                problem = started[i]
+                self.__print_problem_header(problem)
+
+                if status == ERROR:
+                    Logger.error("Problem \"%s\" failed with %s"%(problem.name, result))
+
+                ((status, traces, region, time), measures) = result
+                Profiler.merge(measures)
+                if isinstance(region, list):
+                    region = [from_portable(r) for r in region]
+                elif region is not None:
+                    region = from_portable(region)
+
+                self.__store_result(problems_config, problem, (status, traces, region, time))
+        except KeyboardInterrupt as e:
+            Logger.msg("\b\b Skipped!\n", 0)
+
+    def __print_problem_header(self, problem:NamedTuple)->None:
+        if problem.name is not None:
+            Logger.log("\n*** Analyzing problem \"%s\" ***"%(problem.name), 1)
+            Logger.msg("Solving \"%s\" "%problem.name, 0, not(Logger.level(1)))
+
+    def __setup_problem(self, problems_config:ProblemsManager, problem:NamedTuple):
+        '''
+        Returns the system and the parsed formulae of the problem
+        '''
+
+        general_config = problems_config.general_config
+
+        # apply parametric behaviors (such as toggling the clock)
+        # Note: This is supposed to be *before* creating the combined system for equivalence checking
+        #       we want this assumption to be applied to both copies of the clock
+        problem_hts = ParametricBehavior.apply_to_problem(problems_config.hts, problem, general_config, self.model_info)
+
+        miter_out = None
+        if problem.verification == VerificationType.EQUIVALENCE:
+            hts2 = problems_config.get_second_model(problem)
+            problem_hts, miter_out = Miter.combine_systems(problems_config.hts,
+                                                           hts2,
+                                                           problem.bmc_length,
+                                                           general_config.symbolic_init,
+                                                           problem.properties,
+                                                           True)
+
+        # convert the formulas to PySMT FNodes
+        # lemmas, assumptions and precondition always use the regular parser
+        lemmas, assumptions, precondition = self.convert_formulae([problem.lemmas,
+                                                                   problem.assumptions,
+                                                                   problem.precondition],
+                                                                  parser=self.sparser,
+                                                                  relative_path=problems_config.relative_path)
+
+        if problem.verification != VerificationType.LTL:
+            parser = self.sparser
+        else:
+            parser = self.lparser
+
+        prop = None
+        if problem.properties is not None:
+            prop = self.convert_formula(problem.properties,
+                                        relative_path=problems_config.relative_path,
+                                        parser=parser)
+            assert len(prop) == 1, "Properties should already have been split into " \
+                "multiple problems but found {} properties here".format(len(prop))
+            prop = prop[0]
+            self.properties.append(prop)
+        else:
+            if problem.verification == VerificationType.SIMULATION:
+                prop = TRUE()
+            elif (problem.verification is not None) and (problem.verification != VerificationType.EQUIVALENCE):
+                Logger.error("Property not provided for problem {}".format(problem.name))
+
+        if problem.verification == VerificationType.EQUIVALENCE:
+            assert miter_out is not None
+            # set property to be the miter output
+            # if user provided a different equivalence property, this has already
+            # been incorporated in the miter_out
+            prop = miter_out
+
+        if precondition:
+            assert len(precondition) == 1, "There should only be one precondition"
+            prop = Implies(precondition[0], prop)
+
+        # TODO: keep assumptions separate from the hts
+        # IMPORTANT: CLEAR ANY PREVIOUS ASSUMPTIONS AND LEMMAS
+        #   This was previously done in __solve_problem and has been moved here
+        #   during the frontend refactor in April 2019
+        # this is necessary because the problem hts is just a reference to the
+        #   overall (shared) HTS
+        problem_hts.assumptions = None
+        problem_hts.lemmas = None
+
+        return (problem_hts, prop, lemmas, assumptions)
+
+    def __run_problem(self,
+                      problems_config:ProblemsManager,
+                      problem:NamedTuple,
+                      problem_hts:HTS,
+                      prop:Optional[FNode],
+                      lemmas:List[FNode],
+                      assumptions:List[FNode]):
+        '''
+        Solves the problem, and returns its status, traces, region and time
+        '''
+
+        previous = Profiler.set_problem(problem.name)
+        try:
+            return self.__run_problem_profiled(problems_config, problem, problem_hts, prop, lemmas, assumptions)
+        finally:
+            Profiler.set_problem(previous)
+
+    def __run_problem_profiled(self,
+                               problems_config:ProblemsManager,
+                               problem:NamedTuple,
+                               problem_hts:HTS,
+                               prop:Optional[FNode],
+                               lemmas:List[FNode],
+                               assumptions:List[FNode]):
+        general_config = problems_config.general_config
+        hts = problems_config.hts
+
+        # Reduce the model, and rewrite the formulae of the problem on it
+        reduction = None
+        visible_vars = problem_hts.vars
+        prop_vars = None if prop is None else get_free_variables(prop)
+        if problem.reduce_model and (problem.verification != VerificationType.PARAMETRIC):
+            if Logger.level(2):
+                timer = Logger.start_timer("Reduction")
+            with Profiler.span(REDUCTION):
+                (problem_hts, reduction) = self.reducer.reduce(problem_hts, [prop] + lemmas + assumptions)
+            prop = reduction.apply(prop)
+            lemmas = [reduction.apply(lemma) for lemma in lemmas]
+            assumptions = [reduction.apply(assumption) for assumption in assumptions]
+            problem_hts.assumptions = None
+            problem_hts.lemmas = None
+            if Logger.level(2):
+                Logger.get_timer(timer)
+
+        # Compute the Cone Of Influence
+        # Returns a *new* hts (not pointing to the original one anymore),
+        # which is shared by the problems with the same cone
+        if problem.coi:
+            if Logger.level(2):
+                timer = Logger.start_timer("COI")
+            with Profiler.span(COI):
+                problem_hts = self.coi.compute(problem_hts, prop, assumptions, lemmas)
+            problem_hts.assumptions = None
+            problem_hts.lemmas = None
+            if reduction is None:
+                hts = problem_hts
+            if Logger.level(2):
+                Logger.get_timer(timer)
+
+        if general_config.time:
+            timer_solve = Logger.start_timer("Problem %s"%problem.name, False)
+
+        with Profiler.span(PROBLEM):
+            status, trace, traces, region =  self.__solve_problem(problem_hts,
+                                                                  prop,
+                                                                  lemmas,
+                                                                  assumptions,
+                                                                  problem)
+
+        # TODO: Determine whether we need both trace and traces
+        assert trace is None or traces is None, "Expecting either a trace or a list of traces"
+        # the traces are printed on the original signals, as without reduction
+        if reduction is not None:
+            for t in ([trace] if traces is None else traces):
+                if t is not None:
+                    reduction.extend_model(t.model, t.length, visible_vars)
+                    if t.prop_vars is not None:
+                        t.prop_vars = prop_vars
+
+        problem_traces = None
+        if trace is not None:
+            problem_traces = self.__process_trace(hts, trace, general_config, problem)
+
+        if traces is not None:
+            problem_traces = []
+            for trace in traces:
+                problem_traces += self.__process_trace(hts, trace, general_config, problem)
+
+        time = None
+        if general_config.time:
+            time = Logger.get_timer(timer_solve, False)
+
+        return (status, problem_traces, region, time)
+
+    def __store_result(self, problems_config:ProblemsManager, problem:NamedTuple, result, cached=False)->None:
+        (status, traces, region, time) = result
+
+        if (not cached) and (status is not None) and (problem.idx in self.result_keys):
+            portable_region = region
+            if isinstance(region, list):
+                portable_region = [to_portable(r) for r in region]
+            elif region is not None:
+                portable_region = to_portable(region)
+            self.result_cache.store(self.result_keys[problem.idx], (status, traces, portable_region, time))
+
+        # set status for this problem
+        problems_config.set_problem_status(problem, status)
+
+        if traces is not None:
+            problems_config.set_problem_traces(problem, traces)
+
+        if problem.verification == VerificationType.PARAMETRIC:
+            assert region is not None
+            problems_config.set_problem_region(problem, region)
+
+        if status is not None:
+            Logger.msg(" %s\n"%status, 0, not(Logger.level(1)))
+
+        if time is not None:
+            problems_config.set_problem_time(problem, time)
 
     def convert_formulae(self, formulae:List[Union[str, FNode]],
                          parser:Union[StringParser, LTLParser],
@@ -8,19 +8,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import gzip
+
 from six.moves import cStringIO
 
 from pysmt.shortcuts import BV, And, Or, Solver, TRUE, FALSE, Not, EqualsOrIff, Implies, Iff, Symbol, BOOL, simplify, BVAdd, BVUGE
 from pysmt.rewritings import conjunctive_partition
-from pysmt.smtlib.printers import SmtDagPrinter
+from pysmt.smtlib.printers import SmtPrinter, SmtDagPrinter
 from pysmt.logics import convert_logic_from_string, QF_BV, QF_ABV
 
 from cosa.utils.logger import Logger
 from cosa.representation import TS, HTS
-from cosa.utils.formula_mngm import substitute, get_free_variables
 from cosa.printers.trace import TextTracePrinter, VCDTracePrinter
-from cosa.problem import Trace
-from cosa.utils.generic import status_bar
+from cosa.problem import Trace, TraceModel
+from cosa.analyzers.unroller import FrameUnroller
+from cosa.analyzers.portfolio import ProcessPool, ERROR
+from cosa.utils.profiler import Profiler, UNROLLING, ASSERTING, SOLVING, ASSERTIONS, ASSERTIONS_DAG, \
+     SOLVER_CALLS, PUSHES, POPS, PUSH_DEPTH, ASSERTION_DAG, dag_size
+
+SMT2_DEF = "__def%d"
+LEMMA_ACT = "__lemma%d__act"
+SMT2_BUFFER_SIZE = 1 << 20
 
 class VerificationStrategy(object):
     FWD = "FWD"
@@ -28,6 +37,7 @@ class VerificationStrategy(object):
     ZZ  = "ZZ"
     NU  = "NU"
     INT  = "INT"
+    PDR  = "PDR"
     LTL  = "LTL"
     AUTO = "AUTO"
     ALL = "ALL"
@@ -42,11 +52,195 @@ def get_verification_strategies():
     strategies.append((VerificationStrategy.BWD,   "Backward reachability"))
     strategies.append((VerificationStrategy.ZZ,    "Mixed Forward and Backward reachability (Zig-Zag)"))
     strategies.append((VerificationStrategy.INT,   "Interpolation"))
+    strategies.append((VerificationStrategy.PDR,   "Property Directed Reachability (IC3)"))
     strategies.append((VerificationStrategy.NU,    "States picking without unrolling (only for simulation)"))
     strategies.append((VerificationStrategy.LTL,   "Pure LTL verification (without optimizations)"))
     strategies.append((VerificationStrategy.ALL,   "Use all techniques"))
     return strategies
 
+class SMT2TraceWriter(object):
+    '''
+    Buffered writer of the SMT-LIB2 trace of the solvers
+
+    The file is kept open, and it is flushed on push, pop, and check-sat.
+    The sub-terms that occur more than once are printed only once as
+    define-fun, and then referred by name in the following assertions.
+    Declarations and definitions follow the push/pop scopes of the solver.
+    The writers are shared among the solvers with the same trace file, and
+    the output is compressed with gzip if the file name ends with ".gz"
+    '''
+
+    writers = {}
+
+    filename = None
+    stream = None
+    names = None
+    scopes = None
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.stream = None
+        self.names = {}
+        self.scopes = [[]]
+        self.printer = None
+        self.buf = cStringIO()
+
+    @staticmethod
+    def get(filename):
+        if filename not in SMT2TraceWriter.writers:
+            SMT2TraceWriter.writers[filename] = SMT2TraceWriter(filename)
+        return SMT2TraceWriter.writers[filename]
+
+    @staticmethod
+    def close_all():
+        for writer in SMT2TraceWriter.writers.values():
+            writer.close()
+        SMT2TraceWriter.writers = {}
+
+    def _open(self, mode):
+        self.close()
+        if self.filename.endswith(".gz"):
+            self.stream = gzip.open(self.filename, mode+"t")
+        else:
+            self.stream = open(self.filename, mode, buffering=SMT2_BUFFER_SIZE)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def write(self, line):
+        if self.stream is None:
+            self._open("a")
+        # don't include any escape characters in smt2 output
+        # they can't be quoted away with "|" and should only
+        # be a part of a name, because auto-generated names don't
+        # use escape characters
+        self.stream.write(line.replace("\\", "")+"\n")
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+    def reset(self, logic):
+        self._open("w")
+        # the printer refers to the same dictionary
+        self.names.clear()
+        self.scopes = [[]]
+        self.write("(set-logic %s)"%logic)
+
+    def push(self):
+        self.write("(push 1)")
+        self.scopes.append([])
+        self.flush()
+
+    def pop(self):
+        self.write("(pop 1)")
+        if len(self.scopes) > 1:
+            for node in self.scopes.pop():
+                del self.names[node]
+        self.flush()
+
+    def check_sat(self, assumptions=None):
+        if assumptions:
+            self.write("(check-sat-assuming (%s))"%(" ".join([self._to_smt2(a) for a in assumptions])))
+        else:
+            self.write("(check-sat)")
+        self.write("")
+        self.flush()
+
+    def _sort(self, stype):
+        if stype == BOOL:
+            return "Bool"
+        if stype.is_bv_type():
+            return "(_ BitVec %s)"%stype.width
+        if stype.is_array_type():
+            return "(Array %s %s)"%(self._sort(stype.index_type), self._sort(stype.elem_type))
+        Logger.error("Unhandled type in smt2 translation")
+
+    def _to_smt2(self, formula):
+        if self.printer is None:
+            self.printer = _SMT2NamesPrinter(self.buf, self.names)
+
+        self.buf.seek(0)
+        self.buf.truncate()
+        self.printer.printer(formula)
+        return self.buf.getvalue()
+
+    def _name(self, node, name):
+        self.names[node] = name
+        self.scopes[-1].append(node)
+
+    def add_assertion(self, formula):
+        # counting the references of the sub-terms that are not defined yet
+        count = {}
+        order = []
+        stack = [(formula, False)]
+        while stack:
+            (node, expanded) = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if node in count:
+                count[node] += 1
+                continue
+            count[node] = 1
+            if node in self.names:
+                continue
+            stack.append((node, True))
+            stack += [(arg, False) for arg in node.args()]
+
+        declarations = []
+        for node in order:
+            if node.is_symbol():
+                name = self._to_smt2(node)
+                declarations.append("(declare-fun %s () %s)"%(name, self._sort(node.symbol_type())))
+                self._name(node, name)
+
+        if len(declarations) > 0:
+            for declaration in declarations:
+                self.write(declaration)
+            self.write("")
+
+        for node in order:
+            if (count[node] > 1) and (len(node.args()) > 0) and (node not in self.names):
+                name = SMT2_DEF%len(self.names)
+                self.write("(define-fun %s () %s %s)"%(name, self._sort(node.get_type()), self._to_smt2(node)))
+                self._name(node, name)
+
+        conjuncts = conjunctive_partition(formula) if formula.is_and() else [formula]
+        for conjunct in conjuncts:
+            self.write("(assert %s)"%self._to_smt2(conjunct))
+
+class _SMT2NamesPrinter(SmtPrinter):
+    '''
+    SMT-LIB2 printer that replaces the named sub-terms with their name
+    '''
+
+    def __init__(self, stream, names):
+        SmtPrinter.__init__(self, stream)
+        self.names = names
+
+    def printer(self, f):
+        # the threshold makes the walker call walk_threshold on every child
+        if f in self.names:
+            self.write(self.names[f])
+        else:
+            self.walk(f, threshold=1)
+
+    def walk_threshold(self, formula):
+        if formula in self.names:
+            self.write(self.names[formula])
+            return None
+
+        try:
+            function = self.functions[formula.node_type()]
+        except KeyError:
+            function = self.walk_error
+        return function(formula)
+
+atexit.register(SMT2TraceWriter.close_all)
+
 class TraceSolver(object):
 
     solver_name = None
@@ -56,9 +250,9 @@ class TraceSolver(object):
     solver_options = None
     basename = None
     trace_file = None
+    trace_writer = None
     solver = None
-    smt2vars = None
-    smt2vars_inc = None
+    depth = 0
 
     def __init__(self, solver_name, name, logic, incremental, solver_options, basename=None):
         self.solver_name = solver_name
@@ -67,11 +261,13 @@ class TraceSolver(object):
         self.incremental = incremental
         self.solver_options = solver_options
         self.basename = basename
-        self.smt2vars = set([])
         self.solver = Solver(name=solver_name, logic=logic, incremental=incremental, solver_options=solver_options)
-        self.smt2vars_inc = []
         if basename is not None:
-            self.trace_file = "%s-%s.smt2"%(basename, name)
+            if basename.endswith(".gz"):
+                self.trace_file = "%s-%s.smt2.gz"%(basename[:-3], name)
+            else:
+                self.trace_file = "%s-%s.smt2"%(basename, name)
+            self.trace_writer = SMT2TraceWriter.get(self.trace_file)
 
     def clear(self):
         self.solver.exit()
@@ -93,13 +289,22 @@ class BMCSolver(object):
 
         basename = None
         if self.config.smt2_tracing is not None:
-            basename = ".".join(self.config.smt2_tracing.split(".")[:-1])
+            smt2_tracing = self.config.smt2_tracing
+            compress = smt2_tracing.endswith(".gz")
+            if compress:
+                smt2_tracing = smt2_tracing[:-3]
+            basename = ".".join(smt2_tracing.split(".")[:-1])
+            if compress:
+                basename += ".gz"
         logic = convert_logic_from_string(self.hts.logic)
         self.solver = TraceSolver(config.solver_name, "main", logic=logic, incremental=config.incremental,
                                   solver_options=config.solver_options, basename=basename)
 
-        self.varmapf_t = None
-        self.varmapb_t = None
+        self.unroller = None
+        # depth of the forward unrolling of the last zig-zag model
+        self.zz_forward = 0
+        # solver and activation literals of the lemmas step check
+        self._lemmas_step = None
 
     def unroll(self, trans, invar, k_end, k_start=0, gen_list=False):
         Logger.log("Unroll from %s to %s"%(k_start, k_end), 2)
@@ -136,6 +341,7 @@ class BMCSolver(object):
                                     VerificationStrategy.FWD, \
                                     VerificationStrategy.NU, \
                                     VerificationStrategy.INT, \
+                                    VerificationStrategy.PDR, \
                                     VerificationStrategy.LTL, \
                                     VerificationStrategy.ALL, \
                                     VerificationStrategy.MULTI]:
@@ -145,63 +351,21 @@ class BMCSolver(object):
         return None
 
     def _init_at_time(self, vars, maxtime):
-
-        previous = self.config.strategy != VerificationStrategy.FWD
-
-        if self.varmapf_t is not None:
-            del(self.varmapf_t)
-
-        if self.varmapb_t is not None:
-            del(self.varmapb_t)
-
-        self.varmapf_t = {}
-        self.varmapb_t = {}
-
-        timed = TS.get_timed_name
-        ptimed = TS.get_ptimed_name
-        prime = TS.get_prime_name
-        prev = TS.get_prev_name
-
-        varsstr = [v.symbol_name() for v in vars]
-
-        for t in range(maxtime+2):
-            varmapf = []
-            varmapb = []
-
-            for sname in varsstr:
-                psname = prime(sname)
-                rsname = prev(sname)
-
-                varmapf.append((sname, timed(sname, t)))
-                varmapf.append((psname, timed(sname, t+1)))
-                varmapf.append((rsname, timed(sname, t-1)))
-
-                if previous:
-                    varmapb.append((sname, ptimed(sname, t)))
-                    varmapb.append((psname, ptimed(sname, t-1)))
-                    varmapb.append((rsname, ptimed(sname, t+1)))
-
-            self.varmapf_t[t] = dict(varmapf)
-
-            if previous:
-                self.varmapb_t[t-1] = dict(varmapb)
+        # the timed symbols of each frame are created on demand by the
+        # unroller, maxtime is only kept for compatibility
+        self.unroller = FrameUnroller(vars)
 
     def at_time(self, formula, t):
-        return substitute(formula, self.varmapf_t[t])
+        with Profiler.total(UNROLLING):
+            return self.unroller.at_time(formula, t)
 
     def at_ptime(self, formula, t):
-        return substitute(formula, self.varmapb_t[t])
+        with Profiler.total(UNROLLING):
+            return self.unroller.at_ptime(formula, t)
 
     def _write_smt2_log(self, solver, line):
-        # don't include any escape characters in smt2 output
-        # they can't be quoted away with "|" and should only
-        # be a part of a name, because auto-generated names don't
-        # use escape characters
-        line = line.replace("\\", "")
-        tracefile = solver.trace_file
-        if tracefile is not None:
-            with open(tracefile, "a") as f:
-                f.write(line+"\n")
+        if solver.trace_writer is not None:
+            solver.trace_writer.write(line)
 
     def _write_smt2_comment(self, solver, line):
         return self._write_smt2_log(solver, ";; %s"%line)
@@ -214,45 +378,24 @@ class BMCSolver(object):
         return buf.getvalue()
     
     def _add_assertion(self, solver, formula, comment=None):
+        if Profiler.enabled:
+            size = dag_size(formula)
+            Profiler.count(ASSERTIONS)
+            Profiler.count(ASSERTIONS_DAG, size)
+            Profiler.maximum(ASSERTION_DAG, size)
+
         if not self.config.skip_solving:
-            solver.solver.add_assertion(formula)
+            with Profiler.span(ASSERTING):
+                solver.solver.add_assertion(formula)
 
         if Logger.level(3):
             print(self._formula_to_smt2(formula)+"\n")
 
-        if solver.trace_file is not None:
+        if solver.trace_writer is not None:
             if comment:
                 self._write_smt2_comment(solver, "%s: START"%comment)
 
-            formula_fv = get_free_variables(formula)
-
-            for v in formula_fv:
-                if v in solver.smt2vars:
-                    continue
-
-                symbol_name = self._formula_to_smt2(v)
-                if v.symbol_type() == BOOL:
-                    self._write_smt2_log(solver, "(declare-fun %s () Bool)" % (symbol_name))
-                elif v.symbol_type().is_array_type():
-                    st = v.symbol_type()
-                    assert st.index_type.is_bv_type(), "Expecting BV indices"
-                    assert st.elem_type.is_bv_type(), "Expecting BV elements"
-                    self._write_smt2_log(solver, "(declare-fun %s () (Array (_ BitVec %s) (_ BitVec %s)))"%(symbol_name, st.index_type.width, st.elem_type.width))
-                elif v.symbol_type().is_bv_type():
-                    self._write_smt2_log(solver, "(declare-fun %s () (_ BitVec %s))" % (symbol_name, v.symbol_type().width))
-                else:
-                    Logger.error("Unhandled type in smt2 translation")
-
-            self._write_smt2_log(solver, "")
-
-            for v in formula_fv:
-                solver.smt2vars.add(v)
-
-            if formula.is_and():
-                for f in conjunctive_partition(formula):
-                    self._write_smt2_log(solver, "(assert %s)"%self._formula_to_smt2(f))
-            else:
-                self._write_smt2_log(solver, "(assert %s)"%self._formula_to_smt2(formula))
+            solver.trace_writer.add_assertion(formula)
 
             if comment:
                 self._write_smt2_comment(solver, "%s: END"%comment)
@@ -263,16 +406,23 @@ class BMCSolver(object):
         if not self.config.skip_solving:
             solver.solver.push()
 
-        solver.smt2vars_inc.append(solver.smt2vars)
-        self._write_smt2_log(solver, "(push 1)")
+        solver.depth += 1
+        Profiler.count(PUSHES)
+        Profiler.maximum(PUSH_DEPTH, solver.depth)
+
+        if solver.trace_writer is not None:
+            solver.trace_writer.push()
 
     def _pop(self, solver):
         Logger.log("Pop solver \"%s\""%solver.name, 2)
         if not self.config.skip_solving:
             solver.solver.pop()
 
-        solver.smt2vars = solver.smt2vars_inc.pop()
-        self._write_smt2_log(solver, "(pop 1)")
+        solver.depth -= 1
+        Profiler.count(POPS)
+
+        if solver.trace_writer is not None:
+            solver.trace_writer.pop()
 
     def _get_model(self, solver, relevant_vars=None):
         if relevant_vars is None:
@@ -286,16 +436,16 @@ class BMCSolver(object):
         if not self.config.skip_solving:
             solver.solver.reset_assertions()
 
-        if solver.trace_file is not None:
-            solver.smt2vars = set([])
-            with open(solver.trace_file, "w") as f:
-                f.write("(set-logic %s)\n"%self.hts.logic)
+        solver.depth = 0
 
-    def _solve(self, solver):
+        if solver.trace_writer is not None:
+            solver.trace_writer.reset(self.hts.logic)
+
+    def _solve(self, solver, assumptions=None):
         Logger.log("Solve solver \"%s\""%solver.name, 2)
 
-        self._write_smt2_log(solver, "(check-sat)")
-        self._write_smt2_log(solver, "")
+        if solver.trace_writer is not None:
+            solver.trace_writer.check_sat(assumptions)
 
         if self.config.skip_solving:
             return None
@@ -303,7 +453,9 @@ class BMCSolver(object):
         if Logger.level(2):
             timer = Logger.start_timer("Solve")
 
-        r = solver.solver.solve()
+        Profiler.count(SOLVER_CALLS)
+        with Profiler.span(SOLVING):
+            r = solver.solver.solve(assumptions)
 
         if Logger.level(2):
             self.total_time += Logger.get_timer(timer)
@@ -312,20 +464,102 @@ class BMCSolver(object):
         return r
 
 
-    def _check_lemma(self, hts, lemma, init, trans):
-
-        def check_init():
-            self._reset_assertions(self.solver)
-            self._add_assertion(self.solver, self.at_time(And(init, Not(lemma)), 0), comment="Init check")
-            res = self._solve(self.solver)
+    def _failing_lemmas(self, solver, lemmas_t, candidates, assumptions=None):
+        '''
+        Returns the candidates whose lemma (lemmas_t are the timed lemmas)
+        can be falsified on the solver under the assumptions. Each query
+        checks whether any of the remaining candidates fails, and all the
+        lemmas falsified by the model are pruned (counterexample-guided)
+        '''
+
+        failed = []
+        candidates = list(candidates)
+        while len(candidates) > 0:
+            self._push(solver)
+            self._add_assertion(solver, Or([Not(lemmas_t[i]) for i in candidates]), "Lemmas")
+
+            if not self._solve(solver, assumptions):
+                self._pop(solver)
+                break
+
+            values = solver.solver.get_model()
+            falsified = [i for i in candidates if values.get_value(lemmas_t[i]).is_false()]
+            assert len(falsified) > 0, "The model should falsify at least one lemma"
+            self._pop(solver)
+
+            failed += falsified
+            candidates = [i for i in candidates if i not in falsified]
+
+        return failed
+
+    def _failing_lemmas_init(self, init, lemmas, candidates):
+        # I & !L
+        solver = self.solver.copy("lemmas_init")
+        self._reset_assertions(solver)
+        self._add_assertion(solver, self.at_time(init, 0), "Init")
+
+        lemmas_0 = [self.at_time(lemma, 0) for lemma in lemmas]
+        return self._failing_lemmas(solver, lemmas_0, candidates)
+
+    def _failing_lemmas_step(self, trans, lemmas, candidates, active):
+        # (L_1 & ... & L_n) & T & !L', where the lemmas are enabled by the
+        # activation literals, hence the solver is kept across the iterations
+        if self._lemmas_step is None:
+            solver = self.solver.copy("lemmas_step")
+            self._reset_assertions(solver)
+            self._add_assertion(solver, self.at_time(trans, 0), "Trans")
+
+            activations = [Symbol(LEMMA_ACT%i, BOOL) for i in range(len(lemmas))]
+            for (activation, lemma) in zip(activations, lemmas):
+                self._add_assertion(solver, Implies(activation, self.at_time(lemma, 0)))
+
+            self._lemmas_step = (solver, activations)
+
+        (solver, activations) = self._lemmas_step
+        lemmas_1 = [self.at_time(lemma, 1) for lemma in lemmas]
+        return self._failing_lemmas(solver, lemmas_1, candidates, [activations[i] for i in active])
+
+    def _houdini(self, init, trans, lemmas, processes=1):
+        '''
+        Returns the indexes of the largest subset of the lemmas that are
+        (mutually) inductive. The lemmas that do not hold in the initial
+        states are removed, and then the step is checked assuming all the
+        remaining lemmas, removing the failing ones until a fixpoint.
+        With more than one process, the lemmas to check in the initial
+        states are split among forked workers, while the step is checked
+        by a single solver that is kept across the iterations
+        '''
+
+        self._lemmas_step = None
+
+        candidates = list(range(len(lemmas)))
+        if (processes <= 1) or (len(candidates) <= 1):
+            failed = self._failing_lemmas_init(init, lemmas, candidates)
+        else:
+            chunks = [candidates[i::processes] for i in range(min(processes, len(candidates)))]
+            failed = []
+            for (status, result) in ProcessPool(processes).imap(lambda chunk: self._failing_lemmas_init(init, lemmas, chunk), chunks):
+                if status == ERROR:
+                    Logger.error("Lemmas checking failed: %s"%result)
+                failed += result
+
+        active = [i for i in candidates if i not in failed]
+        Logger.log("%s lemmas fail for I -> L"%len(failed), 1)
+
+        rounds = 0
+        while len(active) > 0:
+            rounds += 1
+            Logger.inline("Lemmas round %s R:%s F:%s"%(rounds, len(active), len(lemmas)-len(active)), \
+                          0, not(Logger.level(1)))
+            failed = self._failing_lemmas_step(trans, lemmas, active, active)
+            Logger.log("%s lemmas fail for L & T -> L' (%s lemmas)"%(len(failed), len(active)), 1)
+            if len(failed) == 0:
+                break
+            active = [i for i in active if i not in failed]
 
-            if res:
-                Logger.log("Lemma \"%s\" failed for I -> L"%lemma, 2)
-                return False
-
-            Logger.log("Lemma \"%s\" holds for I -> L"%lemma, 2)
-            return True
+        Logger.clear_inline(0, not(Logger.level(1)))
 
+        return active
 
     def _suff_lemmas(self, prop, lemmas):
         self._reset_assertions(self.solver)
@@ -338,69 +572,41 @@ class BMCSolver(object):
         return True
 
 
-    def add_lemmas(self, hts, prop, lemmas):
+    def add_lemmas(self, hts, prop, lemmas, processes=1):
         if len(lemmas) == 0:
             return (hts, False)
 
-        self._reset_assertions(self.solver)
+        lemmas = list(lemmas)
 
-        h_init = hts.single_init()
-        h_trans = hts.single_trans()
-
-        holding_lemmas = []
-        lindex = 1
-        nlemmas = len(lemmas)
-        tlemmas = 0
-        flemmas = 0
-        for lemma in lemmas:
-            Logger.log("\nChecking Lemma %s/%s"%(lindex,nlemmas), 1)
-            invar = hts.single_invar()
-            init = And(h_init, invar)
-            trans = And(invar, h_trans, TS.to_next(invar))
-            if self._check_lemma(hts, lemma, init, trans):
-                holding_lemmas.append(lemma)
-                hts.add_assumption(lemma)
-                hts.reset_formulae()
-
-                Logger.log("Lemma %s holds"%(lindex), 1)
-                tlemmas += 1
-                if self._suff_lemmas(prop, holding_lemmas):
-                    return (hts, True)
-            else:
-                Logger.log("Lemma %s does not hold"%(lindex), 1)
-                flemmas += 1
+        invar = hts.single_invar()
+        init = And(hts.single_init(), invar)
+        trans = And(invar, hts.single_trans(), TS.to_next(invar))
 
-            msg = "%s T:%s F:%s U:%s"%(status_bar((float(lindex)/float(nlemmas)), False), tlemmas, flemmas, (nlemmas-lindex))
-            Logger.inline(msg, 0, not(Logger.level(1)))
-            lindex += 1
+        Logger.log("\nChecking %s lemmas"%(len(lemmas)), 1)
+        holding_lemmas = [lemmas[i] for i in self._houdini(init, trans, lemmas, processes)]
 
-        Logger.clear_inline(0, not(Logger.level(1)))
+        Logger.log("Lemmas T:%s F:%s"%(len(holding_lemmas), len(lemmas)-len(holding_lemmas)), 1)
 
         for lemma in holding_lemmas:
             hts.add_assumption(lemma)
+        hts.reset_formulae()
+
+        if (len(holding_lemmas) > 0) and self._suff_lemmas(prop, holding_lemmas):
+            return (hts, True)
+
         return (hts, False)
 
     def _remap_model_fwd(self, vars, model, k):
         return model
 
     def _remap_model_bwd(self, vars, model, k):
-        retmodel = dict()
-
-        for var in vars:
-            for t in range(k+1):
-                if TS.get_ptimed(var, k-t) in model:
-                    retmodel[TS.get_timed(var, t)] = model[TS.get_ptimed(var, k-t)]
-
-        return retmodel
+        # the unroller knows the variable and the time of each of its symbols
+        return self.unroller.remap_backward(model, k)
 
     def _remap_model_zz(self, vars, model, k):
-        retmodel = dict([el for el in dict(model).items() if not TS.is_ptimed(el[0])])
-
-        for var in vars:
-            for t in range(int(k/2)+1, k+1, 1):
-                retmodel[TS.get_timed(var, t)] = model[TS.get_ptimed(var, k-t)]
-
-        return retmodel
+        # the forward unrolling covers the first zz_forward steps, and the
+        # backward one the remaining ones
+        return self.unroller.remap_zigzag(model, k, self.zz_forward)
 
     def generate_trace(self, \
                        model, \
@@ -409,7 +615,8 @@ class BMCSolver(object):
                        find_loop=False):
 
         trace = Trace()
-        trace.model = model
+        # only the variables of the system are kept in the trace
+        trace.model = TraceModel.from_model(model, self.hts.vars, length)
         trace.length = length
         trace.infinite = find_loop
         trace.prop_vars = xvars
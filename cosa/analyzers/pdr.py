@@ -0,0 +1,310 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+
+from pysmt.shortcuts import And, Not, Implies, EqualsOrIff, Symbol, BOOL, BV, BVExtract
+
+from cosa.utils.logger import Logger
+from cosa.utils.formula_mngm import get_free_variables
+from cosa.representation import TS
+
+PDR_ACT = "__PDR_ACT_%s"
+INIT = "INIT"
+TRANS = "TRANS"
+
+class ProofObligation(object):
+    '''
+    A state (cube) that has to be blocked at a given frame, together with
+    the obligation of its successor, which links it to the bad state
+    '''
+
+    level = None
+    cube = None
+    succ = None
+
+    def __init__(self, level, cube, succ=None):
+        self.level = level
+        self.cube = cube
+        self.succ = succ
+
+    def path(self):
+        ret = []
+        po = self
+        while po is not None:
+            ret.append(po.cube)
+            po = po.succ
+        return ret
+
+class PDR(object):
+    '''
+    Property Directed Reachability (IC3) on top of the BMC solver primitives
+
+    Cubes are frozensets of equalities between state variables and values,
+    frame i (i > 0) is the conjunction of the negation of the cubes blocked
+    at level j >= i, and frame 0 is the initial states. The frames, the
+    initial states, and the transition relation are all asserted once in a
+    single incremental solver, guarded by activation literals.
+    '''
+
+    mc = None
+    hts = None
+    solver = None
+    frames = None
+    depth = None
+    state_vars = None
+
+    def __init__(self, mc, hts):
+        self.mc = mc
+        self.hts = hts
+        self.frames = None
+        self.activations = {}
+        self.lit_var = {}
+
+    def _act(self, label):
+        if label not in self.activations:
+            self.activations[label] = Symbol(PDR_ACT%label, BOOL)
+        return self.activations[label]
+
+    def _cube_at_time(self, cube, t):
+        # the literals are unrolled one by one, since they are shared
+        # among many cubes while the cubes themselves are seldom reused
+        return And([self.mc.at_time(l, t) for l in sorted(cube, key=lambda l: l.node_id())])
+
+    def _literals(self, var, value):
+        '''
+        Bit-vectors are split into one literal per bit, which allows the
+        generalization to block sets of values instead of single values
+        '''
+
+        if (not var.symbol_type().is_bv_type()) or (var.bv_width() == 1):
+            lit = EqualsOrIff(var, value)
+            self.lit_var[lit] = var
+            return [lit]
+
+        value = value.constant_value()
+        ret = []
+        for i in range(var.bv_width()):
+            lit = EqualsOrIff(BVExtract(var, i, i), BV((value >> i) & 1, 1))
+            self.lit_var[lit] = var
+            ret.append(lit)
+        return ret
+
+    def _get_cube(self):
+        model = self.solver.solver.get_model()
+        cube = []
+        for v in self.state_vars:
+            cube += self._literals(v, model.get_value(TS.get_timed(v, 0)))
+        return frozenset(cube)
+
+    def _query(self, level, formula, trans=False):
+        '''
+        Checks the satisfiability of F_level & formula (& T), and returns
+        the cube at time 0 if satisfiable, None if unsatisfiable
+        '''
+
+        mc = self.mc
+
+        if level == 0:
+            active = [self._act(INIT)]
+        else:
+            active = [self._act(i) for i in range(level, len(self.frames))]
+        if trans:
+            active.append(self._act(TRANS))
+
+        mc._push(self.solver)
+        mc._add_assertion(self.solver, And(active))
+        mc._add_assertion(self.solver, formula)
+
+        ret = None
+        if mc._solve(self.solver):
+            ret = self._get_cube()
+
+        mc._pop(self.solver)
+
+        return ret
+
+    def _intersects_init(self, cube):
+        return self._query(0, self._cube_at_time(cube, 0)) is not None
+
+    def _relative_inductive(self, cube, level):
+        '''
+        Checks F_level-1 & !c & T -> !c', returns the predecessor if it fails
+        '''
+
+        formula = And(Not(self._cube_at_time(cube, 0)), self._cube_at_time(cube, 1))
+        return self._query(level-1, formula, trans=True)
+
+    def _is_blocked(self, cube, level):
+        for i in range(level, len(self.frames)):
+            for blocked in self.frames[i]:
+                if blocked <= cube:
+                    return True
+        return False
+
+    def _generalize(self, cube, level):
+        '''
+        Drops first whole variables and then single literals from the cube,
+        as long as it remains disjoint from init and relative inductive
+        '''
+
+        def drop(cube, lits):
+            candidate = cube - lits
+            if (len(candidate) == 0) or (candidate == cube):
+                return cube
+            if self._intersects_init(candidate):
+                return cube
+            if self._relative_inductive(candidate, level) is None:
+                return candidate
+            return cube
+
+        for v in self.state_vars:
+            cube = drop(cube, frozenset([l for l in cube if self.lit_var[l] == v]))
+
+        for lit in sorted(cube, key=lambda l: l.node_id()):
+            cube = drop(cube, frozenset([lit]))
+
+        return cube
+
+    def _add_blocked(self, cube, level):
+        for i in range(1, level+1):
+            self.frames[i] = [c for c in self.frames[i] if not (cube <= c)]
+
+        self.frames[level].append(cube)
+        formula = Implies(self._act(level), Not(self._cube_at_time(cube, 0)))
+        self.mc._add_assertion(self.solver, formula, "Blocked cube at level %s"%level)
+
+    def _block(self, po):
+        '''
+        Recursively blocks the bad cube, returns the obligation of the
+        initial state of the counterexample if the cube is reachable
+        '''
+
+        count = 0
+        queue = [(po.level, count, po)]
+
+        while queue:
+            (level, _, po) = heapq.heappop(queue)
+
+            if self._is_blocked(po.cube, level):
+                continue
+
+            if self._intersects_init(po.cube):
+                return po
+
+            pred = self._relative_inductive(po.cube, level)
+
+            if pred is not None:
+                count += 1
+                heapq.heappush(queue, (level-1, count, ProofObligation(level-1, pred, po)))
+                heapq.heappush(queue, (level, count, po))
+                continue
+
+            cube = self._generalize(po.cube, level)
+
+            # pushing the generalized cube as far as possible
+            while (level < self.depth) and (self._relative_inductive(cube, level+1) is None):
+                level += 1
+
+            Logger.log("Blocked cube of size %s at level %s"%(len(cube), level), 2)
+            self._add_blocked(cube, level)
+
+            if level < self.depth:
+                count += 1
+                heapq.heappush(queue, (level+1, count, ProofObligation(level+1, po.cube, po.succ)))
+
+        return None
+
+    def _propagate(self):
+        for i in range(1, self.depth):
+            for cube in list(self.frames[i]):
+                if self._query(i, self._cube_at_time(cube, 1), trans=True) is None:
+                    self.frames[i].remove(cube)
+                    self._add_blocked(cube, i+1)
+
+            if len(self.frames[i]) == 0:
+                return i
+
+        return None
+
+    def _counterexample(self, init, trans, invar, nprop, path):
+        mc = self.mc
+        solver = self.solver.copy("pdr_cex")
+
+        t = len(path)-1
+
+        mc._reset_assertions(solver)
+        mc._add_assertion(solver, mc.at_time(And(init, invar), 0))
+        mc._add_assertion(solver, mc.unroll(trans, invar, t))
+        mc._add_assertion(solver, mc.at_time(nprop, t))
+
+        for i in range(len(path)):
+            mc._add_assertion(solver, self._cube_at_time(path[i], i))
+
+        if not mc._solve(solver):
+            Logger.warning("Unable to concretize the PDR counterexample")
+            return (t, None)
+
+        Logger.log("Counterexample found with k=%s"%(t), 1)
+        return (t, mc._get_model(solver))
+
+    def solve(self, prop, k):
+        mc = self.mc
+        hts = self.hts
+
+        if TS.has_next(prop):
+            Logger.error("Invariant checking with next variables is not supported by PDR")
+
+        init = hts.single_init()
+        trans = hts.single_trans()
+        invar = hts.single_invar()
+        nprop = Not(prop)
+
+        # the cubes range over the variables that are updated by the
+        # transition relation, the others are treated as inputs
+        state_vars = set([v for v in hts.vars if TS.get_prime(v) in get_free_variables(trans)])
+        self.state_vars = sorted(state_vars | hts.state_vars, key=lambda v: v.symbol_name())
+
+        self.solver = mc.solver.copy("pdr")
+        mc._reset_assertions(self.solver)
+
+        mc._add_assertion(self.solver, mc.at_time(invar, 0), "invar")
+        mc._add_assertion(self.solver, Implies(self._act(INIT), mc.at_time(init, 0)), "init")
+        mc._add_assertion(self.solver, Implies(self._act(TRANS), \
+                                                And(mc.at_time(trans, 0), mc.at_time(invar, 1))), "trans")
+
+        self.frames = [[], []]
+        self.depth = 1
+
+        while True:
+            Logger.log("\nSolving for k=%s"%(self.depth), 1)
+
+            while True:
+                bad = self._query(self.depth, mc.at_time(nprop, 0))
+                if bad is None:
+                    break
+
+                cex = self._block(ProofObligation(self.depth, bad))
+                if cex is not None:
+                    return self._counterexample(init, trans, invar, nprop, cex.path())
+
+            Logger.log("No counterexample found with k=%s"%(self.depth), 1)
+            Logger.msg(".", 0, not(Logger.level(1)))
+
+            if self.depth >= k:
+                return (self.depth, None)
+
+            self.frames.append([])
+            self.depth += 1
+
+            fixpoint = self._propagate()
+            if fixpoint is not None:
+                Logger.log("Proof found with k=%s (inductive frame %s)"%(self.depth, fixpoint), 1)
+                return (self.depth, True)
@@ -0,0 +1,199 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+from multiprocessing.connection import wait
+
+from cosa.utils.logger import Logger
+
+OK = "OK"
+ERROR = "ERROR"
+
+def _run_task(connection, name, function, args):
+    try:
+        result = (OK, function(*args))
+    except BaseException as e:
+        result = (ERROR, "%s: %s"%(type(e).__name__, e))
+
+    connection.send((name, result))
+    connection.close()
+
+class Portfolio(object):
+    '''
+    Runs alternative solving tasks in parallel and returns as soon as one
+    of them provides a conclusive result.
+
+    The workers are forked, hence they share the model of the parent
+    copy-on-write without pickling it, and each one reports its result
+    over a dedicated pipe. The parent sleeps on the pipes, and wakes up
+    as soon as a result is available (or a worker dies). The workers
+    that are still running are cancelled once the result is known.
+    The results have to be picklable: formulae should be converted with
+    to_portable (see cosa.utils.formula_mngm).
+    '''
+
+    tasks = None
+    workers = None
+
+    def __init__(self):
+        self.tasks = []
+        self.workers = {}
+
+    def add_task(self, name, function, *args):
+        if name in [t[0] for t in self.tasks]:
+            Logger.error("Task \"%s\" already defined"%name)
+        self.tasks.append((name, function, args))
+
+    def _start(self):
+        context = multiprocessing.get_context("fork")
+
+        for (name, function, args) in self.tasks:
+            (receiver, sender) = context.Pipe(duplex=False)
+            process = context.Process(target=_run_task, args=(sender, name, function, args))
+            process.daemon = True
+            process.start()
+            # the parent keeps only the receiving end, so that a dead
+            # worker is detected as EOF on its pipe
+            sender.close()
+            self.workers[receiver] = (name, process)
+            Logger.log("Started \"%s\" (pid %s)"%(name, process.pid), 1)
+
+    def cancel(self):
+        for (name, process) in self.workers.values():
+            if process.is_alive():
+                Logger.log("Cancelling \"%s\""%(name), 1)
+                process.terminate()
+
+        for (receiver, (name, process)) in self.workers.items():
+            process.join()
+            receiver.close()
+
+        self.workers = {}
+
+    def run(self, is_conclusive):
+        '''
+        Returns the list of (name, result) pairs that were collected before
+        the first conclusive result (included), in order of completion
+        '''
+
+        results = []
+
+        try:
+            self._start()
+            pending = list(self.workers.keys())
+
+            while pending:
+                for receiver in wait(pending):
+                    pending.remove(receiver)
+                    name = self.workers[receiver][0]
+
+                    try:
+                        (name, (status, result)) = receiver.recv()
+                    except EOFError:
+                        Logger.warning("Worker \"%s\" terminated without result"%name)
+                        continue
+
+                    if status == ERROR:
+                        Logger.warning("Worker \"%s\" failed with %s"%(name, result))
+                        continue
+
+                    Logger.log("Solver done: %s"%(name), 1)
+                    results.append((name, result))
+
+                    if is_conclusive(result):
+                        return results
+        finally:
+            self.cancel()
+
+        return results
+
+class ProcessPool(object):
+    '''
+    Applies a function to a sequence of items in parallel, with at most
+    `processes` workers running at the same time.
+
+    Each worker is forked when its item is taken from the sequence, hence
+    it inherits copy-on-write the state of the parent at that point (e.g.,
+    the parsed model and the setup of the problem), and only the results
+    are pickled. The workers are not daemonic, so that they can run their
+    own portfolio.
+    '''
+
+    processes = None
+    workers = None
+
+    def __init__(self, processes):
+        self.processes = max(1, processes)
+        self.workers = {}
+
+    def _start(self, index, function, item):
+        context = multiprocessing.get_context("fork")
+
+        (receiver, sender) = context.Pipe(duplex=False)
+        process = context.Process(target=_run_task, args=(sender, index, function, (item,)))
+        process.start()
+        sender.close()
+        self.workers[receiver] = (index, process)
+
+    def terminate(self):
+        for (receiver, (_, process)) in self.workers.items():
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            receiver.close()
+
+        self.workers = {}
+
+    def imap(self, function, items):
+        '''
+        Yields the pairs (status, result) in the same order of the items, as
+        soon as all the previous ones are available. The status is ERROR if
+        the function raised an exception, and result is its message
+        '''
+
+        items = iter(items)
+        results = {}
+        index = 0
+        next_result = 0
+        exhausted = False
+
+        try:
+            while True:
+                while (not exhausted) and (len(self.workers) < self.processes):
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+
+                    self._start(index, function, item)
+                    index += 1
+
+                while next_result in results:
+                    yield results.pop(next_result)
+                    next_result += 1
+
+                if len(self.workers) == 0:
+                    if exhausted:
+                        break
+                    continue
+
+                for receiver in wait(list(self.workers.keys())):
+                    (worker_index, process) = self.workers.pop(receiver)
+
+                    try:
+                        results[worker_index] = receiver.recv()[1]
+                    except EOFError:
+                        results[worker_index] = (ERROR, "worker terminated without result")
+
+                    receiver.close()
+                    process.join()
+        finally:
+            self.terminate()
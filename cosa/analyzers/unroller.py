@@ -0,0 +1,225 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pysmt.shortcuts import get_env
+
+from cosa.representation import TS, NEXT, PREV
+
+CURR = 0
+
+class FrameTemplate(object):
+    '''
+    A formula compiled once into a flat list of node constructors.
+
+    The variable-free subterms (constants, parameters, ...) are shared by
+    every frame, while the variable-dependent part of the DAG is rebuilt
+    for each frame by replaying the constructors over the frame symbols,
+    without any walker dispatch or per-call memoization tables.
+    '''
+
+    formula = None
+    slots = None
+    constants = None
+    instructions = None
+    root = None
+
+    def __init__(self, formula, is_slot):
+        self.formula = formula
+        self.slots = []
+        self.constants = []
+        self.instructions = []
+        self.root = None
+
+        self._compile(formula, is_slot)
+
+    def _compile(self, formula, is_slot):
+        ground = set([])
+        visited = set([])
+        instructions = []
+
+        # iterative post-order visit of the DAG
+        stack = [(formula, False)]
+        while stack:
+            (node, expanded) = stack.pop()
+            if node in visited:
+                continue
+
+            if node.is_symbol():
+                visited.add(node)
+                if is_slot(node):
+                    self.slots.append(node)
+                else:
+                    ground.add(node)
+                continue
+
+            if not expanded:
+                stack.append((node, True))
+                for arg in node.args():
+                    if arg not in visited:
+                        stack.append((arg, False))
+                continue
+
+            visited.add(node)
+            if all(arg in ground for arg in node.args()):
+                ground.add(node)
+            else:
+                instructions.append(node)
+
+        if formula in ground:
+            self.root = formula
+            return
+
+        # the values of a frame are laid out as constants, slots, and
+        # then the rebuilt nodes in topological order
+        positions = {}
+        for node in instructions:
+            for arg in node.args():
+                if (arg in ground) and (arg not in positions):
+                    positions[arg] = len(self.constants)
+                    self.constants.append(arg)
+
+        for node in self.slots:
+            positions[node] = len(positions)
+
+        for node in instructions:
+            args = tuple([positions[arg] for arg in node.args()])
+            self.instructions.append((node.node_type(), args, node._content.payload, node.get_type()))
+            positions[node] = len(positions)
+
+        self.root = positions[formula]
+
+    def instantiate(self, symbols):
+        if type(self.root) != int:
+            return self.root
+
+        mgr = get_env().formula_manager
+        if hasattr(mgr, "create_typed_node"):
+            create_node = mgr.create_typed_node
+        else:
+            create_node = lambda node_type, args, payload, _: mgr.create_node(node_type, args, payload)
+
+        values = self.constants + symbols
+        for (node_type, args, payload, node_ty) in self.instructions:
+            values.append(create_node(node_type, tuple([values[i] for i in args]), payload, node_ty))
+
+        return values[self.root]
+
+class FrameUnroller(object):
+    '''
+    Produces timed copies of formulae over the variables of a system.
+
+    Forward frames map v, v', and prev(v) of frame t into v@t, v@t+1 and
+    v@t-1, while backward frames map them into v@Pt+1, v@Pt and v@Pt+2
+    (see BMCSolver.at_time and BMCSolver.at_ptime).
+    The formulae are compiled into FrameTemplate objects the first time
+    they are unrolled, and the per-frame symbol tables are only populated
+    with the symbols that actually occur in the compiled formulae.
+    '''
+
+    varnames = None
+
+    def __init__(self, vars):
+        self.varnames = set([v.symbol_name() for v in vars])
+        self._templates = {}
+        self._kinds = {}
+        self._frames = {}
+        self._symbols = {}
+        self._origins = {}
+
+    def _kind(self, symbol):
+        if symbol in self._kinds:
+            return self._kinds[symbol]
+
+        name = symbol.symbol_name()
+        kind = None
+
+        if name in self.varnames:
+            kind = (name, CURR)
+        elif TS.is_prime_name(name) and (name[:-len(NEXT)] in self.varnames):
+            kind = (name[:-len(NEXT)], 1)
+        elif TS.is_prev_name(name) and (name[:-len(PREV)] in self.varnames):
+            kind = (name[:-len(PREV)], -1)
+
+        self._kinds[symbol] = kind
+        return kind
+
+    def _is_slot(self, symbol):
+        return self._kind(symbol) is not None
+
+    def template(self, formula):
+        if formula not in self._templates:
+            self._templates[formula] = FrameTemplate(formula, self._is_slot)
+
+        return self._templates[formula]
+
+    def _symbol(self, name, t, backward, symbol_type):
+        # negative times are mapped to 0, as in TS.get_timed_name
+        key = (name, max(t, 0), backward)
+        if key not in self._symbols:
+            timed_name = TS.get_ptimed_name(name, t) if backward else TS.get_timed_name(name, t)
+            symbol = get_env().formula_manager.Symbol(timed_name, symbol_type)
+            self._symbols[key] = symbol
+            self._origins[symbol] = key
+        return self._symbols[key]
+
+    def _frame_symbols(self, slots, t, backward):
+        key = (backward, t)
+        if key not in self._frames:
+            self._frames[key] = {}
+        table = self._frames[key]
+
+        ret = []
+        for slot in slots:
+            if slot not in table:
+                (name, offset) = self._kind(slot)
+                if backward:
+                    table[slot] = self._symbol(name, t+1-offset, True, slot.symbol_type())
+                else:
+                    table[slot] = self._symbol(name, t+offset, False, slot.symbol_type())
+            ret.append(table[slot])
+
+        return ret
+
+    def remap_backward(self, model, k, k_start=0):
+        '''
+        Maps a model of a backward unrolling of depth k into the forward
+        one, by shifting the time of the symbols of the frames (v@Pj is v@k-j).
+        Only the times from k_start to k are kept, and the symbols that are
+        not created by the unroller are dropped
+        '''
+
+        ret = {}
+        for (symbol, value) in model.items():
+            origin = self._origins.get(symbol)
+            if (origin is None) or (not origin[2]) or (origin[1] > k-k_start):
+                continue
+            ret[self._symbol(origin[0], k-origin[1], False, symbol.symbol_type())] = value
+        return ret
+
+    def remap_zigzag(self, model, k, k_forward):
+        '''
+        Maps a model of a forward unrolling of depth k_forward, which meets a
+        backward one of depth k-k_forward, into a forward model of depth k
+        '''
+
+        ret = self.remap_backward(model, k, k_forward+1)
+        for (symbol, value) in model.items():
+            origin = self._origins.get(symbol)
+            if (origin is not None) and (not origin[2]) and (origin[1] <= k_forward):
+                ret[symbol] = value
+        return ret
+
+    def at_time(self, formula, t):
+        template = self.template(formula)
+        return template.instantiate(self._frame_symbols(template.slots, t, False))
+
+    def at_ptime(self, formula, t):
+        template = self.template(formula)
+        return template.instantiate(self._frame_symbols(template.slots, t, True))
@@ -0,0 +1,265 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from cosa.analyzers.portfolio import ProcessPool, ERROR
+from cosa.environment import reset_env
+from cosa.options import cosa_option_manager
+from cosa.shell import run_problems
+from cosa.utils.logger import Logger
+from cosa.utils.profiler import Profiler, PARSING, FLATTENING, UNROLLING, ASSERTING, SOLVING, \
+     SOLVER_CALLS, ASSERTIONS, PEAK_MEMORY, PROFILE_JSON, peak_memory
+from cosa.utils.synthetic import generate, knobs, FAMILIES
+
+BENCHMARK_VERSION = 1
+
+COSADIR = ".CoSA"
+SYNTHETIC = "synthetic"
+
+DEFAULT_SUITES = ["tests", "examples"]
+DEFAULT_FAMILIES = ["counter:8,16,32", "chain:16,64", "fifo:4,8", "pipeline:8,32", "pipeline:32:format=btor", \
+                    "datapath:16,64", "memory:4,8", "clocks:2,4", "explicit:16"]
+
+# status of the runs
+OK = "ok"
+UNEXPECTED = "unexpected"
+
+# measures compared with the baseline
+TIMES = ["time", "parse", "encode", "solve"]
+MEMORY = "peak_rss"
+
+def problem_files(suite):
+    '''
+    Returns the problem files of a directory, as in tests/test_correctness.py
+    '''
+
+    files = []
+    for (directory, _, filenames) in os.walk(suite):
+        if (COSADIR in directory) or ("__" in directory):
+            continue
+        files += [os.path.join(directory, f) for f in filenames if ("problem" in f) and (f[-4:] == ".txt")]
+    return sorted(files)
+
+def synthetic_files(families, workdir):
+    '''
+    Generates the models of the families (e.g., counter:8,16 or
+    pipeline:16,32:width=64,format=btor), and returns the pairs (name,
+    problem file)
+    '''
+
+    files = []
+    for family in families:
+        fields = family.split(":")
+        (name, sizes) = (fields[0], fields[1] if len(fields) > 1 else "8")
+        family_knobs = {}
+        for knob in (fields[2].split(",") if len(fields) > 2 else []):
+            if "=" not in knob:
+                Logger.error("Knob \"%s\" of the model family \"%s\" is not in the form knob=value"%(knob, name))
+            (knob, value) = knob.split("=", 1)
+            family_knobs[knob] = int(value) if value.isdigit() else value
+        for size in [int(s) for s in sizes.split(",")]:
+            model = generate(name, size, **family_knobs)
+            files.append(("%s/%s"%(SYNTHETIC, model.name), model.write(os.path.join(workdir, SYNTHETIC, model.name))))
+    return files
+
+def run_benchmark(problem_file, solver, strategy, profile):
+    '''
+    Solves the problems of the file, and returns the measures of the run
+
+    The peak memory of a forked process starts from the one of its parent,
+    hence the peak_rss of the run is the increase over the peak at the
+    beginning of the run
+    '''
+
+    base_rss = peak_memory() or 0
+    reset_env()
+    start = time.time()
+
+    # the outcome of the problems is taken from the problems manager
+    saved_stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        problems_manager = cosa_option_manager.read_problem_file(problem_file, \
+                                                                 solver_name=solver, \
+                                                                 strategy=strategy, \
+                                                                 verbosity=0, \
+                                                                 time_profile=profile, \
+                                                                 time_profile_format=PROFILE_JSON)
+        cosa_option_manager._option_handling(problems_manager)
+        problems_manager.freeze()
+        status = run_problems(problems_manager)
+    finally:
+        sys.stdout.close()
+        sys.stdout = saved_stdout
+
+    report = Profiler.report()
+
+    problems = report["problems"].values()
+    span = lambda name: sum([measures["spans"][name]["time"] for measures in problems if name in measures["spans"]])
+    counter = lambda name: sum([measures["counters"].get(name, 0) for measures in problems])
+
+    # the flattening is also done outside of the parsing (e.g., by the
+    # model extensions), hence only the nested one is subtracted
+    parsing = [(start, start+duration) for (_, name, start, duration, _) in Profiler.spans if name == PARSING]
+    nested_flattening = sum([duration for (_, name, start, duration, _) in Profiler.spans \
+                             if (name == FLATTENING) and any([s <= start <= e for (s, e) in parsing])])
+
+    results = dict([(problem.name, str(problems_manager.get_problem_status(problem))) \
+                    for problem in problems_manager.problems])
+
+    return {"status": OK if status == 0 else UNEXPECTED, \
+            "results": results, \
+            "time": time.time()-start, \
+            "parse": span(PARSING) - nested_flattening, \
+            "encode": span(FLATTENING) + span(UNROLLING) + span(ASSERTING), \
+            "solve": span(SOLVING), \
+            "solver_calls": counter(SOLVER_CALLS), \
+            "assertions": counter(ASSERTIONS), \
+            "peak_rss": max([0]+[(measures["maxima"].get(PEAK_MEMORY) or 0)-base_rss for measures in problems])}
+
+def run_benchmarks(runs, jobs, workdir):
+    '''
+    Runs each benchmark in a forked process, which isolates the runs
+    '''
+
+    def run(item):
+        (name, problem_file, solver, strategy) = item
+        profile = os.path.join(workdir, "profiles", "%s-%s-%s.json"%(name.replace(os.sep, "_"), solver, strategy))
+        return run_benchmark(problem_file, solver, strategy, profile)
+
+    if not os.path.exists(os.path.join(workdir, "profiles")):
+        os.makedirs(os.path.join(workdir, "profiles"))
+
+    results = {}
+    pool = ProcessPool(jobs)
+    for (item, (status, result)) in zip(runs, pool.imap(run, runs)):
+        (name, _, solver, strategy) = item
+        key = "%s|%s|%s"%(name, solver, strategy)
+        if status == ERROR:
+            result = {"status": ERROR, "error": str(result)}
+        results[key] = result
+        Logger.log("%-60s %-10s %s"%(key, result["status"], \
+                                     ("%.2fs"%result["time"]) if "time" in result else result["error"]), 0)
+
+    return results
+
+def compare(results, baseline, tolerance, min_time, min_memory):
+    '''
+    Returns the list of the regressions of the results with respect to the baseline
+    '''
+
+    regressions = []
+    for (key, base) in sorted(baseline["runs"].items()):
+        if key not in results:
+            regressions.append((key, "missing run"))
+            continue
+
+        result = results[key]
+        if result["status"] != base["status"]:
+            regressions.append((key, "status %s (was %s)"%(result["status"], base["status"])))
+            continue
+        if result["status"] == ERROR:
+            continue
+
+        for (problem, status) in sorted(base["results"].items()):
+            if result["results"].get(problem) != status:
+                regressions.append((key, "%s is %s (was %s)"%(problem, result["results"].get(problem), status)))
+
+        for measure in TIMES:
+            if (result[measure] > base[measure]*(1+tolerance)) and (result[measure]-base[measure] > min_time):
+                regressions.append((key, "%s %.3fs (was %.3fs)"%(measure, result[measure], base[measure])))
+
+        if (result[MEMORY] > base[MEMORY]*(1+tolerance)) and (result[MEMORY]-base[MEMORY] > min_memory):
+            regressions.append((key, "%s %sKB (was %sKB)"%(MEMORY, result[MEMORY], base[MEMORY])))
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="CoSA benchmark runner")
+
+    parser.add_argument('suites', metavar='<directory>', type=str, nargs='*', default=None,
+                        help='directories with the problem files. (Default is \"%s\")'%(", ".join(DEFAULT_SUITES)))
+    parser.add_argument('--families', metavar='<family:sizes[:knobs]>', type=str, nargs='*', default=DEFAULT_FAMILIES,
+                        help='generated model families, their sizes and knobs (%s). (Default is \"%s\")'% \
+                        ("; ".join(["%s: %s"%(f, ", ".join(sorted(knobs(f)))) for f in sorted(FAMILIES) if knobs(f)]), \
+                         " ".join(DEFAULT_FAMILIES)))
+    parser.add_argument('--solvers', metavar='<solvers>', type=str, default="msat",
+                        help='comma separated list of solvers. (Default is \"%s\")'%("msat"))
+    parser.add_argument('--strategies', metavar='<strategies>', type=str, default="FWD",
+                        help='comma separated list of verification strategies. (Default is \"%s\")'%("FWD"))
+    parser.add_argument('-j', '--jobs', metavar='<integer>', type=int, default=1,
+                        help='number of benchmarks running in parallel. (Default is \"%s\")'%(1))
+    parser.add_argument('-o', '--output', metavar='<json file>', type=str, default=None,
+                        help='file where the results are written.')
+    parser.add_argument('--baseline', metavar='<json file>', type=str, default=None,
+                        help='results to compare with, reporting the regressions.')
+    parser.add_argument('--tolerance', metavar='<float>', type=float, default=0.25,
+                        help='relative slowdown (or memory increase) considered as a regression. (Default is \"%s\")'%(0.25))
+    parser.add_argument('--min-time', metavar='<seconds>', type=float, default=0.1,
+                        help='minimum absolute slowdown considered as a regression. (Default is \"%s\")'%(0.1))
+    parser.add_argument('--min-memory', metavar='<KB>', type=int, default=10240,
+                        help='minimum absolute memory increase considered as a regression. (Default is \"%s\")'%(10240))
+    parser.add_argument('--workdir', metavar='<directory>', type=str, default=None,
+                        help='directory of the generated models and of the profiles of the runs.')
+
+    args = parser.parse_args()
+    Logger.verbosity = 1
+
+    suites = args.suites if args.suites else [s for s in DEFAULT_SUITES if os.path.isdir(s)]
+    workdir = args.workdir if args.workdir is not None else tempfile.mkdtemp(prefix="cosa-bench-")
+
+    files = []
+    for suite in suites:
+        # the runs are named relative to the suite, independently of its location
+        parent = os.path.dirname(os.path.abspath(suite))
+        files += [(os.path.relpath(os.path.abspath(f), parent), f) for f in problem_files(suite)]
+    files += synthetic_files(args.families, workdir)
+
+    runs = []
+    for (name, problem_file) in files:
+        for solver in args.solvers.split(","):
+            for strategy in args.strategies.split(","):
+                runs.append((name, os.path.abspath(problem_file), solver, strategy))
+
+    Logger.log("Running %d benchmarks (workdir \"%s\")"%(len(runs), workdir), 0)
+    results = run_benchmarks(runs, args.jobs, workdir)
+
+    output = {"version": BENCHMARK_VERSION, \
+              "python": platform.python_version(), \
+              "platform": platform.platform(), \
+              "runs": results}
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=1, sort_keys=True)
+
+    if args.baseline is None:
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance, args.min_time, args.min_memory)
+    for (key, regression) in regressions:
+        Logger.log("REGRESSION %s: %s"%(key, regression), 0)
+    if len(regressions) == 0:
+        Logger.log("No regressions with respect to \"%s\""%args.baseline, 0)
+
+    return 1 if len(regressions) > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,7 +13,7 @@ from collections import defaultdict, namedtuple
 import configparser
 import itertools
 from pathlib import Path
-from typing import Callable, Dict, Sequence, NamedTuple
+from typing import Callable, Dict, Optional, Sequence, NamedTuple
 
 from cosa.analyzers.mcsolver import VerificationStrategy
 from cosa.problem import ProblemsManager, VerificationType
@@ -331,7 +331,7 @@ class CosaArgParser(argparse.ArgumentParser):
         return parser
 
     def read_problem_file(self, config_file:str,
-                          _command_line_args:Dict[str, str]=dict(),
+                          _command_line_args:Optional[Dict[str, str]]=None,
                           **kwargs)->ProblemsManager:
         '''
         Reads a problem file and then overrides defaults with command line options
@@ -340,6 +340,10 @@ class CosaArgParser(argparse.ArgumentParser):
         Users should not pass _command_line_args directly, that is for internal use only.
         Instead, pass options through keyword arguments.
         '''
+        # the options of a call are not kept for the following ones
+        if _command_line_args is None:
+            _command_line_args = dict()
+
         config_filepath = Path(config_file)
         config_args = self.parse_config(config_filepath)
         general_options = dict(config_args[GENERAL])
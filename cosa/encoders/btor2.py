@@ -23,7 +23,7 @@ from pysmt.typing import BOOL, BVType, ArrayType
 from cosa.representation import HTS, TS
 from cosa.encoders.formulae import StringParser
 from cosa.utils.logger import Logger
-from cosa.utils.formula_mngm import quote_names, B2BV, BV2B
+from cosa.utils.formula_mngm import B2BV
 from cosa.utils.generic import bin_to_dec
 from cosa.encoders.template import ModelParser
 
@@ -84,15 +84,81 @@ CONSTRAINT="constraint"
 BAD="bad"
 
 special_char_replacements = {"$": "", "\\": ".", ":": COLON_REP}
+special_char_table = str.maketrans(special_char_replacements)
 
 class BTOR2Parser(ModelParser):
+    '''
+    BTOR2 front-end
+
+    The input is read line by line, and each line is dispatched on its
+    operator to the function that builds the node. Nodes and their types are
+    stored in lists indexed by the (integer) node identifiers.
+    '''
+
     parser = None
     extensions = ["btor2","btor"]
     name = "BTOR2"
     symbolic_init = False
 
+    operators = None
+
+    nodes = None
+    types = None
+    node_covered = None
+    ts = None
+    ftrans = None
+    initlist = None
+    invarlist = None
+    invar_props = None
+    prop_count = 0
+
     def __init__(self):
-        pass
+        self.operators = {SORT: self._sort,
+                          WRITE: lambda nids: Store(*[self._node(n) for n in nids[1:4]]),
+                          READ: lambda nids: Select(self._node(nids[1]), self._node(nids[2])),
+                          ZERO: lambda nids: BV(0, self._node(nids[0]).width),
+                          ONE: lambda nids: BV(1, self._node(nids[0]).width),
+                          ONES: self._ones,
+                          REDOR: lambda nids: BVNot(BVComp(self._node(nids[1]), BV(0, self._width(nids[1])))),
+                          REDAND: lambda nids: BVComp(self._node(nids[1]), BV((2**self._width(nids[1]))-1, self._width(nids[1]))),
+                          CONSTD: lambda nids: BV(int(nids[1]), self._node(nids[0]).width),
+                          CONST: self._const,
+                          STATE: self._state,
+                          INPUT: self._input,
+                          OUTPUT: self._output,
+                          AND: self._logic_op(BVAnd, And),
+                          CONCAT: self._bv_op(BVConcat),
+                          XOR: self._logic_op(BVXor, Xor),
+                          XNOR: lambda nids: BVNot(self.operators[XOR](nids)),
+                          NAND: self._logic_op(lambda x,y: BVNot(BVAnd(x, y)), lambda x,y: Not(And(x, y))),
+                          IMPLIES: lambda nids: BVOr(BVNot(self._node(nids[1])), self._node(nids[2])),
+                          NOT: self._unary_op(BVNot, Not),
+                          NEG: self._unary_op(BVNeg, Not),
+                          UEXT: lambda nids: BVZExt(self._bv(nids[1]), int(nids[2])),
+                          SEXT: lambda nids: BVSExt(self._bv(nids[1]), int(nids[2])),
+                          OR: self._logic_op(BVOr, Or),
+                          ADD: self._bv_op(BVAdd),
+                          SUB: self._bv_op(BVSub),
+                          UGT: self._bv_op(BVUGT),
+                          UGTE: self._bv_op(BVUGE),
+                          ULT: self._bv_op(BVULT),
+                          ULTE: self._bv_op(BVULE),
+                          SGT: self._bv_op(BVSGT),
+                          SGTE: self._bv_op(BVSGE),
+                          SLT: self._bv_op(BVSLT),
+                          SLTE: self._bv_op(BVSLE),
+                          EQ: self._bv_op(BVComp),
+                          NEQ: lambda nids: BVNot(BVComp(self._node(nids[1]), self._node(nids[2]))),
+                          MUL: self._bv_op(BVMul),
+                          SLICE: lambda nids: BVExtract(self._bv(nids[1]), int(nids[3]), int(nids[2])),
+                          SLL: lambda nids: BVLShl(self._node(nids[1]), self._node(nids[2])),
+                          SRA: lambda nids: BVAShr(self._node(nids[1]), self._node(nids[2])),
+                          SRL: lambda nids: BVLShr(self._node(nids[1]), self._node(nids[2])),
+                          ITE: self._ite,
+                          NEXT: self._next,
+                          INIT: self._init,
+                          CONSTRAINT: self._constraint,
+                          BAD: self._bad}
 
     def get_model_info(self):
         return None
@@ -103,7 +169,8 @@ class BTOR2Parser(ModelParser):
                    flags:str=None)->Tuple[HTS, List[FNode], List[FNode]]:
         self.symbolic_init = config.symbolic_init
         with filepath.open("r", errors='surrogateescape') as f:
-            return self.parse_string(f.read())
+            # the file is streamed line by line
+            return self.parse_lines(f)
 
     def is_available(self):
         return True
@@ -122,304 +189,263 @@ class BTOR2Parser(ModelParser):
         return name
 
     def parse_string(self, strinput):
+        return self.parse_lines(strinput.split(NL))
+
+    def _symbol_name(self, name):
+        # remove special characters from names
+        return name.translate(special_char_table)
+
+    def _set_node(self, nid, node, nodetype):
+        if nid >= len(self.nodes):
+            missing = (nid + 1) - len(self.nodes)
+            self.nodes.extend([None]*missing)
+            self.types.extend([None]*missing)
+            self.node_covered.extend(bytes(missing))
+        self.nodes[nid] = node
+        self.types[nid] = nodetype
+
+    def _node(self, strnid):
+        nid = int(strnid)
+        if nid < 0:
+            self.node_covered[-nid] = 1
+            return Ite(self._bool(-nid), BV(0,1), BV(1,1))
+        self.node_covered[nid] = 1
+        return self.nodes[nid]
+
+    def _type(self, strnid):
+        nid = int(strnid)
+        if nid < 0:
+            return BVType(1)
+        # the types that are not known from the sort of the node are
+        # computed once
+        if self.types[nid] is None:
+            self.types[nid] = get_type(self.nodes[nid])
+        return self.types[nid]
+
+    def _width(self, strnid):
+        return self._type(strnid).width
+
+    def _bv(self, strnid):
+        if self._type(strnid) == BOOL:
+            return Ite(self._node(strnid), BV(1,1), BV(0,1))
+        return self._node(strnid)
+
+    def _bool(self, strnid):
+        if self._type(strnid) == BOOL:
+            return self._node(strnid)
+        return EqualsOrIff(self._node(strnid), BV(1,1))
+
+    def _logic_op(self, bvop, bop):
+        def op(nids):
+            if (self._type(nids[1]) == BOOL) and (self._type(nids[2]) == BOOL):
+                return bop(self._node(nids[1]), self._node(nids[2]))
+            return bvop(self._bv(nids[1]), self._bv(nids[2]))
+        return op
+
+    def _unary_op(self, bvop, bop):
+        def op(nids):
+            if self._type(nids[1]) == BOOL:
+                return bop(self._node(nids[1]))
+            return bvop(self._node(nids[1]))
+        return op
+
+    def _bv_op(self, bvop):
+        return lambda nids: bvop(self._bv(nids[1]), self._bv(nids[2]))
+
+    def _sort(self, nids):
+        (stype, *attr) = nids
+        if stype == BITVEC:
+            return BVType(int(attr[0]))
+        if stype == ARRAY:
+            return ArrayType(self._node(attr[0]), self._node(attr[1]))
+        return None
+
+    def _ones(self, nids):
+        width = self._node(nids[0]).width
+        return BV((2**width)-1, width)
+
+    def _const(self, nids):
+        width = self._node(nids[0]).width
+        try:
+            return BV(bin_to_dec(nids[1]), width)
+        except ValueError:
+            if not all([i == 'x' or i == 'z' for i in nids[1]]):
+                raise RuntimeError("If not a valid number, only support "
+                                   "all don't cares or high-impedance but got {}".format(nids[1]))
+            # create a fresh variable for this non-deterministic constant
+            node = Symbol('const_'+nids[1], BVType(width))
+            self.ts.add_state_var(node)
+            Logger.warning("Creating a fresh symbol for unsupported X/Z constant %s"%nids[1])
+            return node
+
+    def _symbol(self, nid, nids):
+        if len(nids) > 1:
+            return Symbol(self._symbol_name(nids[1]), self._node(nids[0]))
+        return Symbol((SN%nid), self._node(nids[0]))
+
+    def _state(self, nids, nid):
+        node = self._symbol(nid, nids)
+        self.ts.add_state_var(node)
+        return node
+
+    def _input(self, nids, nid):
+        node = self._symbol(nid, nids)
+        self.ts.add_input_var(node)
+        return node
+
+    def _output(self, nids):
+        # unfortunately we need to create an extra symbol just to have the output name
+        # we could be smarter about this, but then this parser can't be greedy
+        original_symbol = self._bv(nids[0])
+        output_symbol = Symbol(self._symbol_name(nids[1]), original_symbol.get_type())
+        node = EqualsOrIff(output_symbol, original_symbol)
+        self.invarlist.append(node)
+        self.ts.add_output_var(output_symbol)
+        return node
+
+    def _ite(self, nids):
+        if (self._type(nids[2]) == BOOL) or (self._type(nids[3]) == BOOL):
+            return Ite(self._bool(nids[1]), self._bv(nids[2]), self._bv(nids[3]))
+        return Ite(self._bool(nids[1]), self._node(nids[2]), self._node(nids[3]))
+
+    def _next(self, nids):
+        lval = TS.get_prime(self._node(nids[1]))
+        if (self._type(nids[1]) == BOOL) or (self._type(nids[2]) == BOOL):
+            rval = self._bv(nids[2])
+        else:
+            rval = self._node(nids[2])
+
+        # for btor, the condition is always True
+        self.ftrans.append((lval, [(TRUE(), rval)]))
+        return EqualsOrIff(lval, rval)
+
+    def _init(self, nids):
+        vartype = self._type(nids[1])
+        if (vartype == BOOL) or (self._type(nids[2]) == BOOL):
+            node = EqualsOrIff(self._bool(nids[1]), self._bool(nids[2]))
+        elif vartype.is_array_type():
+            node = EqualsOrIff(self._node(nids[1]), Array(vartype.index_type, default=self._node(nids[2])))
+        else:
+            node = EqualsOrIff(self._node(nids[1]), self._node(nids[2]))
+        self.initlist.append(node)
+        return node
+
+    def _constraint(self, nids):
+        node = self._bool(nids[0])
+        self.invarlist.append(node)
+        return node
+
+    def _bad(self, nids):
+        if len(nids) > 1:
+            assert_name = self._symbol_name(nids[1])
+            description = "Embedded assertion: {}".format(assert_name)
+        else:
+            assert_name = 'embedded_assertion_%i'%self.prop_count
+            description = 'Embedded assertion number %i'%self.prop_count
+            self.prop_count += 1
+
+        # Following problem format (name, description, strformula)
+        self.invar_props.append((assert_name, description, Not(self._bool(nids[0]))))
+        return self._node(nids[0])
+
+    def parse_lines(self, lines):
 
         hts = HTS()
-        ts = TS()
+        self.ts = ts = TS()
 
-        nodemap = {}
-        node_covered = set([])
+        self.nodes = []
+        self.types = []
+        self.node_covered = bytearray()
 
         # list of tuples of var and cond_assign_list
         # cond_assign_list is tuples of (condition, value)
         # where everything is a pysmt FNode
-        # for btor, the condition is always True
-        ftrans = []
+        self.ftrans = []
 
-        initlist = []
-        invarlist = []
+        self.initlist = []
+        self.invarlist = []
 
-        invar_props = []
+        self.invar_props = []
         ltl_props = []
 
-        prop_count = 0
-
-        # clean string input, remove special characters from names
-        for sc, rep in special_char_replacements.items():
-            strinput = strinput.replace(sc, rep)
-
-        def getnode(nid):
-            node_covered.add(nid)
-            if int(nid) < 0:
-                return Ite(BV2B(nodemap[str(-int(nid))]), BV(0,1), BV(1,1))
-            return nodemap[nid]
-
-        def binary_op(bvop, bop, left, right):
-            if (get_type(left) == BOOL) and (get_type(right) == BOOL):
-                return bop(left, right)
-            return bvop(B2BV(left), B2BV(right))
+        self.prop_count = 0
 
-        def unary_op(bvop, bop, left):
-            if (get_type(left) == BOOL):
-                return bop(left)
-            return bvop(left)
+        # the operators that also take the identifier of the node
+        named_operators = set([STATE, INPUT])
+        # the operators whose last argument is not a wire name
+        unnamed_operators = set([STATE, INPUT, OUTPUT, BAD])
+        # the nodes that are not referred by other nodes
+        root_operators = set([SORT, OUTPUT, INIT, CONSTRAINT, BAD])
+        # the operators whose result has the sort of the node, or is Boolean
+        sorted_operators = set([STATE, INPUT, ZERO, ONE, ONES, CONST, CONSTD, ADD, SUB, MUL, \
+                                CONCAT, UEXT, SEXT, SLICE, EQ, NEQ, REDOR, REDAND, READ, WRITE])
+        bool_operators = set([UGT, UGTE, ULT, ULTE, SGT, SGTE, SLT, SLTE])
 
-        for line in strinput.split(NL):
+        for line in lines:
             linetok = line.split()
-            if len(linetok) == 0:
+            if (len(linetok) == 0) or (linetok[0] == COM):
                 continue
-            if linetok[0] == COM:
-                continue
-
-            (nid, ntype, *nids) = linetok
-
-            if ntype == SORT:
-                (stype, *attr) = nids
-                if stype == BITVEC:
-                    nodemap[nid] = BVType(int(attr[0]))
-                    node_covered.add(nid)
-                if stype == ARRAY:
-                    nodemap[nid] = ArrayType(getnode(attr[0]), getnode(attr[1]))
-                    node_covered.add(nid)
-
-            if ntype == WRITE:
-                nodemap[nid] = Store(*[getnode(n) for n in nids[1:4]])
-
-            if ntype == READ:
-                nodemap[nid] = Select(getnode(nids[1]), getnode(nids[2]))
-
-            if ntype == ZERO:
-                nodemap[nid] = BV(0, getnode(nids[0]).width)
-
-            if ntype == ONE:
-                nodemap[nid] = BV(1, getnode(nids[0]).width)
-
-            if ntype == ONES:
-                width = getnode(nids[0]).width
-                nodemap[nid] = BV((2**width)-1, width)
-
-            if ntype == REDOR:
-                width = get_type(getnode(nids[1])).width
-                zeros = BV(0, width)
-                nodemap[nid] = BVNot(BVComp(getnode(nids[1]), zeros))
 
-            if ntype == REDAND:
-                width = get_type(getnode(nids[1])).width
-                ones = BV((2**width)-1, width)
-                nodemap[nid] = BVComp(getnode(nids[1]), ones)
+            (strnid, ntype, *nids) = linetok
+            nid = int(strnid)
 
-            if ntype == CONSTD:
-                width = getnode(nids[0]).width
-                nodemap[nid] = BV(int(nids[1]), width)
+            operator = self.operators.get(ntype)
+            node = None
+            if operator is not None:
+                node = operator(nids, nid) if ntype in named_operators else operator(nids)
 
-            if ntype == CONST:
-                width = getnode(nids[0]).width
-                try:
-                    nodemap[nid] = BV(bin_to_dec(nids[1]), width)
-                except ValueError:
-                    if not all([i == 'x' or i == 'z' for i in nids[1]]):
-                        raise RuntimeError("If not a valid number, only support "
-                                           "all don't cares or high-impedance but got {}".format(nids[1]))
-                    # create a fresh variable for this non-deterministic constant
-                    nodemap[nid] = Symbol('const_'+nids[1], BVType(width))
-                    ts.add_state_var(nodemap[nid])
-                    Logger.warning("Creating a fresh symbol for unsupported X/Z constant %s"%nids[1])
-
-            if ntype == STATE:
-                if len(nids) > 1:
-                    nodemap[nid] = Symbol(nids[1], getnode(nids[0]))
-                else:
-                    nodemap[nid] = Symbol((SN%nid), getnode(nids[0]))
-                ts.add_state_var(nodemap[nid])
-
-            if ntype == INPUT:
-                if len(nids) > 1:
-                    nodemap[nid] = Symbol(nids[1], getnode(nids[0]))
-                else:
-                    nodemap[nid] = Symbol((SN%nid), getnode(nids[0]))
-                ts.add_input_var(nodemap[nid])
-
-            if ntype == OUTPUT:
-                # unfortunately we need to create an extra symbol just to have the output name
-                # we could be smarter about this, but then this parser can't be greedy
-                original_symbol = B2BV(getnode(nids[0]))
-                output_symbol = Symbol(nids[1], original_symbol.get_type())
-                nodemap[nid] = EqualsOrIff(output_symbol, original_symbol)
-                invarlist.append(nodemap[nid])
-                node_covered.add(nid)
-                ts.add_output_var(output_symbol)
-
-            if ntype == AND:
-                nodemap[nid] = binary_op(BVAnd, And, getnode(nids[1]), getnode(nids[2]))
-
-            if ntype == CONCAT:
-                nodemap[nid] = BVConcat(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == XOR:
-                nodemap[nid] = binary_op(BVXor, Xor, getnode(nids[1]), getnode(nids[2]))
-
-            if ntype == XNOR:
-                nodemap[nid] = BVNot(binary_op(BVXor, Xor, getnode(nids[1]), getnode(nids[2])))
-
-            if ntype == NAND:
-                bvop = lambda x,y: BVNot(BVAnd(x, y))
-                bop = lambda x,y: Not(And(x, y))
-                nodemap[nid] = binary_op(bvop, bop, getnode(nids[1]), getnode(nids[2]))
-
-            if ntype == IMPLIES:
-                nodemap[nid] = BVOr(BVNot(getnode(nids[1])), getnode(nids[2]))
-
-            if ntype == NOT:
-                nodemap[nid] = unary_op(BVNot, Not, getnode(nids[1]))
-
-            if ntype == NEG:
-                nodemap[nid] = unary_op(BVNeg, Not, getnode(nids[1]))
-
-            if ntype == UEXT:
-                nodemap[nid] = BVZExt(B2BV(getnode(nids[1])), int(nids[2]))
-
-            if ntype == SEXT:
-                nodemap[nid] = BVSExt(B2BV(getnode(nids[1])), int(nids[2]))
-
-            if ntype == OR:
-                nodemap[nid] = binary_op(BVOr, Or, getnode(nids[1]), getnode(nids[2]))
-
-            if ntype == ADD:
-                nodemap[nid] = BVAdd(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == SUB:
-                nodemap[nid] = BVSub(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == UGT:
-                nodemap[nid] = BVUGT(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == UGTE:
-                nodemap[nid] = BVUGE(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == ULT:
-                nodemap[nid] = BVULT(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == ULTE:
-                nodemap[nid] = BVULE(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == SGT:
-                nodemap[nid] = BVSGT(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == SGTE:
-                nodemap[nid] = BVSGE(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == SLT:
-                nodemap[nid] = BVSLT(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == SLTE:
-                nodemap[nid] = BVSLE(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == EQ:
-                nodemap[nid] = BVComp(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == NEQ:
-                nodemap[nid] = BVNot(BVComp(getnode(nids[1]), getnode(nids[2])))
-
-            if ntype == MUL:
-                nodemap[nid] = BVMul(B2BV(getnode(nids[1])), B2BV(getnode(nids[2])))
-
-            if ntype == SLICE:
-                nodemap[nid] = BVExtract(B2BV(getnode(nids[1])), int(nids[3]), int(nids[2]))
-
-            if ntype == SLL:
-                nodemap[nid] = BVLShl(getnode(nids[1]), getnode(nids[2]))
-
-            if ntype == SRA:
-                nodemap[nid] = BVAShr(getnode(nids[1]), getnode(nids[2]))
-
-            if ntype == SRL:
-                nodemap[nid] = BVLShr(getnode(nids[1]), getnode(nids[2]))
-
-            if ntype == ITE:
-                if (get_type(getnode(nids[2])) == BOOL) or (get_type(getnode(nids[3])) == BOOL):
-                    nodemap[nid] = Ite(BV2B(getnode(nids[1])), B2BV(getnode(nids[2])), B2BV(getnode(nids[3])))
-                else:
-                    nodemap[nid] = Ite(BV2B(getnode(nids[1])), getnode(nids[2]), getnode(nids[3]))
-
-            if ntype == NEXT:
-                if (get_type(getnode(nids[1])) == BOOL) or (get_type(getnode(nids[2])) == BOOL):
-                    lval = TS.get_prime(getnode(nids[1]))
-                    rval = B2BV(getnode(nids[2]))
-                else:
-                    lval = TS.get_prime(getnode(nids[1]))
-                    rval = getnode(nids[2])
-
-                nodemap[nid] = EqualsOrIff(lval, rval)
-
-                ftrans.append(
-                     (lval,
-                     [(TRUE(), rval)])
-                )
-
-            if ntype == INIT:
-                if (get_type(getnode(nids[1])) == BOOL) or (get_type(getnode(nids[2])) == BOOL):
-                    nodemap[nid] = EqualsOrIff(BV2B(getnode(nids[1])), BV2B(getnode(nids[2])))
-                elif get_type(getnode(nids[1])).is_array_type():
-                    _type = get_type(getnode(nids[1]))
-                    nodemap[nid] = EqualsOrIff(getnode(nids[1]), Array(_type.index_type, default=getnode(nids[2])))
-                else:
-                    nodemap[nid] = EqualsOrIff(getnode(nids[1]), getnode(nids[2]))
-                initlist.append(getnode(nid))
-
-            if ntype == CONSTRAINT:
-                nodemap[nid] = BV2B(getnode(nids[0]))
-                invarlist.append(getnode(nid))
-
-            if ntype == BAD:
-                nodemap[nid] = getnode(nids[0])
-
-                if len(nids) > 1:
-                    assert_name = nids[1]
-                    description = "Embedded assertion: {}".format(assert_name)
-                else:
-                    assert_name = 'embedded_assertion_%i'%prop_count
-                    description = 'Embedded assertion number %i'%prop_count
-                    prop_count += 1
+            if node is None:
+                Logger.error("Unknown node type \"%s\""%ntype)
 
-                # Following problem format (name, description, strformula)
-                invar_props.append((assert_name, description, Not(BV2B(getnode(nid)))))
+            nodetype = None
+            if ntype in sorted_operators:
+                nodetype = self.nodes[int(nids[0])]
+            elif ntype in bool_operators:
+                nodetype = BOOL
+            self._set_node(nid, node, nodetype)
 
-            if nid not in nodemap:
-                Logger.error("Unknown node type \"%s\""%ntype)
+            if ntype in root_operators:
+                self.node_covered[nid] = 1
 
             # get wirename if it exists
-            if ntype not in {STATE, INPUT, OUTPUT, BAD}:
+            if ntype not in unnamed_operators:
                 # check for wirename, if it's an integer, then it's a node ref
                 try:
                     a = int(nids[-1])
                 except:
                     try:
-                        wire = Symbol(str(nids[-1]), getnode(nids[0]))
-                        invarlist.append(EqualsOrIff(wire, B2BV(nodemap[nid])))
+                        wire = Symbol(self._symbol_name(nids[-1]), self._node(nids[0]))
+                        self.invarlist.append(EqualsOrIff(wire, B2BV(node)))
                         ts.add_var(wire)
                     except:
                         pass
 
         if Logger.level(1):
-            name = lambda x: str(nodemap[x]) if nodemap[x].is_symbol() else x
-            uncovered = [name(x) for x in nodemap if x not in node_covered]
+            name = lambda x: str(self.nodes[x]) if self.nodes[x].is_symbol() else str(x)
+            uncovered = [name(x) for x in range(len(self.nodes)) \
+                         if (self.nodes[x] is not None) and (not self.node_covered[x])]
             uncovered.sort()
             if len(uncovered) > 0:
                 Logger.warning("Unlinked nodes \"%s\""%",".join(uncovered))
 
         if not self.symbolic_init:
-            init = simplify(And(initlist))
+            init = simplify(And(self.initlist))
         else:
             init = TRUE()
 
-        invar = simplify(And(invarlist))
+        invar = simplify(And(self.invarlist))
 
         # instead of trans, we're using the ftrans format -- see below
         ts.set_behavior(init, TRUE(), invar)
 
         # add ftrans
-        for var, cond_assign_list in ftrans:
+        for var, cond_assign_list in self.ftrans:
             ts.add_func_trans(var, cond_assign_list)
 
         hts.add_ts(ts)
 
+        invar_props = self.invar_props
+        self.nodes = self.types = self.node_covered = self.ts = self.ftrans = None
+        self.initlist = self.invarlist = self.invar_props = None
+
         return (hts, invar_props, ltl_props)
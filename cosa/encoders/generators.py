@@ -8,9 +8,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import math
-
-from pysmt.shortcuts import And, Or, TRUE, FALSE, Not, EqualsOrIff, Implies, Iff, Symbol, BOOL, \
+from pysmt.shortcuts import And, Or, TRUE, FALSE, Not, EqualsOrIff, Implies, Iff, Symbol, \
     BV, BVAdd, BVSub, get_type, BVULT, BVUGT, BVULE
 from pysmt.typing import BOOL, BVType, ArrayType
 from pysmt.fnode import FNode
@@ -59,7 +57,8 @@ class ScoreBoardGenerator(STSGenerator):
         end = Symbol("%s.end"%name, BOOL)
         done = Symbol("%s.done"%name, BOOL)
         packet = Symbol("%s.packet"%name, BVType(in_port.symbol_type().width))
-        max_width = math.ceil(math.log(max_val)/math.log(2))
+        # max_val has to be representable (e.g., 4 requires 3 bits)
+        max_width = int(max_val).bit_length()
 
         max_bvval = BV(max_val, max_width)
         zero = BV(0, max_width)
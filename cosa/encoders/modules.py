@@ -66,7 +66,7 @@ class Modules(object):
 
 
         ts = TS(comment)
-        ts.vars, ts.invar = get_free_variables(invar), invar
+        ts.vars, ts.invar = set(get_free_variables(invar)), invar
         return ts
 
     @staticmethod
@@ -128,7 +128,7 @@ class Modules(object):
                     invar = EqualsOrIff(B2BV(bop(in0, in1)), out)
 
         ts = TS(comment)
-        ts.vars, ts.invar = get_free_variables(invar), invar
+        ts.vars, ts.invar = set(get_free_variables(invar)), invar
         return ts
 
     @staticmethod
@@ -145,7 +145,7 @@ class Modules(object):
 
         invar = Iff(op(in0,in1), bout)
         ts = TS(comment)
-        ts.vars, ts.invar = get_free_variables(invar), invar
+        ts.vars, ts.invar = set(get_free_variables(invar)), invar
         return ts
 
     @staticmethod
@@ -160,7 +160,7 @@ class Modules(object):
         formula = EqualsOrIff(cum, out)
 
         ts = TS()
-        ts.vars, ts.invar = get_free_variables(formula), formula
+        ts.vars, ts.invar = set(get_free_variables(formula)), formula
         return ts
 
     @staticmethod
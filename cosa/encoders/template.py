@@ -63,6 +63,12 @@ class ModelParser(object):
     def get_name(self):
         return self.name
 
+    def get_input_files(self, filepath:Path, flags:str=None)->List[Path]:
+        '''
+        Returns the files that are read when parsing filepath
+        '''
+        return [filepath]
+
     @staticmethod
     def get_extensions():
         Logger.error("Not implemented")
@@ -9,6 +9,7 @@
 # limitations under the License.
 
 import copy
+import hashlib
 import math
 import os
 import re
@@ -44,11 +45,14 @@ from cosa.encoders.template import ModelParser, ModelInformation
 from cosa.encoders.modules import Modules
 from cosa.walkers.verilog_walker import VerilogWalker
 from cosa.representation import HTS, TS
-from cosa.utils.generic import bin_to_dec, dec_to_bin, suppress_output, restore_output
+from cosa.utils.generic import bin_to_dec, dec_to_bin, suppress_output, restore_output, class_name
 from cosa.utils.verilog import vlog_match_widths, get_const, DEFAULTINT
-from cosa.utils.formula_mngm import B2BV, BV2B, get_free_variables, substitute, mem_access
+from cosa.utils.formula_mngm import B2BV, BV2B, get_free_variables, substitute, mem_access, concrete_eval, \
+    ItePruner
 from cosa.environment import Assign, Define, ASSIGN, DEFINE, Finally
 from cosa.printers.template import HIDDEN_VAR
+from cosa.analyzers.portfolio import ProcessPool, ERROR
+from cosa.utils.model_cache import ModelCache, dumps, loads
 
 KEYWORDS = ""
 KEYWORDS += "module wire assign else reg always endmodule end define integer generate "
@@ -57,6 +61,8 @@ KEYWORDS = KEYWORDS.split()
 
 IVERILOG = "iverilog"
 
+MODULES_CACHEDIR = ".CoSA/cache/modules"
+
 POSEDGE = "posedge"
 NEGEDGE = "negedge"
 LEVEL = "level"
@@ -126,7 +132,15 @@ class VerilogHTSParser(ModelParser):
         if Logger.level(2):
             timer = Logger.start_timer("encoding")
 
+        # the encodings of the modules are also cached on disk, so that
+        # only the modified ones are encoded again
+        cache = None
+        if config.cache_files and not config.clean_cache:
+            cache = ModelCache(os.path.join(os.path.dirname(absstrfile), MODULES_CACHEDIR))
+
         self.walker.config = config
+        self.walker.encodings = ModuleEncodings(self.walker.modulesdic, cache)
+        self.walker.processes = config.encoding_processes
         hts = self.walker.walk(ast, flags[0])
         self.abstract_clock_list = self.walker.abstract_clock_list
         self.clock_list = self.walker.clock_list
@@ -266,6 +280,79 @@ class VerilogCodeParser(object):
     def get_directives(self):
         return self.directives
 
+class ModuleEncodings(object):
+    '''
+    Cache of the encodings of the module definitions
+
+    The entries are indexed by the source of the module and of the modules
+    that it instantiates (without the line numbers, so that moving a module
+    does not invalidate it), its parameters, and the encoding options. The
+    encodings are stored serialized, hence each lookup returns a fresh HTS
+    that can be renamed and flattened as a sub-module without affecting the
+    other instances. If a cache is provided, the entries are also stored on
+    disk, and only the modified modules are encoded again in the following
+    runs.
+    '''
+
+    modulesdic = None
+    encodings = None
+    digests = None
+    cache = None
+
+    def __init__(self, modulesdic, cache=None):
+        self.modulesdic = modulesdic
+        self.encodings = {}
+        self.digests = {}
+        self.cache = cache
+
+    def _source(self, ast):
+        source = []
+        submodules = set([])
+        to_visit = [(ast, 0)]
+        while to_visit:
+            (el, depth) = to_visit.pop()
+            source.append("%s%s: %s"%(" "*depth, class_name(el), [getattr(el, a) for a in el.attr_names]))
+            if type(el) == Instance:
+                submodules.add(el.module)
+                # the names of the assertions depend on their line
+                if el.module in [SVA_ASSERT, SVA_IMMEDIATE_ASSERT]:
+                    source.append("(at %s)"%(el.lineno))
+            to_visit += [(c, depth+1) for c in reversed(list(el.children()))]
+        return ("\n".join(source), submodules)
+
+    def digest(self, module):
+        if module not in self.digests:
+            (source, submodules) = self._source(self.modulesdic[module])
+            self.digests[module] = None
+            digests = [self.digest(m) for m in sorted(submodules) if m in self.modulesdic]
+            self.digests[module] = hashlib.sha1("\n".join([source]+[str(d) for d in digests]).encode()).hexdigest()
+        return self.digests[module]
+
+    def key(self, module, param_modulename, paramdic, config):
+        params = ["%s=%s"%(p, paramdic[p]) for p in sorted(paramdic)]
+        return ModelCache.content_key([self.digest(module), param_modulename]+params, config)
+
+    def get(self, key):
+        if (key not in self.encodings) and (self.cache is not None) and self.cache.is_cached(key):
+            self.encodings[key] = self.cache.read(key)
+
+        payload = self.encodings.get(key)
+        if payload is None:
+            return None
+
+        return loads(payload)
+
+    def add(self, key, hts, payload=None):
+        if payload is None:
+            payload = dumps(hts)
+
+        self.encodings[key] = payload
+        if self.cache is not None:
+            self.cache.write(key, payload)
+
+    def __contains__(self, key):
+        return (key in self.encodings) or ((self.cache is not None) and self.cache.is_cached(key))
+
 class VerilogSTSWalker(VerilogWalker):
     varmap = None
     paramdic = None
@@ -287,9 +374,105 @@ class VerilogSTSWalker(VerilogWalker):
 
     hide_autogenerated = True
 
+    encodings = None
+    processes = 1
+
     def __init__(self):
         self.reset_structures()
 
+    def walk(self, ast, modulename):
+        for m in ast.children()[0].children():
+            if type(m) == ModuleDef:
+                self.modulesdic[m.name] = m
+
+        if self.encodings is None:
+            self.encodings = ModuleEncodings(self.modulesdic)
+
+        if (self.processes > 1) and (modulename in self.modulesdic):
+            self.encode_modules(modulename)
+
+        return VerilogWalker.walk(self, ast, modulename)
+
+    def instance_walker(self, paramdic):
+        instancewalker = VerilogSTSWalker()
+        instancewalker.config = copy.deepcopy(self.config)
+        instancewalker.config.add_clock = False
+        instancewalker.paramdic = paramdic
+        instancewalker.varmap = {}
+        instancewalker.modulesdic = self.modulesdic
+        instancewalker.encodings = self.encodings
+        return instancewalker
+
+    def encode_module(self, module, param_modulename, paramdic):
+        '''
+        Returns the HTS of the module with the given parameters, reusing the
+        encoding of the previous instances
+        '''
+
+        instancewalker = self.instance_walker(paramdic)
+        key = self.encodings.key(module, param_modulename, paramdic, instancewalker.config)
+
+        subhts = self.encodings.get(key)
+        if subhts is None:
+            subhts = instancewalker.walk_module(self.modulesdic[module], param_modulename)
+            subhts.name = param_modulename
+            self.encodings.add(key, subhts)
+        else:
+            Logger.log("Reusing the encoding of module \"%s\""%(param_modulename), 2)
+
+        return subhts
+
+    def encode_modules(self, modulename):
+        '''
+        Encodes in parallel the modules that are instantiated without
+        parameters in the hierarchy of modulename. The modules are encoded
+        independently by forked workers, and serialized back in the cache of
+        the encodings
+        '''
+
+        modules = []
+        to_visit = [modulename]
+        while to_visit:
+            module = to_visit.pop(0)
+            to_visit_ast = [self.modulesdic[module]]
+            while to_visit_ast:
+                el = to_visit_ast.pop()
+                to_visit_ast += list(el.children())
+                if (type(el) != Instance) or (el.module not in self.modulesdic):
+                    continue
+                if (el.parameterlist is not None) and (len(el.parameterlist) > 0):
+                    continue
+                if el.module not in modules:
+                    modules.append(el.module)
+                    to_visit.append(el.module)
+
+        tasks = []
+        config = self.instance_walker({}).config
+        for module in modules:
+            param_modulename = self.clean_name(module)
+            key = self.encodings.key(module, param_modulename, {}, config)
+            if key not in self.encodings:
+                tasks.append((key, module, param_modulename))
+
+        if len(tasks) < 2:
+            return
+
+        Logger.log("Encoding %d modules with %d processes"%(len(tasks), self.processes), 1)
+
+        def encode(task):
+            (key, module, param_modulename) = task
+            subhts = self.instance_walker({}).walk_module(self.modulesdic[module], param_modulename)
+            subhts.name = param_modulename
+            return dumps(subhts)
+
+        pool = ProcessPool(self.processes)
+        for ((key, module, param_modulename), (status, result)) in zip(tasks, pool.imap(encode, tasks)):
+            if status == ERROR:
+                # the module is encoded again when instantiated, reporting the error
+                Logger.log("Encoding of module \"%s\" failed with %s"%(module, result), 1)
+                continue
+            self.encodings.add(key, None, result)
+
     def reset_structures(self, modulename=""):
         self.hts = HTS(modulename)
         self.ts = TS()
@@ -405,7 +588,7 @@ class VerilogSTSWalker(VerilogWalker):
     def Buf(self, o, i):
         assign = EqualsOrIff(o, i)
         ts = TS()
-        ts.vars, ts.invar = get_free_variables(assign), assign
+        ts.vars, ts.invar = set(get_free_variables(assign)), assign
         return ts
 
     def Paramlist(self, modulename, el, args):
@@ -953,28 +1136,58 @@ class VerilogSTSWalker(VerilogWalker):
 
         # Performining the For-loop unrolling
         fv = get_free_variables(args_0)
-        model = get_model(args_0)
-        state_n = [(v, model[v]) for v in fv]
-        state_c = [(TS.get_ref_var(v), model[v]) for v in fv]
+        state_n = self.loop_values(args_0, fv, [])
+        state_c = [(TS.get_ref_var(v[0]), v[1]) for v in state_n]
         state = dict(state_c + state_n)
         formulae = []
+        pruner = ItePruner()
         while True:
-            # Evaluate new instance
-            formula = simplify(And(args[3]).substitute(state))
+            # Evaluate new instance, pruning the branches that are not
+            # selected by the loop variables (e.g., memory accesses)
+            formula = simplify(pruner.prune(And(args[3]), state).substitute(state))
             formulae.append(formula)
 
             # Compute next step
-            model = get_model(And(And([EqualsOrIff(v[0], v[1]) for v in state_c]), args_2))
-            state_n = [(v, model[v]) for v in fv]
-            state_c = [(TS.get_ref_var(v), model[v]) for v in fv]
+            state_n = self.loop_values(args_2, fv, state_c)
+            state_c = [(TS.get_ref_var(v[0]), v[1]) for v in state_n]
             state = dict(state_c + state_n)
 
             # Exit condition
-            if not is_sat(And(And([EqualsOrIff(v[0], v[1]) for v in state_c]), args_1)):
+            if not self.loop_condition(args_1, state_c):
                 break
 
         return And(formulae)
 
+    def loop_values(self, formula, fv, state):
+        '''
+        Returns the values of the loop variables fv assigned by formula in
+        the given state. The assignments are evaluated on constants, and the
+        solver is used only when they are not constant
+        '''
+
+        assignments = {}
+        for ass in conjunctive_partition(formula):
+            if (ass.is_equals() or ass.is_iff()) and (ass.args()[0] in fv):
+                assignments[ass.args()[0]] = ass.args()[1]
+
+        values = dict(state)
+        state_n = []
+        for v in fv:
+            value = concrete_eval(assignments[v], values) if v in assignments else None
+            if value is None:
+                model = get_model(And(And([EqualsOrIff(var, val) for (var, val) in state]), formula))
+                return [(var, model[var]) for var in fv]
+            state_n.append((v, value))
+
+        return state_n
+
+    def loop_condition(self, formula, state):
+        value = concrete_eval(formula, dict(state))
+        if value is not None:
+            return value.is_true()
+
+        return is_sat(And(And([EqualsOrIff(v[0], v[1]) for v in state]), formula))
+
     def ModuleDef(self, modulename, el, args):
         always_list = [a.assign_conditions for a in args if type(a) == ProcessedAlways]
         for a in args:
@@ -1476,14 +1689,7 @@ class VerilogSTSWalker(VerilogWalker):
 
         for (instance, actualargs) in instances:
             instance = self.clean_name(instance)
-            instancewalker = VerilogSTSWalker()
-            instancewalker.config = copy.deepcopy(self.config)
-            instancewalker.config.add_clock = False
-            instancewalker.paramdic = dict(paramargs)
-            instancewalker.varmap = varmap
-            instancewalker.modulesdic = self.modulesdic
-            subhts = instancewalker.walk_module(self.modulesdic[el.module], param_modulename)
-            subhts.name = param_modulename
+            subhts = self.encode_module(el.module, param_modulename, dict(paramargs))
 
             # Setting parameters to value None in case they are not provided
             if len(subhts.params) != len(actualargs):
@@ -1576,7 +1782,7 @@ class VerilogSTSWalker(VerilogWalker):
                     var = mem_vars[0]
                     raise NotImplementedError("Not handling memories correctly yet")
                 elif fv:
-                    var = fv.pop()
+                    var = next(iter(fv))
                 else:
                     raise RuntimeError("Could not find representative variable on left-hand side of assign in: %s"%left)
 
@@ -81,6 +81,19 @@ class VerilogYosysBtorParser(ModelParser):
     def _get_extension(self, strfile):
         return strfile.split(".")[-1]
 
+    def _read_source_list(self, filepath):
+        with filepath.absolute().open("r") as source_list:
+            return [source.strip() for source in source_list.read().split("\n") if source.strip()]
+
+    def get_input_files(self, filepath:Path, flags:str=None)->List[Path]:
+        if filepath.absolute().is_dir():
+            return sorted([f for f in filepath.iterdir() if f.suffix[1:] in self.extensions])
+
+        if self._get_extension(filepath.name) == MULTI_FILE_EXT:
+            return [filepath]+[Path(source) for source in self._read_source_list(filepath)]
+
+        return [filepath]
+
     def parse_file(self,
                    filepath:Path,
                    config:NamedTuple,
@@ -134,13 +147,8 @@ class VerilogYosysBtorParser(ModelParser):
             if self.files_from_dir:
                 files = [str(f) for f in directory.iterdir() if f.suffix[1:] in self.extensions]
             else:
-                files = []
-                with abspath.open("r") as source_list:
-                    Logger.msg("Reading source files from \"%s\"... "%(filename), 0)
-                    for source in source_list.read().split("\n"):
-                        source = source.strip()
-                        if source:
-                            files.append(source)
+                Logger.msg("Reading source files from \"%s\"... "%(filename), 0)
+                files = self._read_source_list(filepath)
 
         command = "%s -p \"%s\""%(CMD, "; ".join(COPY_COMMANDS))
         command = command.format(FILES=" ".join(files), \
@@ -17,8 +17,10 @@ from pysmt.parsing import parse, HRParser, HRLexer, PrattParser, Rule, UnaryOpAd
 
 import pysmt.environment
 import pysmt.formula
+from pysmt.fnode import FNode, FNodeContent
 
 from cosa.encoders.formulae import StringParser
+from cosa.utils.formula_mngm import reset_formula_caches
 from cosa.utils.logger import Logger
 
 from pysmt.operators import new_node_type
@@ -57,6 +59,19 @@ class FormulaManager(pysmt.formula.FormulaManager):
     def is_state_symbol(self, sym:Symbol)->bool:
         return sym in self._state_symbols
 
+    def create_typed_node(self, node_type, args, payload, node_ty):
+        """Creates a node whose type is already known (e.g. a renamed copy
+        of a type-checked node), without running the type checker on it."""
+        content = FNodeContent(node_type, args, payload)
+        if content in self.formulae:
+            return self.formulae[content]
+
+        n = FNode(content, self._next_free_id)
+        self._next_free_id += 1
+        self.formulae[content] = n
+        self.env.stc.memoization[n] = node_ty
+        return n
+
     def X(self, formula):
         return self.create_node(node_type=LTL_X, args=(formula,))
 
@@ -242,6 +257,7 @@ def push_env(env=None):
 
 def reset_env():
     """Overload reset_env to use the new push_env()."""
+    reset_formula_caches()
     pop_env()
     push_env()
     return get_env()
@@ -8,40 +8,169 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import deque
+
 from pysmt.rewritings import conjunctive_partition
 from pysmt.shortcuts import And, TRUE
 
-from cosa.representation import TS, HTS
+from cosa.representation import TS, HTS, FTransCompiler
 from cosa.utils.formula_mngm import get_free_variables
 from cosa.printers.factory import HTSPrintersFactory
 from cosa.utils.logger import Logger
 
+INIT = 0
+INVAR = 1
+TRANS = 2
+
+class DependencyIndex(object):
+    '''
+    Dependency graph of the variables of an HTS
+
+    The graph is bipartite: each variable points to the conjuncts (of init,
+    invar, and trans without functional transitions) that contain it, and
+    each conjunct has the set of its variables. The functional transitions
+    add directed edges from the assigned variable to the variables of the
+    conditions and of the values, which are undirected only when the
+    assigned variable is constrained by the rest of the model. The
+    conjuncts that are selected for the reduced model are indexed by
+    variable as well, hence a cone is computed visiting only its variables
+    and their conjuncts: the general conjuncts are selected when they
+    intersect the cone, while the (compiled) functional transitions when
+    their assigned variable is in the cone.
+    '''
+
+    dep_masks = None
+    var_dep_conjuncts = None
+    ftrans_deps = None
+
+    conjuncts = None
+    var_conjuncts = None
+    var_ftrans_conjuncts = None
+
+    def __init__(self):
+        self.dep_masks = []
+        self.var_dep_conjuncts = {}
+        self.ftrans_deps = {}
+
+        self.conjuncts = ([], [], [])
+        self.var_conjuncts = {}
+        self.var_ftrans_conjuncts = {}
+
+    def build(self, hts, free_variables):
+        constrained = set([])
+        for (kind, formula) in [(INIT, hts.single_init()), \
+                                (INVAR, hts.single_invar(include_ftrans=False)), \
+                                (TRANS, hts.single_trans(include_ftrans=False))]:
+            for f in conjunctive_partition(formula):
+                mask = free_variables(f)
+                cid = self._add_conjunct(kind, f)
+                for v in mask:
+                    self.var_conjuncts.setdefault(v, []).append((kind, cid))
+                constrained.update(mask)
+                if len(mask) < 2:
+                    continue
+                for v in mask:
+                    self.var_dep_conjuncts.setdefault(v, []).append(len(self.dep_masks))
+                self.dep_masks.append(mask)
+
+        ftrans = hts.single_ftrans()
+        for var, cond_assign_list in ftrans.items():
+            for refvar in free_variables(var):
+                deps = self.ftrans_deps.setdefault(refvar, set([]))
+                for (condition, value) in cond_assign_list:
+                    deps.update(free_variables(condition))
+                    deps.update(free_variables(value))
+                deps.discard(refvar)
+
+        # an assigned variable that is constrained elsewhere (e.g., a port
+        # of a module connected to the driven signal) constrains its
+        # dependencies as well, hence the edges are added in both directions
+        changed = True
+        while changed:
+            changed = False
+            for (var, deps) in self.ftrans_deps.items():
+                if (var in constrained) and (not deps.issubset(constrained)):
+                    constrained.update(deps)
+                    changed = True
+
+        backward = [(v, var) for (var, deps) in self.ftrans_deps.items() if var in constrained for v in deps]
+        for (v, var) in backward:
+            self.ftrans_deps.setdefault(v, set([])).add(var)
+
+        # each functional transition is compiled on its own, and indexed by
+        # its assigned variable
+        compiler = FTransCompiler(TS.ftrans_encoding)
+        for var, cond_assign_list in ftrans.items():
+            (invar, trans) = compiler.compile({var: cond_assign_list})
+            for (kind, formula) in [(INVAR, invar), (TRANS, trans)]:
+                for f in conjunctive_partition(formula):
+                    if f.is_true():
+                        continue
+                    cid = self._add_conjunct(kind, f)
+                    for refvar in free_variables(var):
+                        self.var_ftrans_conjuncts.setdefault(refvar, []).append((kind, cid))
+
+    def _add_conjunct(self, kind, formula):
+        self.conjuncts[kind].append(formula)
+        return len(self.conjuncts[kind])-1
+
+    def is_empty(self):
+        return (len(self.dep_masks) == 0) and (len(self.ftrans_deps) == 0)
+
+    def cone(self, variables):
+        '''
+        Returns the variables that are reachable from the given ones
+        '''
+
+        cone = set(variables)
+        visited = set([])
+        queue = deque(cone)
+
+        while queue:
+            var = queue.popleft()
+
+            deps = []
+            for cid in self.var_dep_conjuncts.get(var, []):
+                if cid not in visited:
+                    visited.add(cid)
+                    deps.append(self.dep_masks[cid])
+            if var in self.ftrans_deps:
+                deps.append(self.ftrans_deps[var])
+
+            for mask in deps:
+                for v in mask:
+                    if v not in cone:
+                        cone.add(v)
+                        queue.append(v)
+
+        return cone
+
+    def cone_conjuncts(self, cone):
+        '''
+        Returns the conjuncts of init, invar, and trans that intersect the
+        cone, and the functional transitions of the variables of the cone,
+        in their original order
+        '''
+
+        selected = (set([]), set([]), set([]))
+        for var in cone:
+            for (kind, cid) in self.var_conjuncts.get(var, []) + self.var_ftrans_conjuncts.get(var, []):
+                selected[kind].add(cid)
+
+        return tuple([[self.conjuncts[kind][cid] for cid in sorted(selected[kind])] for kind in [INIT, INVAR, TRANS]])
+
 class ConeOfInfluence(object):
 
-    var_deps = None
+    indexes = None
+    models = None
     fv_dict = None
-    int_dict = None
 
     save_model = False
-    
+
     def __init__(self):
         self.fv_dict = {}
-        self.int_dict = {}
-
-    def _intersect(self, set1, set2):
-        el1 = (set1,set2)
-        el2 = (set2,set1)
-        if (el1 in self.int_dict) or (el2 in self.int_dict):
-            return self.int_dict[el1]
-
-        ret = False
-        for el in set1:
-            if el in set2:
-                ret = True
-                break
-
-        self.int_dict[el1] = ret
-        return ret
+        self.indexes = {}
+        self.models = {}
 
     def _free_variables(self, formula):
         if formula not in self.fv_dict:
@@ -50,102 +179,76 @@ class ConeOfInfluence(object):
 
         return self.fv_dict[formula]
 
-    def _build_var_deps(self, hts):
+    def _index_key(self, hts):
+        return (id(hts), hts.single_init(), hts.single_invar(), hts.single_trans())
 
-        if self.var_deps is not None:
-            return
+    def get_index(self, hts):
+        '''
+        Returns the dependency index of the HTS, which is built only once as
+        long as the system does not change
+        '''
+
+        key = self._index_key(hts)
+        if key not in self.indexes:
+            Logger.log("Building COI dependency index", 1)
+            index = DependencyIndex()
+            index.build(hts, self._free_variables)
+            self.indexes[key] = index
+
+        return self.indexes[key]
+
+    def compute(self, hts, prop, assumptions=None, lemmas=None):
+        '''
+        Returns the system reduced to the cone of influence of the property,
+        of the assumptions, and of the lemmas
+
+        The reduced systems are cached by cone, hence problems with the same
+        cone share the same (new) HTS
+        '''
 
-        self.var_deps = {}
-        
-        ftrans = hts.single_ftrans()
-        for var, cond_assign_list in ftrans.items():
-            for refvar in self._free_variables(var):
-                if refvar not in self.var_deps:
-                    self.var_deps[refvar] = []
-
-                for cass in cond_assign_list:
-                    self.var_deps[refvar] += list(self._free_variables(cass[0]))
-                    self.var_deps[refvar] += list(self._free_variables(cass[1]))
-
-        trans = list(conjunctive_partition(hts.single_trans(include_ftrans=False)))
-        invar = list(conjunctive_partition(hts.single_invar(include_ftrans=False)))
-        init = list(conjunctive_partition(hts.single_init()))
-
-        for ts_formula in [invar, trans, init]:
-            for f in ts_formula:
-                fv = self._free_variables(f)
-                for v in fv:
-                    if v not in self.var_deps:
-                        self.var_deps[v] = []
-                    self.var_deps[v] += list(fv)
-                    self.var_deps[v] = [x for x in set(self.var_deps[v]) if x != v]
-
-    def compute(self, hts, prop):
         Logger.log("Building COI", 1)
 
-        self._build_var_deps(hts)
-         
+        index = self.get_index(hts)
+
         coi_vars = set(self._free_variables(prop))
 
-        if (len(coi_vars) < 1) or (self.var_deps == {}):
+        if (len(coi_vars) < 1) or index.is_empty():
             return hts
 
-        if hts.assumptions is not None:
-            for assumption in hts.assumptions:
-                for v in self._free_variables(assumption):
-                    coi_vars.add(v)
+        for formulae in [hts.assumptions, hts.lemmas, assumptions, lemmas]:
+            if formulae is not None:
+                for formula in formulae:
+                    coi_vars.update(self._free_variables(formula))
 
-        if hts.lemmas is not None:
-            for lemma in hts.lemmas:
-                for v in self._free_variables(lemma):
-                    coi_vars.add(v)
+        coi_vars = frozenset(index.cone(coi_vars))
 
-        coits = TS("COI")
+        key = (self._index_key(hts), coi_vars)
+        if key in self.models:
+            Logger.log("Reusing COI of %s variables"%(len(coi_vars)), 1)
+            return self.models[key]
 
-
-        coi_vars = list(coi_vars)
-        i = 0
-        visited = set([])
-        while i < len(coi_vars):
-            var = coi_vars[i]
-            if (var in visited) or (var not in self.var_deps):
-                i += 1
-                continue
-            
-            coi_vars = coi_vars[:i+1] + list(self.var_deps[var]) + coi_vars[i+1:]
-            
-            visited.add(var)
-            i += 1
-            
-        coi_vars = frozenset(coi_vars)
-            
-        trans = list(conjunctive_partition(hts.single_trans(include_ftrans=True)))
-        invar = list(conjunctive_partition(hts.single_invar(include_ftrans=True)))
-        init = list(conjunctive_partition(hts.single_init()))
-        
-        coits.trans = [f for f in trans if self._intersect(coi_vars, self._free_variables(f))]
-        coits.invar = [f for f in invar if self._intersect(coi_vars, self._free_variables(f))]
-        coits.init = [f for f in init if self._intersect(coi_vars, self._free_variables(f))]
+        (init, invar, trans) = index.cone_conjuncts(coi_vars)
 
         Logger.log("COI statistics:", 1)
         Logger.log("  Vars:  %s -> %s"%(len(hts.vars), len(coi_vars)), 1)
-        Logger.log("  Init:  %s -> %s"%(len(init), len(coits.init)), 1)
-        Logger.log("  Invar: %s -> %s"%(len(invar), len(coits.invar)), 1)
-        Logger.log("  Trans: %s -> %s"%(len(trans), len(coits.trans)), 1)
+        Logger.log("  Init:  %s -> %s"%(len(index.conjuncts[INIT]), len(init)), 1)
+        Logger.log("  Invar: %s -> %s"%(len(index.conjuncts[INVAR]), len(invar)), 1)
+        Logger.log("  Trans: %s -> %s"%(len(index.conjuncts[TRANS]), len(trans)), 1)
 
-        coits.trans = And(coits.trans)
-        coits.invar = And(coits.invar)
-        coits.init = And(coits.init)
+        coits = TS("COI")
 
-        coits.vars = set([])
-        for bf in [init,invar,trans]:
+        coits.trans = And(trans)
+        coits.invar = And(invar)
+        coits.init = And(init)
+
+        coits.vars = set(coi_vars)
+        for bf in [init, invar, trans]:
             for f in bf:
-                for v in self._free_variables(f):
-                    coits.vars.add(v)
+                coits.vars.update(self._free_variables(f))
 
-        coits.input_vars = set([v for v in coi_vars if v in hts.input_vars])
-        coits.output_vars = set([v for v in coi_vars if v in hts.output_vars])
-        coits.state_vars = set([v for v in coi_vars if v in hts.state_vars])
+        coits.input_vars = set([v for v in coits.vars if v in hts.input_vars])
+        coits.output_vars = set([v for v in coits.vars if v in hts.output_vars])
+        coits.state_vars = set([v for v in coits.vars if v in hts.state_vars])
 
         new_hts = HTS("COI")
         new_hts.add_ts(coits)
@@ -155,5 +258,6 @@ class ConeOfInfluence(object):
             with open("/tmp/coi_model.ssts", "w") as f:
                 f.write(printer.print_hts(new_hts, []))
 
+        self.models[key] = new_hts
+
         return new_hts
-        
@@ -73,7 +73,7 @@ class ModelExtension(object):
         for (assign, cond_assign_list) in ts.ftrans.items():
             fv = get_free_variables(assign)
             assert len(fv) == 1
-            var = fv.pop()
+            var = next(iter(fv))
             is_next = TS.has_next(var)
 
             refvar = TS.get_ref_var(var)
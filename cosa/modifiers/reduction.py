@@ -0,0 +1,382 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pysmt.rewritings import conjunctive_partition
+from pysmt.shortcuts import And, TRUE, FALSE, simplify
+
+from cosa.representation import TS, HTS
+from cosa.utils.formula_mngm import get_free_variables
+from cosa.utils.logger import Logger
+
+INIT = 0
+INVAR = 1
+TRANS = 2
+
+def _definition(formula, prime=False):
+    '''
+    Returns the pair (var, value) if the formula is a definition of the form
+    var = value (or next(var) = value if prime is True), otherwise None
+    '''
+
+    if formula.is_symbol():
+        return None if prime else (formula, TRUE())
+
+    if formula.is_not() and formula.arg(0).is_symbol():
+        return None if prime else (formula.arg(0), FALSE())
+
+    if not (formula.is_equals() or formula.is_iff()):
+        return None
+
+    for (left, right) in [formula.args(), reversed(formula.args())]:
+        if (not left.is_symbol()) or (TS.is_prime(left) != prime):
+            continue
+        if left.symbol_type().is_array_type():
+            continue
+        if left in get_free_variables(right):
+            continue
+        if (not prime) and TS.has_next(right):
+            continue
+        var = TS.get_ref_var(left) if prime else left
+        return (var, right)
+
+    return None
+
+class ModelReduction(object):
+    '''
+    Map from the signals of a system to the ones of its reduced version
+
+    The eliminated signals are either replaced by a term over the remaining
+    ones (constants and merged signals), or defined by the formulae that
+    were removed as dead logic. The map is used to rewrite the formulae of
+    the problem, and to recover the values of the original signals in the
+    traces.
+    '''
+
+    substitution = None
+    next_substitution = None
+    definitions = None
+
+    def __init__(self, substitution, definitions):
+        self.substitution = substitution
+        self.definitions = definitions
+
+        self.next_substitution = dict(substitution)
+        for (var, value) in substitution.items():
+            self.next_substitution[TS.get_prime(var)] = TS.to_next(value)
+
+    def is_empty(self):
+        return (len(self.substitution) == 0) and (len(self.definitions) == 0)
+
+    def apply(self, formula):
+        if (formula is None) or (len(self.substitution) == 0):
+            return formula
+
+        return formula.substitute(self.next_substitution)
+
+    def _evaluate(self, formula, time, model, extension):
+        values = {}
+        for var in get_free_variables(formula):
+            if TS.is_prime(var):
+                (var_t, t) = (TS.get_ref_var(var), time+1)
+            else:
+                (var_t, t) = (var, time)
+            value = extension.get((var_t, t), model.get(var_t, t))
+            if value is None:
+                return None
+            values[var] = value
+
+        value = simplify(formula.substitute(values))
+        return value if value.is_constant() else None
+
+    def extend_model(self, model, length, variables=None):
+        '''
+        Adds to the (trace) model the values of the eliminated signals,
+        restricted to the given variables (e.g., the ones of the system
+        before the reduction)
+        '''
+
+        # the values of all the eliminated signals are computed, since the
+        # visible ones can be defined in terms of the others
+        extension = {}
+        for t in range(length+1):
+            # the definitions are evaluated in reverse order of removal, since
+            # a definition can only refer to signals removed after it
+            for (var, kind, value) in reversed(self.definitions):
+                if (kind == INIT) and (t > 0):
+                    continue
+                if (kind == TRANS) and (t == 0):
+                    continue
+
+                result = self._evaluate(value, t-1 if kind == TRANS else t, model, extension)
+                if result is not None:
+                    extension[(var, t)] = result
+
+            for (var, value) in self.substitution.items():
+                result = self._evaluate(value, t, model, extension)
+                if result is not None:
+                    extension[(var, t)] = result
+
+        for ((var, t), value) in extension.items():
+            if (variables is None) or (var in variables):
+                model.set(var, t, value)
+
+        return model
+
+class ModelReducer(object):
+    '''
+    Pre-solving reduction of a system
+
+    The reduction iterates the following passes until a fixpoint:
+     - combinational constant propagation and merging of the signals that are
+       aliases or have structurally equal definitions in invar;
+     - sequential constant propagation of the registers with a constant
+       initial value that is preserved by their next state function;
+     - merging of the registers with the same initial value and next state
+       functions that are structurally equal modulo the merged registers
+       (pysmt formulae are hash-consed, hence this is structural hashing).
+    Finally, the signals that are only constrained by their own definitions
+    and are not observed (by the property, assumptions, or lemmas) are
+    removed as dead logic.
+    '''
+
+    reductions = None
+
+    def __init__(self):
+        self.reductions = {}
+
+    def reduce(self, hts, formulae):
+        '''
+        Returns the reduced system and the map of its signals, preserving the
+        given formulae. The reductions are cached by system and observed
+        signals
+        '''
+
+        observed = set([])
+        for formula in formulae:
+            if formula is not None:
+                observed.update([TS.get_ref_var(v) for v in get_free_variables(formula)])
+
+        key = (id(hts), hts.single_init(), hts.single_invar(), hts.single_trans(), frozenset(observed))
+        if key in self.reductions:
+            return self.reductions[key]
+
+        Logger.log("Reducing the model", 1)
+
+        conjuncts = [hts.single_init(), \
+                     hts.single_invar(include_ftrans=True), \
+                     hts.single_trans(include_ftrans=True)]
+
+        substitution = {}
+        while True:
+            conjuncts = [self._partition(f) for f in conjuncts]
+
+            round_subs = self._combinational(conjuncts[INVAR])
+            if len(round_subs) == 0:
+                round_subs = self._sequential(conjuncts, substitution)
+            if len(round_subs) == 0:
+                break
+
+            for var in list(substitution):
+                substitution[var] = simplify(substitution[var].substitute(round_subs))
+            substitution.update(round_subs)
+
+            next_subs = dict(round_subs)
+            for (var, value) in round_subs.items():
+                next_subs[TS.get_prime(var)] = TS.to_next(value)
+
+            conjuncts = [simplify(And(f).substitute(next_subs)) for f in conjuncts]
+
+        # the observed signals that were replaced are observed through their terms
+        reduced_observed = set([])
+        for var in observed:
+            if var in substitution:
+                reduced_observed.update(get_free_variables(substitution[var]))
+            else:
+                reduced_observed.add(var)
+
+        definitions = self._dead_logic(conjuncts, reduced_observed)
+
+        (init, invar, trans) = [And(f) for f in conjuncts]
+        reduction = ModelReduction(substitution, definitions)
+
+        rts = TS("Reduced")
+        rts.init = init
+        rts.invar = invar
+        rts.trans = trans
+
+        for f in [init, invar, trans]:
+            rts.vars.update([TS.get_ref_var(v) for v in get_free_variables(f)])
+        rts.vars.update([v for v in reduced_observed if v in hts.vars])
+
+        rts.input_vars = set([v for v in rts.vars if v in hts.input_vars])
+        rts.output_vars = set([v for v in rts.vars if v in hts.output_vars])
+        rts.state_vars = set([v for v in rts.vars if v in hts.state_vars])
+
+        new_hts = HTS("Reduced")
+        new_hts.add_ts(rts)
+
+        Logger.log("Reduction statistics:", 1)
+        Logger.log("  Vars:    %s -> %s"%(len(hts.vars), len(rts.vars)), 1)
+        Logger.log("  Merged:  %s"%(len(substitution)), 1)
+        Logger.log("  Removed: %s"%(len(set([d[0] for d in definitions]))), 1)
+
+        self.reductions[key] = (new_hts, reduction)
+        return (new_hts, reduction)
+
+    def _partition(self, formula):
+        conjuncts = []
+        for f in conjunctive_partition(formula):
+            if (f != TRUE()) and (f not in conjuncts):
+                conjuncts.append(f)
+        return conjuncts
+
+    def _add(self, round_subs, used, var, value):
+        '''
+        Adds var -> value to the substitution of the round, unless it would
+        require chaining it with the other substitutions of the round
+        '''
+
+        fv = get_free_variables(value)
+        if (var in round_subs) or (var in used) or any([v in round_subs for v in fv]):
+            return False
+
+        round_subs[var] = value
+        used.update(fv)
+        return True
+
+    def _combinational(self, invar):
+        round_subs = {}
+        used = set([])
+        definitions = {}
+
+        for f in invar:
+            definition = _definition(f)
+            if definition is None:
+                continue
+
+            (var, value) = definition
+            if value.is_constant() or value.is_symbol():
+                self._add(round_subs, used, var, value)
+                continue
+
+            # structural hashing of the definitions
+            if value in definitions:
+                self._add(round_subs, used, var, definitions[value])
+            else:
+                definitions[value] = var
+
+        return round_subs
+
+    def _sequential(self, conjuncts, substitution):
+        init_values = {}
+        for f in conjuncts[INIT]:
+            definition = _definition(f)
+            if (definition is not None) and definition[1].is_constant():
+                init_values[definition[0]] = definition[1]
+
+        next_values = {}
+        for f in conjuncts[TRANS]:
+            definition = _definition(f, True)
+            if (definition is not None) and (definition[0] in init_values):
+                next_values[definition[0]] = definition[1]
+
+        registers = sorted([v for v in next_values if v not in substitution], key=lambda v: v.symbol_name())
+
+        # the registers are partitioned by initial value, and each class is
+        # assumed to be constant. The partition is refined until the next
+        # state functions of the registers in the same class are structurally
+        # equal when the registers are replaced by the constant or by the
+        # representative of their class
+        classes = {}
+        for var in registers:
+            classes.setdefault((init_values[var], var.symbol_type()), []).append(var)
+        classes = [(True, cls) for cls in classes.values()]
+
+        while True:
+            subs = {}
+            for (constant, cls) in classes:
+                for var in cls:
+                    subs[var] = init_values[var] if constant else cls[0]
+
+            refined = []
+            for (constant, cls) in classes:
+                refinement = {}
+                for var in cls:
+                    next_value = simplify(next_values[var].substitute(subs))
+                    key = None if (constant and (next_value == init_values[var])) else next_value
+                    refinement.setdefault(key, []).append(var)
+                refined += [(key is None, members) for (key, members) in refinement.items()]
+
+            if refined == classes:
+                break
+            classes = refined
+
+        round_subs = {}
+        used = set([])
+        for (constant, cls) in classes:
+            if constant:
+                for var in cls:
+                    self._add(round_subs, used, var, init_values[var])
+            else:
+                for var in cls[1:]:
+                    self._add(round_subs, used, var, cls[0])
+
+        return round_subs
+
+    def _dead_logic(self, conjuncts, observed):
+        '''
+        Removes (in place) the definitions of the signals that are not
+        observed and do not occur in other formulae, and returns them
+        '''
+
+        occurrences = {}
+        for kind in [INIT, INVAR, TRANS]:
+            for f in conjuncts[kind]:
+                for v in get_free_variables(f):
+                    occurrences.setdefault(TS.get_ref_var(v), set([])).add((kind, f))
+
+        def removable(var):
+            if (var in observed) or (var not in occurrences):
+                return None
+            kinds = []
+            for (kind, f) in occurrences[var]:
+                definition = _definition(f, kind == TRANS)
+                if (definition is None) or (definition[0] != var):
+                    return None
+                kinds.append(kind)
+            if (INVAR in kinds) and (len(kinds) > 1):
+                return None
+            if len(kinds) != len(set(kinds)):
+                return None
+            return occurrences[var]
+
+        definitions = []
+        removed = set([])
+        queue = list(occurrences)
+        while queue:
+            var = queue.pop()
+            formulae = removable(var)
+            if formulae is None:
+                continue
+
+            for (kind, f) in list(formulae):
+                definitions.append((var, kind, _definition(f, kind == TRANS)[1]))
+                removed.add((kind, f))
+                for v in get_free_variables(f):
+                    refvar = TS.get_ref_var(v)
+                    occurrences[refvar].discard((kind, f))
+                    if refvar != var:
+                        queue.append(refvar)
+            del occurrences[var]
+
+        for kind in [INIT, INVAR, TRANS]:
+            conjuncts[kind] = [f for f in conjuncts[kind] if (kind, f) not in removed]
+
+        return definitions
@@ -23,7 +23,9 @@ from cosa.modifiers.factory import ModelModifiersFactory
 from cosa.problem import VerificationType
 from cosa.printers.template import HTSPrinterType, TraceValuesBase
 from cosa.printers.factory import HTSPrintersFactory
+from cosa.representation import FTRANS_AUTO, FTRANS_ENCODINGS
 from cosa.utils.generic import bold_text
+from cosa.utils.profiler import PROFILE_JSON, PROFILE_FORMATS
 
 __all__ = ['cosa_option_manager']
 
@@ -220,6 +222,26 @@ general_solving_options.set_defaults(assume_if_true=False)
 general_solving_options.add_argument('--assume-if-true', dest='assume_if_true', action='store_true',
                         help="add true properties as assumptions. (Default is \"%s\")"%False)
 
+general_solving_options.set_defaults(multi_property=False)
+general_solving_options.add_argument('--multi-property', dest='multi_property', action='store_true',
+                        help="checks the safety properties sharing the same BMC configuration "
+                        "on a single unrolling. (Default is \"%s\")"%False)
+
+general_solving_options.set_defaults(parallel_problems=False)
+general_solving_options.add_argument('--parallel-problems', dest='parallel_problems', action='store_true',
+                        help="solves the problems in parallel using -j processes, "
+                        "unless assume-if-true is enabled. (Default is \"%s\")"%False)
+
+general_solving_options.set_defaults(result_cache=False)
+general_solving_options.add_argument('--result-cache', dest='result_cache', action='store_true',
+                        help="reuses the results of the problems that did not change since the previous "
+                        "runs, unless assume-if-true is enabled. (Default is \"%s\")"%False)
+
+general_solving_options.set_defaults(clean_result_cache=False)
+general_solving_options.add_argument('--clean-result-cache', dest='clean_result_cache', action='store_true',
+                        help="discards the stored results of the problems, and solves them again. "
+                        "(Default is \"%s\")"%False)
+
 general_solving_options.set_defaults(skip_embedded=False)
 general_solving_options.add_argument('--skip-embedded', dest='skip_embedded', action='store_true',
                         help="don't solve embedded assertions. (Default is \"%s\")"%False)
@@ -254,6 +276,14 @@ general_encoding_options.set_defaults(default_initial_value=None)
 general_encoding_options.add_argument('--default-initial-value',
                                       help='Set uninitialized bits to 0 or 1.')
 
+general_encoding_options.set_defaults(encoding_processes=1)
+general_encoding_options.add_argument('--encoding-processes', metavar='<integer level>', type=int,
+                                      help='number of processes encoding the Verilog modules in parallel. (Default is \"%s\")'%1)
+
+general_encoding_options.set_defaults(ftrans_encoding=FTRANS_AUTO)
+general_encoding_options.add_argument('--ftrans-encoding', metavar='ftrans_encoding', type=str, choices=FTRANS_ENCODINGS,
+                                      help='encoding of the functional transition relation (%s). (Default is \"%s\")'%(", ".join(FTRANS_ENCODINGS), FTRANS_AUTO))
+
 general_encoding_options.set_defaults(init=None)
 general_encoding_options.add_argument('--init', type=Path,
                                       help='Set the initial state values, using the *.init format.\n'
@@ -313,6 +343,9 @@ problem_processing_options = cosa_option_manager.add_problem_group('problem proc
 problem_processing_options.set_defaults(simplify=False)
 problem_processing_options.add_argument('--simplify', action='store_true',
                                         help='simplify formulae with pysmt. (Default is \"%s\")'%False)
+problem_processing_options.set_defaults(reduce_model=False)
+problem_processing_options.add_argument('--reduce-model', dest='reduce_model', action='store_true',
+                                        help='propagates constants, merges equivalent signals, and removes dead logic before solving. (Default is \"%s\")'%False)
 
 # Verification Options
 
@@ -391,7 +424,13 @@ ver_params.add_argument('--strategy', metavar='strategy', type=str, nargs='?',
 
 ver_params.set_defaults(processes=int(multiprocessing.cpu_count()/2))
 ver_params.add_argument('-j', dest='processes', metavar="<integer level>", type=int,
-                        help="number of multi-processes for MULTI strategy. (Default is \"%s\")"%int(multiprocessing.cpu_count()/2))
+                        help="number of multi-processes for MULTI strategy and parallel problems. (Default is \"%s\")"%int(multiprocessing.cpu_count()/2))
+
+ver_params.set_defaults(portfolio=None)
+ver_params.add_argument('--portfolio', metavar='<strategy[:solver],...>', type=str, required=False,
+                        help="comma separated list of strategies run in parallel by the MULTI strategy, "
+                        "optionally with the SMT solver to be used, e.g., \"FWD:msat,BWD:z3\". "
+                        "(Default is \"%s\" or \"%s\" with --prove)"%("FWD,BWD", "FWD-K,INT,BWD,FWD"))
 
 ver_params.set_defaults(incremental=True)
 ver_params.add_argument('--incremental', action='store_true',
@@ -456,7 +495,16 @@ deb_params.add_argument('-v', dest='verbosity', metavar="<integer level>", type=
 
 deb_params.set_defaults(time=False)
 deb_params.add_argument('--time', dest='time', action='store_true',
-                        help="prints time for every verification. (Default is \"%s\")"%False)
+                        help="prints time for every verification, and the profile of the run. (Default is \"%s\")"%False)
+
+deb_params.set_defaults(time_profile=None)
+deb_params.add_argument('--time-profile', dest='time_profile', metavar='<profile file>', type=str,
+                        help="writes the profile of the phases of the run, with their times and measures. (Default is \"%s\")"%None)
+
+deb_params.set_defaults(time_profile_format=PROFILE_JSON)
+deb_params.add_argument('--time-profile-format', dest='time_profile_format', metavar='time_profile_format', type=str,
+                        choices=PROFILE_FORMATS,
+                        help="format of the profile (%s). (Default is \"%s\")"%(", ".join(PROFILE_FORMATS), PROFILE_JSON))
 
 deb_params.set_defaults(devel=False)
 deb_params.add_argument('--devel', dest='devel', action='store_true',
@@ -478,7 +526,7 @@ devel_params = cosa_option_manager.add_problem_group('developer')
 devel_params.set_defaults(smt2_tracing=None)
 devel_params.add_argument('--smt2-tracing', metavar='<smt-lib2 file>', type=str, required=False,
                           help='generates the smtlib2 tracing file for '
-                          'each solver call.' if not devel else argparse.SUPPRESS)
+                          'each solver call (compressed if the file name ends with .gz).' if not devel else argparse.SUPPRESS)
 
 def solver_options_to_dict(solver_options:str)->Dict[str, str]:
     '''
@@ -9,16 +9,17 @@
 # limitations under the License.
 
 import datetime
+from collections import OrderedDict
 
 from six.moves import cStringIO
 
 from pysmt.shortcuts import BOOL
 
-from cosa.representation import TS
 from cosa.encoders.coreir import SEP
 from cosa.utils.generic import dec_to_bin, dec_to_hex, sort_system_variables
 from cosa.printers.template import TracePrinter, TraceValuesBase
-from cosa.problem import Trace
+from cosa.problem import Trace, TraceModel
+from cosa.utils.logger import Logger
 
 NL = "\n"
 VCD_SEP = "-"
@@ -27,33 +28,45 @@ PRE_TRACE = "---> "
 POS_TRACE = " <---"
 STATE = "STATE"
 
-ALLIDX = "all"
+# printable ASCII characters used in the VCD identifier codes
+VCD_ID_FIRST = 33
+VCD_ID_CHARS = 94
+
+def vcd_identifier(index):
+    '''
+    Returns the compact VCD identifier code of the index-th signal
+    '''
+
+    code = []
+    while True:
+        code.append(chr(VCD_ID_FIRST + (index % VCD_ID_CHARS)))
+        index //= VCD_ID_CHARS
+        if index == 0:
+            break
+    return "".join(code)
 
 def revise_abstract_clock(model, abstract_clock_list):
-    newmodel = {}
+    newmodel = TraceModel()
     abs_clock = dict(abstract_clock_list)
     length = 0
-    for var, value in model.items():
-        refvar = TS.get_ref_var(var)
-        time = TS.get_time(var)
-
+    for (refvar, time, value) in model.assignments():
         if time > 0:
             if refvar not in abs_clock:
-                newmodel[TS.get_timed(refvar, (time*2)-1)] = value
-                newmodel[TS.get_timed(refvar, (time*2))] = value
+                newmodel.set(refvar, (time*2)-1, value)
+                newmodel.set(refvar, (time*2), value)
             else:
-                newmodel[TS.get_timed(refvar, (time*2)-1)] = abs_clock[refvar][1]
+                newmodel.set(refvar, (time*2)-1, abs_clock[refvar][1])
                 if value == abs_clock[refvar][1]:
-                    newmodel[TS.get_timed(refvar, (time*2))] = abs_clock[refvar][0]
+                    newmodel.set(refvar, (time*2), abs_clock[refvar][0])
                 else:
-                    newmodel[TS.get_timed(refvar, (time*2))] = abs_clock[refvar][1]
+                    newmodel.set(refvar, (time*2), abs_clock[refvar][1])
                 if ((time*2)+1) > length:
                     length = ((time*2))
         else:
             if refvar not in abs_clock:
-                newmodel[TS.get_timed(refvar, 0)] = value
+                newmodel.set(refvar, 0, value)
             else:
-                newmodel[TS.get_timed(refvar, 0)] = abs_clock[refvar][0]
+                newmodel.set(refvar, 0, abs_clock[refvar][0])
 
     return (newmodel, length)
 
@@ -68,7 +81,20 @@ class TextTracePrinter(TracePrinter):
     def get_file_ext(self):
         return "txt"
 
+    def format_value(self, var, value):
+        var_type = var.symbol_type()
+        if var_type.is_bv_type():
+            width = var_type.width
+            if self.values_base == TraceValuesBase.HEX:
+                return "%d'h%s"%(width, dec_to_hex(value, int(width/4)))
+            if self.values_base == TraceValuesBase.BIN:
+                return "%d'b%s"%(width, dec_to_bin(value, int(width)))
+            return "%d_%d"%(value, width)
+        return str(value)
+
     def print_trace(self, hts, model, length, map_function=None, find_loop=False, abstract_clock_list=None):
+        model = TraceModel.convert(model, length)
+
         abstract_clock = (abstract_clock_list is not None) and (len(abstract_clock_list) > 0)
         if abstract_clock:
             (model, length) = revise_abstract_clock(model, abstract_clock_list)
@@ -89,15 +115,11 @@ class TextTracePrinter(TracePrinter):
         strvarlist = [(map_function(var[0]), var[1]) for var in sort_system_variables(varlist, True) if not self.is_hidden(var[0])]
 
         for var in strvarlist:
-            var_0 = TS.get_timed(var[1], 0)
-            if var_0 not in model:
+            value = model.get_value(var[1], 0)
+            if value is None:
                 prevass.append((var[0], None))
                 continue
-            varass = (var[0], model[var_0])
-            if (self.values_base == TraceValuesBase.HEX) and (var[1].symbol_type().is_bv_type()):
-                varass = (varass[0], "%d'h%s"%(var[1].symbol_type().width, dec_to_hex(varass[1].constant_value(), int(var[1].symbol_type().width/4))))
-            if (self.values_base == TraceValuesBase.BIN) and (var[1].symbol_type().is_bv_type()):
-                varass = (varass[0], "%d'b%s"%(var[1].symbol_type().width, dec_to_bin(varass[1].constant_value(), int(var[1].symbol_type().width))))
+            varass = (var[0], self.format_value(var[1], value))
             if self.diff_only: prevass.append(varass)
             trace.append("  I: %s = %s"%(varass[0], varass[1]))
 
@@ -109,24 +131,20 @@ class TextTracePrinter(TracePrinter):
             trace.append("\n%s%s %d%s"%(PRE_TRACE, STATE, t+1, POS_TRACE))
 
             for var in strvarlist:
-                var_t = TS.get_timed(var[1], t+1)
-                if var_t not in model:
+                value = model.get_value(var[1], t+1)
+                if value is None:
                     continue
-                varass = (var[0], model[var_t])
-                if (self.values_base == TraceValuesBase.HEX) and (var[1].symbol_type().is_bv_type()):
-                    varass = (varass[0], "%d'h%s"%(var[1].symbol_type().width, dec_to_hex(varass[1].constant_value(), int(var[1].symbol_type().width/4))))
-                if (self.values_base == TraceValuesBase.BIN) and (var[1].symbol_type().is_bv_type()):
-                    varass = (varass[0], "%d'b%s"%(var[1].symbol_type().width, dec_to_bin(varass[1].constant_value(), int(var[1].symbol_type().width))))
+                varass = (var[0], self.format_value(var[1], value))
                 if (not self.diff_only) or (prevass[varass[0]] != varass[1]):
                     trace.append("  S%s: %s = %s"%(t+1, varass[0], varass[1]))
                     if self.diff_only: prevass[varass[0]] = varass[1]
 
         if find_loop:
-            last_state = [(var[0], model[TS.get_timed(var[1], length)]) for var in strvarlist]
+            last_state = [(var[0], model.get_value(var[1], length)) for var in strvarlist]
             last_state.sort()
             loop_id = -1
             for i in range(length):
-                state_i = [(var[0], model[TS.get_timed(var[1], i)]) for var in strvarlist]
+                state_i = [(var[0], model.get_value(var[1], i)) for var in strvarlist]
                 state_i.sort()
                 if state_i == last_state:
                     loop_id = i
@@ -141,6 +159,15 @@ class TextTracePrinter(TracePrinter):
         return trace
 
 class VCDTracePrinter(TracePrinter):
+    '''
+    Value Change Dump printer
+
+    The trace is streamed on a file handle, writing at each time step only
+    the signals that changed since the previous one. The arrays are expanded
+    into one signal per index, which in all_vars mode are derived from the
+    default value and the assignments of the array, without materializing
+    all of its values at each time step.
+    '''
 
     hierarchical = True
 
@@ -151,160 +178,183 @@ class VCDTracePrinter(TracePrinter):
         return "vcd"
 
     def print_trace(self, hts, model, length, map_function=None, abstract_clock_list=None):
+        model = TraceModel.convert(model, length)
+
         abstract_clock = (abstract_clock_list is not None) and (len(abstract_clock_list) > 0)
 
         if abstract_clock:
             (model, length) = revise_abstract_clock(model, abstract_clock_list)
 
-        ret = []
-
-        ret.append("$date")
-        ret.append(datetime.datetime.now().strftime('%A %Y/%m/%d %H:%M:%S'))
-        ret.append("$end")
-        ret.append("$version")
-        ret.append("CoSA")
-        ret.append("$end")
-        ret.append("$timescale")
-        ret.append("1 ns")
-        ret.append("$end")
-
-        def _recover_array(array_model):
-            # arrays are represented as a tuple of FNodes with
-            # (previous, key, value, key, value, ...)
-            # where previous can itself be another array
-            args = array_model.args()
-            # populate a stack of values to process
-            stack = []
-            while len(args) > 1:
-                assert len(args)%2 == 1
-                stack.append(args[1:])
-                if not args[0].is_constant():
-                    args = args[0].args()
-                else:
-                    args = [args[0]]
-                    break
+        # the trace is generated when written
+        def writer(stream):
+            self._write_trace(stream, hts, model, length, map_function)
+
+        return Trace(length=length, writer=writer)
+
+    def write_trace(self, stream, hts, model, length, map_function=None, abstract_clock_list=None):
+        self.print_trace(hts, model, length, map_function, abstract_clock_list).write(stream)
+
+    def _recover_array(self, array_model):
+        '''
+        Returns the pair (default value, assignments) of an array value
+        '''
+
+        if array_model is None:
+            return None
+
+        # arrays are represented as a tuple of FNodes with
+        # (previous, key, value, key, value, ...)
+        # where previous can itself be another array
+        args = array_model.args()
+        # populate a stack of values to process
+        stack = []
+        while len(args) > 1:
+            assert len(args)%2 == 1
+            stack.append(args[1:])
+            if not args[0].is_constant():
+                args = args[0].args()
+            else:
+                args = [args[0]]
+                break
 
-            symbolic_default = args[0]
+        symbolic_default = args[0]
+        if symbolic_default.get_type().is_array_type():
+            symbolic_default = symbolic_default.array_value_default()
             if symbolic_default.get_type().is_array_type():
-                symbolic_default = symbolic_default.array_value_default()
-                if symbolic_default.get_type().is_array_type():
-                    Logger.error("Nested arrays are not supported in VCD output yet")
-
-            assert symbolic_default.is_constant()
-            default_val = symbolic_default.constant_value()
-
-            assignments = dict()
-            while stack:
-                args = stack.pop()
-                for a, v in zip([a.constant_value() for a in args[0::2]],
-                                [v.constant_value() for v in args[1::2]]):
-                    assignments[a] = v
-
-            if self.all_vars:
-                assignments[ALLIDX] = default_val
-            return assignments
-
-        model = dict([(v.symbol_name(), model[v].constant_value()
-                          if not v.symbol_type().is_array_type()
-                          else _recover_array(model[v])) for v in model])
-
-        # These are the pysmt array vars
-        arr_vars = list(filter(lambda v: v.symbol_type().is_array_type(), hts.vars))
-
-        # Figure out which indices are used over all time
-        arr_used_indices = {}
-        for av in arr_vars:
-            name = av.symbol_name()
-            indices = set()
-            for t in range(length+1):
-                tname = TS.get_timed_name(map_function(name), t)
-                if tname in model:
-                    indices |= set((k for k in model[tname] if k != ALLIDX))
-            arr_used_indices[name] = indices
-
-        # These are the vcd vars (Arrays get blown out)
-        varlist = []
-        arr_varlist = []
+                Logger.error("Nested arrays are not supported in VCD output yet")
+
+        assert symbolic_default.is_constant()
+        default_val = symbolic_default.constant_value()
+
+        assignments = dict()
+        while stack:
+            args = stack.pop()
+            for a, v in zip([a.constant_value() for a in args[0::2]],
+                            [v.constant_value() for v in args[1::2]]):
+                assignments[a] = v
+
+        return (default_val, assignments)
+
+    def _write_trace(self, stream, hts, model, length, map_function):
+        stream.write(NL.join(["$date", \
+                              datetime.datetime.now().strftime('%A %Y/%m/%d %H:%M:%S'), \
+                              "$end", \
+                              "$version", \
+                              "CoSA", \
+                              "$end", \
+                              "$timescale", \
+                              "1 ns", \
+                              "$end"]) + NL)
+
+        # scopes are pairs (subscopes, signals)
+        top = (OrderedDict(), [])
+
+        def scope_of(name):
+            if not self.hierarchical:
+                return (top, name.replace(SEP, VCD_SEP))
+            name = name.split(SEP)
+            scope = top
+            for subscope in name[:-1]:
+                scope = scope[0].setdefault(subscope, (OrderedDict(), []))
+            return (scope, name[-1])
+
+        scalars = []
+        arrays = []
         idvar = 0
-        var2id = {}
         for v in sort_system_variables(hts.vars):
-            n = map_function(v.symbol_name())
             if self.is_hidden(v.symbol_name()):
                 continue
+            (scope, name) = scope_of(map_function(v.symbol_name()))
             if v.symbol_type() == BOOL:
-                varlist.append((n, 1))
-                var2id[n] = idvar
-                idvar += 1
+                width = 1
             elif v.symbol_type().is_bv_type():
-                varlist.append((n, v.symbol_type().width))
-                var2id[n] = idvar
-                idvar += 1
+                width = v.symbol_type().width
             elif v.symbol_type().is_array_type():
+                values = [self._recover_array(model.get_value(v, t)) for t in range(length+1)]
                 idxtype = v.symbol_type().index_type
-                elemtype = v.symbol_type().elem_type
+                width = v.symbol_type().elem_type.width
                 if self.all_vars and idxtype.is_bv_type():
-                    idxrange = range(2**idxtype.width)
+                    # all indices are declared, and the one of an index is the
+                    # identifier code of the array plus the index
+                    indices = range(2**idxtype.width)
+                    positions = None
                 else:
-                    idxrange = arr_used_indices[n]
-                for idx in idxrange:
-                    indexed_name = n + "[%i]"%idx
-                    arr_varlist.append((indexed_name, elemtype.width))
-                    var2id[indexed_name] = idvar
-                    idvar += 1
+                    indices = set([])
+                    for value in values:
+                        if value is not None:
+                            indices.update(value[1])
+                    indices = sorted(indices)
+                    positions = dict([(idx, i) for (i, idx) in enumerate(indices)])
+                scope[1].append((name, width, idvar, indices))
+                arrays.append((values, width, idvar, len(indices), positions))
+                idvar += len(indices)
+                continue
             else:
                 Logger.error("Unhandled type in VCD printer")
 
-        ret.append("$scope module top $end")
-        for el in varlist + arr_varlist:
-            (varname, width) = el
-            idvar = var2id[varname]
-
-            if self.hierarchical:
-                varname = varname.split(SEP)
-                for scope in varname[:-1]:
-                    ret.append("$scope module %s $end"%scope)
-
-                ret.append("$var reg %d v%s %s[%d:0] $end"%(width, idvar, varname[-1], width-1))
-
-                for scope in range(len(varname)-1):
-                    ret.append("$upscope $end")
-            else:
-                varname = varname.replace(SEP, VCD_SEP)
-                ret.append("$var reg %d v%s %s[%d:0] $end"%(width, idvar, varname, width-1))
-
-
-        ret.append("$upscope $end")
-        ret.append("$enddefinitions $end")
+            scope[1].append((name, width, idvar, None))
+            scalars.append((v, width, vcd_identifier(idvar)))
+            idvar += 1
 
+        def declare(name, scope):
+            stream.write("$scope module %s $end\n"%name)
+            for (signal, width, code, indices) in scope[1]:
+                if indices is None:
+                    stream.write("$var reg %d %s %s[%d:0] $end\n"%(width, vcd_identifier(code), signal, width-1))
+                    continue
+                for (i, idx) in enumerate(indices):
+                    stream.write("$var reg %d %s %s[%i][%d:0] $end\n"%(width, vcd_identifier(code+i), signal, idx, width-1))
+            for (subscope_name, subscope) in scope[0].items():
+                declare(subscope_name, subscope)
+            stream.write("$upscope $end\n")
+
+        declare("top", top)
+        stream.write("$enddefinitions $end\n")
+
+        def value_change(code, width, value):
+            if width == 1:
+                return "%d%s"%(value, code)
+            return "b%s %s"%(dec_to_bin(value, width), code)
+
+        scalar_values = [None]*len(scalars)
+        array_values = [(None, {})]*len(arrays)
         for t in range(length+1):
-            ret.append("#%d"%t)
-            for el in varlist:
-                (varname, width) = el
-                tname = TS.get_timed_name(varname, t)
-                val = model[tname] if tname in model else 0
-                ret.append("b%s v%s"%(dec_to_bin(val, width), var2id[varname]))
-
-            for a in arr_vars:
-                name = a.symbol_name()
-                width = a.symbol_type().elem_type.width
-                tname = TS.get_timed_name(name, t)
-                if self.all_vars:
-                    m = model[tname]
-                    for i in set(range(2**a.symbol_type().index_type.width)) - m.keys():
-                        vcdname = name + "[%i]"%i
-                        ret.append("b%s v%s"%(dec_to_bin(m[ALLIDX],width),var2id[vcdname]))
-                    del m[ALLIDX]
-                    for i, v in m.items():
-                        vcdname = name + "[%i]"%i
-                        ret.append("b%s v%s"%(dec_to_bin(v,width),var2id[vcdname]))
-                elif tname in model:
-                    for i, v in model[tname].items():
-                        vcdname = name + "[%i]"%i
-                        ret.append("b%s v%s"%(dec_to_bin(v,width),var2id[vcdname]))
+            changes = []
+            for (i, (var, width, code)) in enumerate(scalars):
+                value = model.get_value(var, t)
+                value = int(value) if value is not None else 0
+                if value != scalar_values[i]:
+                    changes.append(value_change(code, width, value))
+                    scalar_values[i] = value
+
+            for (i, (values, width, code, size, positions)) in enumerate(arrays):
+                if values[t] is None:
+                    continue
+                (default, assignments) = values[t]
+                (prev_default, prev_assignments) = array_values[i]
+                if positions is None:
+                    # only the indices that are (or were) assigned can change,
+                    # unless the default value changed
+                    if default != prev_default:
+                        indices = range(size)
+                    else:
+                        indices = sorted(set(assignments).union(prev_assignments))
+                    for idx in indices:
+                        value = assignments.get(idx, default)
+                        if value != prev_assignments.get(idx, prev_default):
+                            changes.append(value_change(vcd_identifier(code+idx), width, value))
+                else:
+                    for idx in sorted(assignments):
+                        value = assignments[idx]
+                        if value != prev_assignments.get(idx):
+                            changes.append(value_change(vcd_identifier(code+positions[idx]), width, value))
+                array_values[i] = values[t]
+
+            if changes:
+                stream.write("#%d\n"%t)
+                stream.write(NL.join(changes) + NL)
 
         # make the last time step visible
         # also important for correctness, gtkwave sometimes doesn't read the
         # last timestep's values correctly without this change
-        ret.append("#%d"%(t+1))
-
-        return Trace(NL.join(ret), length)
+        stream.write("#%d\n"%(length+1))
@@ -8,18 +8,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from array import array
 from collections import namedtuple
 import configparser
 import copy
+import io
 from itertools import count
 from pathlib import Path
 from typing import Any, Dict, List, NamedTuple, Optional, Set, Sequence, Union
 
 # for type hints
 from pysmt.fnode import FNode
+from pysmt.shortcuts import BV, Bool
 
 from cosa.encoders.formulae import StringParser
-from cosa.representation import HTS
+from cosa.representation import HTS, TS
 from cosa.utils.generic import auto_convert, simple_struct
 from cosa.utils.logger import Logger
 
@@ -309,13 +312,209 @@ class Trace(object):
     infinite = False
     human_readable = False
     prop_vars = None
+    writer = None
 
-    def __init__(self, strtrace=None, length=None):
+    def __init__(self, strtrace=None, length=None, writer=None):
         self.strtrace = strtrace
         self.length = length
+        self.writer = writer
+
+    def write(self, stream):
+        '''
+        Writes the trace on the stream, generating it on the fly if it was
+        created with a writer
+        '''
+
+        if self.strtrace is None and self.writer is not None:
+            self.writer(stream)
+        else:
+            stream.write(str(self.strtrace))
+
+    def _render(self):
+        if self.strtrace is None and self.writer is not None:
+            stream = io.StringIO()
+            self.writer(stream)
+            self.strtrace = stream.getvalue()
+            self.writer = None
+
+    def __getstate__(self):
+        # the writer refers to the system and the model, hence the trace
+        # is rendered before being pickled
+        self._render()
+        return self.__dict__
 
     def __repr__(self):
-        return str(self.strtrace)
+        return str(self)
 
     def __str__(self):
+        self._render()
         return str(self.strtrace)
+
+# widest bit-vectors stored in a machine word array, larger ones use Python ints
+MAX_ARRAY_WIDTH = 64
+
+BOOL_VALUES = "bool"
+WORD_VALUES = "word"
+INT_VALUES = "int"
+NODE_VALUES = "node"
+
+class TraceModel(object):
+    '''
+    Values of the variables of a trace
+
+    The values are stored by variable in arrays indexed by time: Booleans and
+    bit-vectors up to MAX_ARRAY_WIDTH bits as machine words, wider
+    bit-vectors as Python ints, and any other value (e.g., arrays) as
+    FNodes. The model can also be accessed as a dictionary from timed
+    variables to FNodes.
+    '''
+
+    length = None
+    values = None
+    defined = None
+    kinds = None
+
+    def __init__(self, length:int=0):
+        self.length = length
+        self.values = {}
+        self.defined = {}
+        self.kinds = {}
+
+    @staticmethod
+    def from_model(model:Dict[FNode, FNode], variables:Sequence[FNode], length:int)->'TraceModel':
+        '''
+        Builds the model of the given variables from a model of timed variables
+        '''
+
+        # the timed variables are looked up by name, which is cheaper than
+        # building their symbols
+        values = dict([(timed.symbol_name(), value) for (timed, value) in model.items()])
+
+        trace_model = TraceModel(length)
+        for var in variables:
+            name = var.symbol_name()
+            for t in range(length+1):
+                value = values.get(TS.get_timed_name(name, t))
+                if value is not None:
+                    trace_model.set(var, t, value)
+
+        return trace_model
+
+    @staticmethod
+    def convert(model:Union['TraceModel', Dict[FNode, FNode]], length:int)->'TraceModel':
+        if isinstance(model, TraceModel):
+            return model
+
+        trace_model = TraceModel(length)
+        for (timed, value) in model.items():
+            time = TS.get_time(timed)
+            if time is not None:
+                trace_model.set(TS.get_ref_var(timed), time, value)
+
+        return trace_model
+
+    def _new_values(self, kind:str, size:int):
+        if kind == BOOL_VALUES:
+            return array('B', bytes(size))
+        if kind == WORD_VALUES:
+            return array('Q', bytes(8*size))
+        return [None]*size
+
+    def set(self, var:FNode, time:int, value:FNode)->None:
+        kind = self.kinds.get(var)
+        if kind is None:
+            var_type = var.symbol_type()
+            if var_type.is_bool_type():
+                kind = BOOL_VALUES
+            elif var_type.is_bv_type():
+                kind = WORD_VALUES if var_type.width <= MAX_ARRAY_WIDTH else INT_VALUES
+            else:
+                kind = NODE_VALUES
+            size = max(self.length, time)+1
+            self.kinds[var] = kind
+            self.values[var] = self._new_values(kind, size)
+            self.defined[var] = bytearray(size)
+
+        values = self.values[var]
+        defined = self.defined[var]
+        if time >= len(defined):
+            extension = time+1-len(defined)
+            values.extend(self._new_values(kind, extension))
+            defined.extend(bytearray(extension))
+
+        if kind == BOOL_VALUES:
+            values[time] = 1 if value.is_true() else 0
+        elif kind == NODE_VALUES:
+            values[time] = value
+        else:
+            values[time] = value.constant_value()
+        defined[time] = 1
+
+        if time > self.length:
+            self.length = time
+
+    def get_value(self, var:FNode, time:int):
+        '''
+        Returns the value of the variable at the given time as a bool (for
+        Booleans), int (for bit-vectors), FNode (for any other type), or None
+        if it is not defined
+        '''
+
+        defined = self.defined.get(var)
+        if (defined is None) or (time >= len(defined)) or (not defined[time]):
+            return None
+
+        value = self.values[var][time]
+        if self.kinds[var] == BOOL_VALUES:
+            return value == 1
+        return value
+
+    def get(self, var:FNode, time:int)->Optional[FNode]:
+        value = self.get_value(var, time)
+        if value is None:
+            return None
+
+        kind = self.kinds[var]
+        if kind == BOOL_VALUES:
+            return Bool(value)
+        if kind == NODE_VALUES:
+            return value
+        return BV(value, var.symbol_type().width)
+
+    def variables(self)->List[FNode]:
+        return list(self.values.keys())
+
+    def assignments(self):
+        '''
+        Iterates over the triples (var, time, value) of the defined values
+        '''
+
+        for var in self.values:
+            defined = self.defined[var]
+            for time in range(len(defined)):
+                if defined[time]:
+                    yield (var, time, self.get(var, time))
+
+    def items(self):
+        for (var, time, value) in self.assignments():
+            yield (TS.get_timed(var, time), value)
+
+    def __contains__(self, timed:FNode)->bool:
+        time = TS.get_time(timed)
+        return (time is not None) and (self.get_value(TS.get_ref_var(timed), time) is not None)
+
+    def __getitem__(self, timed:FNode)->FNode:
+        value = self.get(TS.get_ref_var(timed), TS.get_time(timed))
+        if value is None:
+            raise KeyError(timed)
+        return value
+
+    def __setitem__(self, timed:FNode, value:FNode)->None:
+        self.set(TS.get_ref_var(timed), TS.get_time(timed), value)
+
+    def __iter__(self):
+        for (timed, value) in self.items():
+            yield timed
+
+    def __len__(self)->int:
+        return sum([sum(defined) for defined in self.defined.values()])
@@ -8,10 +8,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from pysmt.shortcuts import Symbol, And, Or, TRUE, simplify, EqualsOrIff, get_env, get_type, Implies, Not, Ite
+import copy
 
-from cosa.utils.formula_mngm import get_free_variables, substitute
+from pysmt.shortcuts import Symbol, And, Or, TRUE, FALSE, simplify, EqualsOrIff, get_env, get_type, Implies, Not, Ite
+from pysmt.rewritings import conjunctive_partition
+
+from cosa.utils.formula_mngm import get_free_variables, substitute, SUBSTITUTE_MAPS
+from cosa.utils.generic import LRUCache
 from cosa.utils.logger import Logger
+from cosa.utils.profiler import Profiler, FLATTENING
 
 NEXT = "__N"
 PREV = "__P"
@@ -24,6 +29,12 @@ L_BV = "QF_BV"
 
 FLATTEN = "FLATTEN"
 LINKS = FLATTEN+"_LINKS"
+TEMPLATE = CPREF+"template%d"
+
+FTRANS_AUTO = "auto"
+FTRANS_IMPLIES = "implies"
+FTRANS_ITE = "ite"
+FTRANS_ENCODINGS = [FTRANS_AUTO, FTRANS_IMPLIES, FTRANS_ITE]
 
 apply_prefix = lambda name, prefix: ".".join(name.split(".")[:-1]+[prefix+name.split(".")[-1]]) if prefix not in name else name
 
@@ -356,12 +367,26 @@ class HTS(object):
 
         return ts
 
-    def flatten(self, cleanup=True):
+    def flatten(self, cleanup=True, memoize=True, cone=None):
+        '''
+        Flattens the hierarchy of sub-modules
+
+        If memoize is True, each distinct module is flattened once into a
+        template, which is instantiated by renaming its variables with the
+        path of each instance (see FlattenTemplate). If cone is a set of
+        variables, only the parts of the instances that are in their cone
+        are instantiated
+        '''
+
         if cleanup:
             tmp_input_vars = set([v for v in self.input_vars])
             tmp_output_vars = set([v for v in self.output_vars])
         vardic = dict([(v.symbol_name(), v) for v in self.vars])
-        output_vars = self._flatten_rec(vardic)[3]
+        with Profiler.span(FLATTENING):
+            if memoize or (cone is not None):
+                output_vars = self._flatten_templates(vardic, cone)
+            else:
+                output_vars = self._flatten_rec(vardic)[3]
         if cleanup:
             self.input_vars = tmp_input_vars
             self.output_vars = tmp_output_vars
@@ -371,6 +396,91 @@ class HTS(object):
 
         self.reset_formulae()
 
+    def flatten_cone(self, variables):
+        '''
+        Returns a copy of the system flattened including only the parts of
+        the sub-modules that are in the cone of the variables
+        '''
+
+        # the variables of a previous flattening are removed
+        flattened = set([])
+        for ts in self.tss:
+            if FLATTEN in ts.comment:
+                flattened.update(ts.vars)
+
+        hts = copy.copy(self)
+        hts.vars = self.vars - flattened
+        hts.state_vars = self.state_vars - flattened
+        hts.input_vars = self.input_vars - flattened
+        hts.output_vars = self.output_vars - flattened
+        hts.params = list(self.params)
+        hts.tss = set([ts for ts in self.tss if FLATTEN not in ts.comment])
+        hts.reset_formulae(init=True, invar=True, trans=True, ftrans=True)
+        hts.flatten(cone=set([TS.get_ref_var(v) for v in variables]))
+        return hts
+
+    def _flatten_templates(self, vardic, cone=None):
+        self.is_flatten = True
+
+        templates = FlattenTemplates()
+
+        needed = None
+        if cone is not None:
+            top = templates.get(self)
+            needed = top.cone([self.newname(v.symbol_name()) for v in cone])
+
+        for (instance, actual, module) in sorted(self.subs, key=lambda sub: sub[0]):
+            template = templates.get(module)
+            formal = module.params
+
+            instance_needed = None
+            if needed is not None:
+                instance_needed = FlattenTemplate.subnames(needed, instance)
+                if len(instance_needed) == 0:
+                    continue
+
+            ts = TS(FLATTEN)
+
+            (ts.vars, \
+             ts.state_vars, \
+             ts.input_vars, \
+             ts.output_vars, \
+             ts.init, \
+             ts.trans, \
+             ts.ftrans, \
+             ts.invar) = template.instantiate([instance], instance_needed)
+
+            self.add_ts(ts, reset=False)
+
+            links = {}
+            for i in range(len(actual)):
+                # Unset parameter
+                if actual[i] == None:
+                    continue
+                module_var = module.newname(formal[i].symbol_name(), [instance])
+                if (needed is not None) and (module_var not in needed):
+                    continue
+                if type(actual[i]) == str:
+                    local_expr = vardic[actual[i]]
+                else:
+                    local_vars = [(v.symbol_name(), v.symbol_name().replace(self.name, "")) \
+                                  for v in get_free_variables(actual[i])]
+                    local_expr = substitute(actual[i], dict(local_vars))
+                if module_var not in vardic:
+                    modulevar = Symbol(module_var, formal[i].symbol_type())
+                    self.vars.add(modulevar)
+                    vardic[module_var] = modulevar
+                if vardic[module_var] in self.output_vars:
+                    links[local_expr] = [(TRUE(), vardic[module_var])]
+                else:
+                    links[vardic[module_var]] = [(TRUE(), local_expr)]
+
+            ts = TS(LINKS)
+            ts.ftrans = links
+            self.add_ts(ts, reset=False)
+
+        return [Symbol(self.newname(v.symbol_name()), v.symbol_type()) for v in self.vars if v in self.output_vars]
+
     def _flatten_rec(self, vardic, path=[]):
         self.is_flatten = True
 
@@ -432,17 +542,9 @@ class HTS(object):
                            [(TS.get_prime_name(v.symbol_name()), self.newname(TS.get_prime_name(v.symbol_name()), path)) \
                             for v in self.vars])
 
-        substitute_dic = {}
-        def substitute_mem(f, dic):
-            if f in substitute_dic:
-                return substitute_dic[f]
-            ret = substitute(f, dic)
-            substitute_dic[f] = ret
-            return ret
-
-        s_init = substitute_mem(s_init, replace_dic)
-        s_invar = substitute_mem(s_invar, replace_dic)
-        s_trans = substitute_mem(s_trans, replace_dic)
+        s_init = substitute(s_init, replace_dic)
+        s_invar = substitute(s_invar, replace_dic)
+        s_trans = substitute(s_trans, replace_dic)
 
         s_ftrans = {}
 
@@ -466,14 +568,14 @@ class HTS(object):
 
             if var in single_ftrans:
                 cond_assign_list = single_ftrans[var]
-                s_ftrans[newsym] = [(substitute_mem(condition, replace_dic), \
-                                     substitute_mem(value, replace_dic)) \
+                s_ftrans[newsym] = [(substitute(condition, replace_dic), \
+                                     substitute(value, replace_dic)) \
                                     for (condition, value) in cond_assign_list]
                 del(single_ftrans[var])
 
         for var, cond_assign_list in single_ftrans.items():
-            s_ftrans[substitute_mem(var, replace_dic)] = [(substitute_mem(condition, replace_dic), \
-                                                           substitute_mem(value, replace_dic)) \
+            s_ftrans[substitute(var, replace_dic)] = [(substitute(condition, replace_dic), \
+                                                           substitute(value, replace_dic)) \
                                                           for (condition, value) in cond_assign_list]
 
         return (local_vars, local_state_vars, local_input_vars, local_output_vars, s_init, s_trans, s_ftrans, s_invar)
@@ -483,7 +585,7 @@ class HTS(object):
         new_hts = cls.__new__(cls)
         new_hts.__dict__.update(self.__dict__)
         new_hts.tss = set(new_hts.tss)
-        new_hts.subs = list(new_hts.subs)
+        new_hts.subs = set(new_hts.subs)
         return new_hts
 
     def __repr__(self):
@@ -551,6 +653,13 @@ class TS(object):
     comment = None
     logic = None
 
+    # encoding of the functional transition relation (see FTransCompiler)
+    ftrans_encoding = FTRANS_AUTO
+
+    # substitution maps of to_next and to_prev (see _shift_map)
+    _shift_maps = None
+    _shift_maps_env = None
+
     def __init__(self, comment=""):
         self.vars = set([])
         self.state_vars = set([])
@@ -645,49 +754,14 @@ class TS(object):
 
         self._s_ftrans = None
 
-    def compile_ftrans(self):
+    def compile_ftrans(self, encoding=None):
         if self.ftrans is None:
             return None
 
-        ret_trans = TRUE()
-        ret_invar = TRUE()
-
-        use_ites = False
-
-        if use_ites:
-            for var, cond_assign_list in self.ftrans.items():
-                if TS.has_next(var):
-                    ite_list = TS.to_prev(var)
-                else:
-                    ite_list = var
-                for (condition, value) in reversed(cond_assign_list):
-                    if condition == TRUE():
-                        ite_list = value
-                    else:
-                        ite_list = Ite(condition, value, ite_list)
-
-                if TS.has_next(ite_list):
-                    ret_trans = And(ret_trans, EqualsOrIff(var, ite_list))
-                else:
-                    ret_invar = And(ret_invar, EqualsOrIff(var, ite_list))
-        else:
-            for var, cond_assign_list in self.ftrans.items():
-                effects = []
-                all_neg_cond = []
-                for (condition, value) in cond_assign_list:
-                    effects.append(simplify(Implies(condition, EqualsOrIff(var, value))))
-                    all_neg_cond.append(Not(condition))
-
-                if not TS.has_next(var) and not TS.has_next(condition):
-                    ret_invar = And(ret_invar, And(effects))
-                else:
-                    ret_trans = And(ret_trans, And(effects))
+        if encoding is None:
+            encoding = TS.ftrans_encoding
 
-                if TS.has_next(var):
-                    no_change = EqualsOrIff(var, TS.to_prev(var))
-                    ret_trans = And(ret_trans, simplify(Implies(And(all_neg_cond), no_change)))
-
-        return (ret_invar, ret_trans)
+        return FTransCompiler(encoding).compile(self.ftrans)
 
     @staticmethod
     def is_prime(v):
@@ -802,23 +876,37 @@ class TS(object):
     def get_prefix_name(name, pref):
         return "%s%s" % (pref, name)
 
+    @staticmethod
+    def _shift_map(formula, prev):
+        # the maps are shared by the formulae with the same variables, hence
+        # substitute reuses the walker (and its memoization) of each map
+        env = get_env()
+        if TS._shift_maps_env is not env:
+            TS._shift_maps = LRUCache(SUBSTITUTE_MAPS)
+            TS._shift_maps_env = env
+
+        fv = get_free_variables(formula)
+        varmap = TS._shift_maps.get((fv, prev))
+        if varmap is None:
+            varmap = {}
+            for v in fv:
+                vname = TS.get_ref_name(v.symbol_name())
+                if prev:
+                    varmap[vname] = TS.get_prev_name(vname)
+                    varmap[TS.get_prime_name(vname)] = vname
+                else:
+                    varmap[vname] = TS.get_prime_name(vname)
+                    varmap[TS.get_prev_name(vname)] = vname
+            TS._shift_maps[(fv, prev)] = varmap
+        return varmap
+
     @staticmethod
     def to_next(formula):
-        varmap = []
-        for v in get_free_variables(formula):
-            vname = TS.get_ref_name(v.symbol_name())
-            varmap.append((vname,TS.get_prime_name(vname)))
-            varmap.append((TS.get_prev_name(vname),vname))
-        return substitute(formula, dict(varmap))
+        return substitute(formula, TS._shift_map(formula, False))
 
     @staticmethod
     def to_prev(formula):
-        varmap = []
-        for v in get_free_variables(formula):
-            vname = TS.get_ref_name(v.symbol_name())
-            varmap.append((vname,TS.get_prev_name(vname)))
-            varmap.append((TS.get_prime_name(vname),vname))
-        return substitute(formula, dict(varmap))
+        return substitute(formula, TS._shift_map(formula, True))
 
     @staticmethod
     def has_next(formula):
@@ -827,3 +915,486 @@ class TS(object):
             if TS.is_prime(v):
                 return True
         return False
+
+class FlattenTemplates(object):
+    '''
+    Templates of the modules of a system being flattened
+
+    The modules are identified structurally, hence the distinct copies of
+    the same module (e.g., one per instance) share the same template
+    '''
+
+    templates = None
+    keys = None
+    ids = None
+
+    def __init__(self):
+        self.templates = {}
+        self.keys = {}
+        self.ids = {}
+
+    def key(self, hts):
+        if id(hts) not in self.keys:
+            tss = []
+            for ts in hts.tss:
+                if FLATTEN in ts.comment:
+                    continue
+                ftrans = None
+                if ts.ftrans is not None:
+                    ftrans = frozenset([(var, tuple(cond_assign_list)) for (var, cond_assign_list) in ts.ftrans.items()])
+                tss.append((ts.init, ts.trans, ts.invar, ftrans))
+
+            key = (hts.name, tuple(hts.params), \
+                   frozenset(hts.vars), frozenset(hts.state_vars), frozenset(hts.input_vars), frozenset(hts.output_vars), \
+                   frozenset(tss), None if hts.assumptions is None else frozenset(hts.assumptions), \
+                   frozenset([(instance, actual, self.key(module)) for (instance, actual, module) in hts.subs]))
+
+            # the keys are replaced by integers, so that the key of a module
+            # does not include the ones of its sub-modules. The module is
+            # stored as well to keep its id valid
+            self.keys[id(hts)] = (hts, self.ids.setdefault(key, len(self.ids)))
+
+        return self.keys[id(hts)][1]
+
+    def get(self, hts):
+        key = self.key(hts)
+        if key not in self.templates:
+            self.templates[key] = FlattenTemplate(hts, self, TEMPLATE%key)
+        return self.templates[key]
+
+class FlattenTemplate(object):
+    '''
+    Module flattened with the names relative to its instances
+
+    The template contains the formulae of the module itself and the links
+    to its sub-modules, which refer to their own templates. The variables
+    are named with a root that is unique for each template, hence the same
+    name can have different types in different modules. An instance is
+    generated renaming the formulae of each template with the path of the
+    instance, hence each formula is renamed once per instance (instead of
+    once per level of the hierarchy), and the work on the structure of the
+    modules is done once per module.
+    The connected components of the variables of the (flattened) module
+    are computed lazily, to generate only the parts of an instance that are
+    in the cone of a set of variables.
+    '''
+
+    root = None
+
+    vars = None
+    state_vars = None
+    input_vars = None
+    output_vars = None
+
+    init = None
+    invar = None
+    trans = None
+    ftrans = None
+
+    instances = None
+
+    conjuncts = None
+    groups = None
+    group_of = None
+
+    def __init__(self, hts, templates, root):
+        self.root = root
+        relname = lambda name: "%s.%s"%(root, hts.newname(name))
+
+        vardic = {}
+        replace_dic = {}
+        for v in hts.vars:
+            name = v.symbol_name()
+            vardic[relname(name)] = Symbol(relname(name), v.symbol_type())
+            replace_dic[name] = relname(name)
+            replace_dic[TS.get_prime_name(name)] = relname(TS.get_prime_name(name))
+
+        self.vars = set(vardic.values())
+        self.state_vars = set([vardic[relname(v.symbol_name())] for v in hts.vars if v in hts.state_vars])
+        self.input_vars = set([vardic[relname(v.symbol_name())] for v in hts.vars if v in hts.input_vars])
+        self.output_vars = set([vardic[relname(v.symbol_name())] for v in hts.vars if v in hts.output_vars])
+
+        tss = [ts for ts in hts.tss if FLATTEN not in ts.comment]
+        init = [ts.init for ts in tss if ts.init is not None]
+        invar = [ts.invar for ts in tss if ts.invar is not None]
+        trans = [ts.trans for ts in tss if ts.trans is not None]
+        if hts.assumptions is not None:
+            invar += [a for a in hts.assumptions if not TS.has_next(a)]
+            trans += [a for a in hts.assumptions if TS.has_next(a)]
+
+        self.init = substitute(And(init), replace_dic)
+        self.invar = substitute(And(invar), replace_dic)
+        self.trans = substitute(And(trans), replace_dic)
+
+        self.ftrans = {}
+        for ts in tss:
+            if ts.ftrans is not None:
+                for (var, cond_assign_list) in ts.ftrans.items():
+                    self.ftrans[substitute(var, replace_dic)] = [(substitute(condition, replace_dic), \
+                                                                  substitute(value, replace_dic)) \
+                                                                 for (condition, value) in cond_assign_list]
+
+        self.instances = []
+        for (instance, actual, module) in sorted(hts.subs, key=lambda sub: sub[0]):
+            template = templates.get(module)
+            formal = module.params
+            sub_outputs = set([template.name(v) for v in template.output_vars if v not in template.input_vars])
+
+            links = {}
+            for i in range(len(actual)):
+                # Unset parameter
+                if actual[i] == None:
+                    continue
+                if type(actual[i]) == str:
+                    local_expr = vardic["%s.%s"%(root, actual[i])]
+                else:
+                    local_vars = [(v.symbol_name(), relname(v.symbol_name())) for v in get_free_variables(actual[i])]
+                    local_expr = substitute(actual[i], dict(local_vars))
+                module_var = "%s.%s"%(root, module.newname(formal[i].symbol_name(), [instance]))
+                assert module.name != ""
+                if module_var not in vardic:
+                    vardic[module_var] = Symbol(module_var, formal[i].symbol_type())
+                    self.vars.add(vardic[module_var])
+                port = module.newname(formal[i].symbol_name())
+                if (vardic[module_var] in self.output_vars) or \
+                   ((port in sub_outputs) and (vardic[module_var] not in self.input_vars)):
+                    links[local_expr] = [(TRUE(), vardic[module_var])]
+                else:
+                    links[vardic[module_var]] = [(TRUE(), local_expr)]
+
+            self.instances.append((instance, template, links))
+
+    def name(self, var):
+        '''
+        Returns the name of the variable relative to the module
+        '''
+
+        name = var.symbol_name()
+        if name.startswith(self.root + "."):
+            return name[len(self.root)+1:]
+        return name
+
+    @staticmethod
+    def subnames(names, instance):
+        '''
+        Returns the names that are relative to the instance
+        '''
+
+        prefix = instance + "."
+        return set([name[len(prefix):] for name in names if name.startswith(prefix)])
+
+    def _names(self, formulae):
+        names = set([])
+        for formula in formulae:
+            names.update([self.name(TS.get_ref_var(v)) for v in get_free_variables(formula)])
+        return names
+
+    def _conjuncts(self):
+        if self.conjuncts is None:
+            self.conjuncts = []
+            for (kind, formula) in [(0, self.init), (1, self.invar), (2, self.trans)]:
+                for f in conjunctive_partition(formula):
+                    if f != TRUE():
+                        self.conjuncts.append((kind, f, self._names([f])))
+        return self.conjuncts
+
+    def _groups(self):
+        '''
+        Returns the connected components of the (names of the) variables of
+        the flattened module
+        '''
+
+        if self.groups is not None:
+            return self.groups
+
+        parent = {}
+
+        def find(name):
+            root = parent.setdefault(name, name)
+            while parent[root] != root:
+                root = parent[root]
+            while parent[name] != root:
+                (parent[name], name) = (root, parent[name])
+            return root
+
+        def union(names):
+            roots = [find(name) for name in names]
+            for root in roots[1:]:
+                parent[root] = roots[0]
+
+        for v in self.vars:
+            find(self.name(v))
+
+        for (_, _, names) in self._conjuncts():
+            union(list(names))
+
+        for (var, cond_assign_list) in list(self.ftrans.items()):
+            union(list(self._names([var]+[f for ca in cond_assign_list for f in ca])))
+
+        for (instance, template, links) in self.instances:
+            for group in template._groups():
+                union(["%s.%s"%(instance, name) for name in group])
+            for (var, cond_assign_list) in links.items():
+                union(list(self._names([var]+[f for ca in cond_assign_list for f in ca])))
+
+        groups = {}
+        for name in parent:
+            groups.setdefault(find(name), set([])).add(name)
+
+        self.groups = [frozenset(group) for group in groups.values()]
+        self.group_of = {}
+        for (i, group) in enumerate(self.groups):
+            for name in group:
+                self.group_of[name] = i
+
+        return self.groups
+
+    def cone(self, names):
+        '''
+        Returns the names of the variables that are connected to the given ones
+        '''
+
+        self._groups()
+
+        cone = set(names)
+        for group in set([self.group_of[name] for name in names if name in self.group_of]):
+            cone.update(self.groups[group])
+        return cone
+
+    def instantiate(self, path, needed=None):
+        '''
+        Returns the flattened formulae of the instance of the module with the
+        given path, restricted to the variables in needed (if provided)
+        '''
+
+        prefix = ".".join(path)
+
+        replace_dic = {}
+        for v in self.vars:
+            name = self.name(v)
+            replace_dic[v.symbol_name()] = "%s.%s"%(prefix, name)
+            replace_dic[TS.get_prime_name(v.symbol_name())] = "%s.%s"%(prefix, TS.get_prime_name(name))
+
+        rename = lambda v: Symbol(replace_dic[v.symbol_name()], v.symbol_type())
+        is_needed = lambda names: (needed is None) or (not needed.isdisjoint(names))
+
+        local_vars = [v for v in self.vars if is_needed([self.name(v)])]
+        s_vars = set([rename(v) for v in local_vars])
+        s_state_vars = set([rename(v) for v in local_vars if v in self.state_vars])
+        s_input_vars = set([rename(v) for v in local_vars if v in self.input_vars])
+        s_output_vars = set([rename(v) for v in local_vars if v in self.output_vars])
+
+        if needed is None:
+            (init, invar, trans) = ([self.init], [self.invar], [self.trans])
+        else:
+            (init, invar, trans) = ([], [], [])
+            for (kind, f, names) in self._conjuncts():
+                if is_needed(names):
+                    [init, invar, trans][kind].append(f)
+        s_init = [substitute(And(init), replace_dic)]
+        s_invar = [substitute(And(invar), replace_dic)]
+        s_trans = [substitute(And(trans), replace_dic)]
+
+        s_ftrans = {}
+
+        def add_ftrans(ftrans):
+            for (var, cond_assign_list) in ftrans.items():
+                if not is_needed(self._names([var])):
+                    continue
+                s_ftrans[substitute(var, replace_dic)] = [(substitute(condition, replace_dic), \
+                                                           substitute(value, replace_dic)) \
+                                                          for (condition, value) in cond_assign_list]
+
+        add_ftrans(self.ftrans)
+
+        for (instance, template, links) in self.instances:
+            sub_needed = None
+            if needed is not None:
+                sub_needed = self.subnames(needed, instance)
+                if len(sub_needed) == 0:
+                    continue
+
+            (sub_vars, sub_state_vars, sub_input_vars, sub_output_vars, \
+             sub_init, sub_trans, sub_ftrans, sub_invar) = template.instantiate(path+[instance], sub_needed)
+
+            for v in sub_vars:
+                s_vars.add(v)
+                if (v in sub_state_vars) and (v not in s_input_vars):
+                    s_state_vars.add(v)
+                if v in sub_input_vars:
+                    s_input_vars.add(v)
+                if (v in sub_output_vars) and (v not in s_input_vars):
+                    s_output_vars.add(v)
+
+            s_init.append(sub_init)
+            s_invar.append(sub_invar)
+            s_trans.append(sub_trans)
+            s_ftrans.update(sub_ftrans)
+
+            add_ftrans(links)
+
+        return (s_vars, s_state_vars, s_input_vars, s_output_vars, And(s_init), And(s_trans), s_ftrans, And(s_invar))
+
+class FTransCompiler(object):
+    '''
+    Compiler of the functional transition relation into invar and trans
+
+    The supported encodings are:
+     - implies: each assignment is an implication from its condition, and
+       the next state variables keep their value when no condition holds;
+     - ite: priority if-then-else chain, where the first assignment with a
+       satisfied condition has precedence over the following ones;
+     - auto: a variable with a single unconditional assignment is defined by
+       an equality, and a next state variable with pairwise exclusive
+       conditions (as the branches of a case statement) is defined by a flat
+       case, where the order of the conditions is irrelevant. All the other
+       variables are encoded with implications.
+
+    The auto encoding is equivalent to the implies one, while the ite one
+    differs from them when the conditions of a variable overlap. The
+    simplified conditions, their literals and the frame conditions are
+    shared by all the variables, hence equal condition subterms are also the
+    same subformula in the solver.
+    '''
+
+    encoding = None
+
+    conditions = None
+    literals = None
+    frames = None
+
+    def __init__(self, encoding=FTRANS_AUTO):
+        if encoding not in FTRANS_ENCODINGS:
+            Logger.error("Unknown ftrans encoding \"%s\", use one of %s"%(encoding, ", ".join(FTRANS_ENCODINGS)))
+
+        self.encoding = encoding
+        self.conditions = {}
+        self.literals = {}
+        self.frames = {}
+
+    def compile(self, ftrans):
+        ret_invar = []
+        ret_trans = []
+
+        for var, cond_assign_list in ftrans.items():
+            cond_assign_list = [(self._condition(condition), value) for (condition, value) in cond_assign_list]
+
+            if self.encoding == FTRANS_ITE:
+                formulae = self._ite(var, cond_assign_list)
+            elif self.encoding == FTRANS_IMPLIES:
+                formulae = self._implies(var, cond_assign_list)
+            else:
+                formulae = self._auto(var, cond_assign_list)
+
+            for formula in formulae:
+                if TS.has_next(var) or TS.has_next(formula):
+                    ret_trans.append(formula)
+                else:
+                    ret_invar.append(formula)
+
+        return (And(ret_invar), And(ret_trans))
+
+    def _condition(self, condition):
+        if condition not in self.conditions:
+            self.conditions[condition] = simplify(condition)
+        return self.conditions[condition]
+
+    def _default(self, var):
+        return TS.to_prev(var) if TS.has_next(var) else var
+
+    def _ite(self, var, cond_assign_list):
+        ite_list = self._default(var)
+        for (condition, value) in reversed(cond_assign_list):
+            if condition == TRUE():
+                ite_list = value
+            elif condition != FALSE():
+                ite_list = Ite(condition, value, ite_list)
+
+        return [EqualsOrIff(var, ite_list)]
+
+    def _implies(self, var, cond_assign_list):
+        effects = [simplify(Implies(condition, EqualsOrIff(var, value))) for (condition, value) in cond_assign_list]
+
+        if TS.has_next(var):
+            effects.append(simplify(Implies(self._frame(cond_assign_list), EqualsOrIff(var, TS.to_prev(var)))))
+
+        return effects
+
+    def _auto(self, var, cond_assign_list):
+        cond_assign_list = [(condition, value) for (condition, value) in cond_assign_list if condition != FALSE()]
+
+        if (len(cond_assign_list) == 1) and (cond_assign_list[0][0] == TRUE()):
+            return [EqualsOrIff(var, cond_assign_list[0][1])]
+
+        if (len(cond_assign_list) == 0) or (not TS.has_next(var)) or (not self._exclusive(cond_assign_list)):
+            return self._implies(var, cond_assign_list)
+
+        # two complementary conditions do not need the default value
+        conditions = [condition for (condition, _) in cond_assign_list]
+        if (len(conditions) == 2) and ((conditions[0] == Not(conditions[1])) or (conditions[1] == Not(conditions[0]))):
+            return [EqualsOrIff(var, Ite(conditions[0], cond_assign_list[0][1], cond_assign_list[1][1]))]
+
+        return self._ite(var, cond_assign_list)
+
+    def _frame(self, cond_assign_list):
+        '''
+        Returns the condition under which none of the assignments is applied
+        '''
+
+        key = tuple([condition for (condition, _) in cond_assign_list])
+        if key not in self.frames:
+            self.frames[key] = simplify(And([Not(condition) for condition in key]))
+        return self.frames[key]
+
+    def _literal(self, condition):
+        '''
+        Returns the positive literals, the negative literals, and the
+        equalities with a constant of the conjuncts of the condition
+        '''
+
+        if condition not in self.literals:
+            positive = set([])
+            negative = set([])
+            equalities = {}
+            for conjunct in conjunctive_partition(condition):
+                if conjunct.is_not():
+                    negative.add(conjunct.arg(0))
+                    continue
+                positive.add(conjunct)
+                if conjunct.is_equals():
+                    (left, right) = conjunct.args()
+                    if right.is_constant():
+                        equalities[left] = right
+                    elif left.is_constant():
+                        equalities[right] = left
+            self.literals[condition] = (positive, negative, equalities)
+
+        return self.literals[condition]
+
+    def _disjoint(self, condition_a, condition_b):
+        (pos_a, neg_a, eq_a) = self._literal(condition_a)
+        (pos_b, neg_b, eq_b) = self._literal(condition_b)
+
+        if (len(pos_a.intersection(neg_b)) > 0) or (len(neg_a.intersection(pos_b)) > 0):
+            return True
+
+        for (term, constant) in eq_a.items():
+            if (term in eq_b) and (eq_b[term] != constant):
+                return True
+
+        return False
+
+    def _exclusive(self, cond_assign_list):
+        '''
+        Checks if the conditions are pairwise exclusive, structurally
+        (e.g., a condition and its negation, or the equalities of a term
+        with different constants)
+        '''
+
+        conditions = [condition for (condition, _) in cond_assign_list]
+        for i in range(len(conditions)):
+            for j in range(i+1, len(conditions)):
+                if not self._disjoint(conditions[i], conditions[j]):
+                    return False
+
+        return True
@@ -22,6 +22,7 @@ from cosa.options import cosa_option_manager
 from cosa.printers.factory import HTSPrintersFactory
 from cosa.problem import ProblemsManager, Trace, VerificationStatus, VerificationType
 from cosa.utils.logger import Logger
+from cosa.utils.profiler import Profiler
 
 TRACE_PREFIX = "trace"
 
@@ -46,7 +47,7 @@ def print_traces(msg, traces, index, prefix, tracecount):
             i+=1
             trace_files.append(trace_file)
             with open(trace_file, "w") as f:
-                f.write(str(trace))
+                trace.write(f)
 
             if tracecount < 0:
                 continue
@@ -161,6 +162,7 @@ def run_problems(problems_config:ProblemsManager):
     general_config = problems_config.general_config
     Logger.verbosity = general_config.verbosity
     Logger.time = general_config.time
+    Profiler.reset(general_config.time or (general_config.time_profile is not None))
 
     psol = ProblemSolver()
     psol.solve_problems(problems_config)
@@ -193,6 +195,12 @@ def run_problems(problems_config:ProblemsManager):
         # using parsed properties from ProblemSolver
         translate(problems_config.hts, general_config, psol.properties)
 
+    if general_config.time:
+        Profiler.print_report()
+
+    if general_config.time_profile is not None:
+        Profiler.write(general_config.time_profile, general_config.time_profile_format)
+
     if global_status != 0:
         Logger.log("", 0)
         Logger.warning("Verifications with unexpected result")
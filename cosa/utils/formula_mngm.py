@@ -11,12 +11,13 @@
 import itertools
 import re
 
+import pysmt.operators as op
 from pysmt.walkers.identitydag import IdentityDagWalker
 from pysmt.parsing import parse
-from pysmt.shortcuts import Ite, EqualsOrIff, BV, get_type, simplify, And, Or
+from pysmt.shortcuts import Ite, EqualsOrIff, BV, Bool, Int, get_type, simplify, And, Or, get_env
 from pysmt.typing import BOOL, BVType, ArrayType, PySMTType
 
-from cosa.utils.generic import new_string
+from cosa.utils.generic import new_string, LRUCache
 
 def B2BV(f):
     if get_type(f).is_bv_type():
@@ -69,23 +70,290 @@ class SymbolsWalker(IdentityDagWalker):
         self.symbols.add(formula)
         return formula
 
-def substitute(formula, mapsym, reset_walker=False):
-    subwalker = SubstituteWalker()
-    subwalker.set_substitute_map(mapsym)
-    return subwalker.walk(formula)
+# maximum number of substitution maps with a live walker
+SUBSTITUTE_MAPS = 256
+# nodes memoized by a single substitution walker before it starts a new generation
+SUBSTITUTE_MEMO_SIZE = 2**18
+# maximum number of formulae with cached free variables
+FREE_VARIABLES_SIZE = 2**16
+
+class FormulaCaches(object):
+    """
+    Walkers and results shared by substitute and get_free_variables
+
+    Substitutions reuse the DAG memoization of a walker that is kept alive
+    for each substitution map (keyed by map identity, hence maps should not
+    be modified after being used for a substitution). All caches are
+    bounded, and they are dropped when the pysmt environment changes.
+    """
+
+    env = None
+    walkers = None
+    free_variables = None
+    symbols_walker = None
+
+    def __init__(self):
+        self.walkers = LRUCache(SUBSTITUTE_MAPS)
+        self.free_variables = LRUCache(FREE_VARIABLES_SIZE)
+        self.env = None
+
+    def check_env(self):
+        env = get_env()
+        if env is not self.env:
+            self.reset()
+            self.env = env
+
+    def reset(self):
+        self.walkers.clear()
+        self.free_variables.clear()
+        self.symbols_walker = None
+        self.env = None
+
+    def substitute(self, formula, mapsym, reset_walker=False):
+        self.check_env()
+
+        key = (id(mapsym), len(mapsym))
+        if reset_walker:
+            self.walkers.pop(key)
+
+        entry = self.walkers.get(key)
+        if (entry is None) or (entry[0] is not mapsym):
+            subwalker = SubstituteWalker(env=self.env)
+            subwalker.set_substitute_map(mapsym)
+            # the map is stored with the walker to keep its id valid
+            entry = (mapsym, subwalker)
+            self.walkers[key] = entry
+
+        subwalker = entry[1]
+        if len(subwalker.memoization) > SUBSTITUTE_MEMO_SIZE:
+            subwalker.memoization.clear()
+
+        return subwalker.walk(formula)
+
+    def get_free_variables(self, formula):
+        self.check_env()
+
+        ret = self.free_variables.get(formula)
+        if ret is not None:
+            return ret
+
+        if self.symbols_walker is None:
+            self.symbols_walker = SymbolsWalker(env=self.env, invalidate_memoization=True)
+
+        symwalker = self.symbols_walker
+        symwalker.reset_symbols()
+        symwalker.walk(formula)
+        ret = frozenset(symwalker.symbols)
+        symwalker.reset_symbols()
+
+        self.free_variables[formula] = ret
+        return ret
+
+formula_caches = FormulaCaches()
 
-free_variables_dic = {}
+def substitute(formula, mapsym, reset_walker=False):
+    return formula_caches.substitute(formula, mapsym, reset_walker)
 
 def get_free_variables(formula):
-    if formula in free_variables_dic:
-        return set([x for x in free_variables_dic[formula]])
-    symwalker = SymbolsWalker()
-    symwalker.reset_symbols()
-    symwalker.walk(formula)
-    ret = symwalker.symbols
-    free_variables_dic[formula] = ret
+    """Returns the (frozen) set of symbols occurring in formula"""
+    return formula_caches.get_free_variables(formula)
+
+def reset_formula_caches():
+    formula_caches.reset()
+
+def to_portable(formula):
+    '''
+    Converts a formula into nested tuples that can be pickled and sent
+    to another process, where it is rebuilt by from_portable.
+    FNodes cannot be pickled directly since they are hash-consed in the
+    formula manager of their own process
+    '''
+    if formula.is_symbol():
+        return (formula.symbol_name(), formula.symbol_type())
+
+    return (formula.node_type(), formula._content.payload, tuple([to_portable(a) for a in formula.args()]))
+
+def from_portable(data):
+    mgr = get_env().formula_manager
+
+    if len(data) == 2:
+        return mgr.Symbol(data[0], data[1])
+
+    (node_type, payload, args) = data
+    return mgr.create_node(node_type, tuple([from_portable(a) for a in args]), payload)
+
+def _signed(value, width):
+    return value - (1 << width) if (value >> (width-1)) else value
+
+def _product(values):
+    ret = 1
+    for value in values:
+        ret *= value
     return ret
 
+# evaluation of the operators on Python values, given the formula and the
+# values of its arguments
+CONCRETE_OPERATORS = {op.AND: lambda f, a: all(a),
+                      op.OR: lambda f, a: any(a),
+                      op.NOT: lambda f, a: not a[0],
+                      op.IMPLIES: lambda f, a: (not a[0]) or a[1],
+                      op.IFF: lambda f, a: a[0] == a[1],
+                      op.EQUALS: lambda f, a: a[0] == a[1],
+                      op.ITE: lambda f, a: a[1] if a[0] else a[2],
+                      op.PLUS: lambda f, a: sum(a),
+                      op.MINUS: lambda f, a: a[0] - a[1],
+                      op.TIMES: lambda f, a: _product(a),
+                      op.LE: lambda f, a: a[0] <= a[1],
+                      op.LT: lambda f, a: a[0] < a[1],
+                      op.BV_ADD: lambda f, a: sum(a),
+                      op.BV_SUB: lambda f, a: a[0] - a[1],
+                      op.BV_MUL: lambda f, a: _product(a),
+                      op.BV_UDIV: lambda f, a: (a[0] // a[1]) if a[1] != 0 else -1,
+                      op.BV_UREM: lambda f, a: (a[0] % a[1]) if a[1] != 0 else a[0],
+                      op.BV_AND: lambda f, a: a[0] & a[1],
+                      op.BV_OR: lambda f, a: a[0] | a[1],
+                      op.BV_XOR: lambda f, a: a[0] ^ a[1],
+                      op.BV_NOT: lambda f, a: ~a[0],
+                      op.BV_NEG: lambda f, a: -a[0],
+                      op.BV_LSHL: lambda f, a: (a[0] << a[1]) if a[1] < f.bv_width() else 0,
+                      op.BV_LSHR: lambda f, a: a[0] >> a[1],
+                      op.BV_ULT: lambda f, a: a[0] < a[1],
+                      op.BV_ULE: lambda f, a: a[0] <= a[1],
+                      op.BV_SLT: lambda f, a: _signed(a[0], f.arg(0).bv_width()) < _signed(a[1], f.arg(1).bv_width()),
+                      op.BV_SLE: lambda f, a: _signed(a[0], f.arg(0).bv_width()) <= _signed(a[1], f.arg(1).bv_width()),
+                      op.BV_CONCAT: lambda f, a: (a[0] << f.arg(1).bv_width()) | a[1],
+                      op.BV_EXTRACT: lambda f, a: a[0] >> f.bv_extract_start(),
+                      op.BV_ZEXT: lambda f, a: a[0],
+                      op.BV_SEXT: lambda f, a: _signed(a[0], f.arg(0).bv_width()),
+                      op.BV_COMP: lambda f, a: int(a[0] == a[1])}
+
+def _concrete_value(formula, values):
+    if formula.is_constant():
+        return formula.constant_value()
+
+    if formula.is_symbol():
+        value = values.get(formula)
+        return value.constant_value() if value is not None else None
+
+    operator = CONCRETE_OPERATORS.get(formula.node_type())
+    if operator is None:
+        return None
+
+    args = []
+    for arg in formula.args():
+        value = _concrete_value(arg, values)
+        if value is None:
+            return None
+        args.append(value)
+
+    value = operator(formula, args)
+    if formula.get_type().is_bv_type():
+        value &= (1 << formula.bv_width()) - 1
+    return value
+
+def concrete_eval(formula, values):
+    '''
+    Evaluates the formula with Python integers, given a map from its free
+    variables to constants. Returns the resulting constant, or None if the
+    formula is not constant (or uses operators that are not supported)
+    '''
+
+    value = _concrete_value(formula, values)
+    if value is None:
+        return None
+
+    formula_type = formula.get_type()
+    if formula_type.is_bool_type():
+        return Bool(value)
+    if formula_type.is_bv_type():
+        return BV(value, formula_type.width)
+    if formula_type.is_int_type():
+        return Int(value)
+    return None
+
+class ItePruner(object):
+    '''
+    Replaces the if-then-else whose conditions are constant, given a map from
+    variables to constants, with the selected branch.
+
+    The chains of if-then-else that compare the same term with constants
+    (e.g., memory accesses) are indexed by the constants, so that the branch
+    is selected without evaluating each condition. The indices are kept
+    across calls.
+    '''
+
+    chains = None
+    rebuilder = None
+
+    def __init__(self):
+        self.chains = {}
+
+    def _chain(self, formula):
+        if formula in self.chains:
+            return self.chains[formula]
+
+        term = None
+        branches = []
+        index = {}
+        node = formula
+        while node.is_ite() and node.arg(0).is_equals():
+            (left, right) = node.arg(0).args()
+            if not right.is_constant():
+                (left, right) = (right, left)
+            if (not right.is_constant()) or ((term is not None) and (left != term)):
+                break
+            term = left
+            index.setdefault(right.constant_value(), len(branches))
+            branches.append((node.arg(0), node.arg(1)))
+            node = node.arg(2)
+
+        chain = (term, branches, index, node) if len(branches) > 1 else None
+        self.chains[formula] = chain
+        return chain
+
+    def _prune(self, formula, values, memo):
+        if formula in memo:
+            return memo[formula]
+
+        if get_free_variables(formula).isdisjoint(values):
+            memo[formula] = formula
+            return formula
+
+        mgr = self.rebuilder.mgr
+        ret = formula
+        while ret.is_ite():
+            chain = self._chain(ret)
+            if chain is not None:
+                (term, branches, index, default) = chain
+                value = _concrete_value(term, values)
+                if value is not None:
+                    ret = branches[index[value]][1] if value in index else default
+                    continue
+                # the chain is rebuilt iteratively, since it can be deep
+                ret = self._prune(default, values, memo)
+                for (condition, branch) in reversed(branches):
+                    ret = mgr.Ite(condition, self._prune(branch, values, memo), ret)
+                memo[formula] = ret
+                return ret
+
+            condition = _concrete_value(ret.arg(0), values)
+            if condition is None:
+                break
+            ret = ret.arg(1) if condition else ret.arg(2)
+
+        args = tuple([self._prune(a, values, memo) for a in ret.args()])
+        if args != ret.args():
+            # the node is rebuilt on the new arguments as the identity walker does
+            ret = self.rebuilder.functions[ret.node_type()](ret, args=list(args))
+
+        memo[formula] = ret
+        return ret
+
+    def prune(self, formula, values):
+        if (self.rebuilder is None) or (self.rebuilder.env is not get_env()):
+            self.rebuilder = IdentityDagWalker(env=get_env())
+        return self._prune(formula, values, {})
+
 ############### Values and Helper Functions for quote_names #################
 # don't treat these as variables in quote_names
 KEYWORDS = ["not","xor",\
@@ -182,8 +450,8 @@ def quote_names(strformula, prefix=None, replace_ops=True):
     strformula = strformula.format(*replaced)
 
     if replace_ops:
-        for op in OPERATORS:
-            strformula = strformula.replace(op[0], op[1])
+        for opr in OPERATORS:
+            strformula = strformula.replace(opr[0], opr[1])
 
     return strformula
 
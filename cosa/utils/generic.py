@@ -13,6 +13,7 @@ import os
 import sys
 import tempfile
 
+from collections import OrderedDict
 from typing import Sequence, Union
 
 STRING_PATTERN = "___STRING_%d___"
@@ -110,6 +111,44 @@ def sort_system_variables(variables, with_names=False):
     assert len(ret) == len(variables)
     return ret
 
+class LRUCache(object):
+    '''
+    Dictionary-like cache that keeps at most maxsize entries,
+    evicting the least recently used ones
+    '''
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        return self[key]
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
 def class_name(obj):
     return obj.__class__.__name__
 
@@ -0,0 +1,264 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import os
+import pickle
+import hashlib
+
+import pysmt
+from pysmt.fnode import FNode
+from pysmt.operators import SYMBOL
+from pysmt.shortcuts import get_env
+
+import cosa
+from cosa.utils.logger import Logger
+
+# to be increased every time the format of the cache changes
+MODEL_CACHE_VERSION = 1
+MODEL_CACHE_EXT = "model"
+
+FORMULA_MANAGER = "FORMULA_MANAGER"
+
+# configuration options that change the result of the parsing (or of the
+# model modifier that is applied before storing the model)
+CACHE_CONFIG_OPTIONS = ["abstract_clock", "add_clock", "boolean", "ftrans_encoding", "model_extension", "no_arrays", \
+                        "opt_circuit", "run_coreir_passes", "symbolic_init", "synchronize", \
+                        "verific", "zero_init"]
+
+class _ModelPickler(pickle.Pickler):
+    '''
+    Pickles the model replacing each FNode with its index in a table of
+    nodes, where each node only refers to the index of its arguments.
+    Shared sub-formulae are then stored once, and the table is rebuilt
+    bottom-up without any parsing
+    '''
+
+    def __init__(self, f, mgr):
+        pickle.Pickler.__init__(self, f, pickle.HIGHEST_PROTOCOL)
+        self.mgr = mgr
+        self.ids = {}
+        self.nodes = []
+
+    def _add_node(self, formula):
+        stack = [(formula, False)]
+
+        while stack:
+            (node, expanded) = stack.pop()
+            if node in self.ids:
+                continue
+
+            args = node.args()
+            if expanded or (len(args) == 0):
+                self.ids[node] = len(self.nodes)
+                self.nodes.append((node.node_type(), node._content.payload, \
+                                   tuple([self.ids[a] for a in args])))
+                continue
+
+            stack.append((node, True))
+            for arg in args:
+                if arg not in self.ids:
+                    stack.append((arg, False))
+
+        return self.ids[formula]
+
+    def persistent_id(self, obj):
+        if isinstance(obj, FNode):
+            return self._add_node(obj)
+
+        if obj is self.mgr:
+            return FORMULA_MANAGER
+
+        return None
+
+    def state_symbols(self):
+        return [i for (node, i) in self.ids.items() if node in self.mgr.state_symbols]
+
+class _ModelUnpickler(pickle.Unpickler):
+
+    def __init__(self, f, mgr, nodes):
+        pickle.Unpickler.__init__(self, f)
+        self.mgr = mgr
+        self.nodes = nodes
+
+    def persistent_load(self, pid):
+        if pid == FORMULA_MANAGER:
+            return self.mgr
+
+        return self.nodes[pid]
+
+class ModelCache(object):
+    '''
+    Binary cache of the parsed models
+
+    The entries are indexed by a key that covers the content of all the
+    input files of the model, the options that affect the encoding, and
+    the versions of CoSA and PySMT. Each entry contains the table of the
+    nodes of all the formulae, followed by the pickled objects (e.g., the
+    HTS, the properties, and the model information)
+    '''
+
+    cachedir = None
+
+    def __init__(self, cachedir):
+        self.cachedir = cachedir
+
+    @staticmethod
+    def _hash(config, flags):
+        hash_key = hashlib.sha1()
+
+        hash_key.update(("%s-%s-%s"%(MODEL_CACHE_VERSION, cosa.__version__, pysmt.__version__)).encode())
+
+        for option in CACHE_CONFIG_OPTIONS:
+            hash_key.update(("%s=%s;"%(option, getattr(config, option, None))).encode())
+
+        hash_key.update(("flags=%s;"%(flags)).encode())
+
+        return hash_key
+
+    @staticmethod
+    def key(files, config, flags=None):
+        hash_key = ModelCache._hash(config, flags)
+
+        for filename in files:
+            hash_key.update(("file=%s;"%(os.path.basename(str(filename)))).encode())
+            with open(str(filename), 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    hash_key.update(chunk)
+
+        return hash_key.hexdigest()
+
+    @staticmethod
+    def content_key(contents, config, flags=None):
+        '''
+        Key of an entry derived from a list of strings instead of files
+        '''
+
+        hash_key = ModelCache._hash(config, flags)
+
+        for content in contents:
+            hash_key.update(("content=%s;"%(len(content))).encode())
+            hash_key.update(content.encode())
+
+        return hash_key.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(str(self.cachedir), "%s.%s"%(key, MODEL_CACHE_EXT))
+
+    def is_cached(self, key, clean=False):
+        entry = self._entry(key)
+
+        if clean and os.path.isfile(entry):
+            os.remove(entry)
+
+        return os.path.isfile(entry)
+
+    def write(self, key, payload):
+        '''
+        Stores the serialized data (see dumps) with the key
+        '''
+
+        if not os.path.isdir(str(self.cachedir)):
+            os.makedirs(str(self.cachedir))
+
+        # writing on a temporary file, so that concurrent runs never read a
+        # partial entry
+        entry = self._entry(key)
+        tmp_entry = "%s.%s"%(entry, os.getpid())
+        with open(tmp_entry, 'wb') as f:
+            f.write(payload)
+
+        os.replace(tmp_entry, entry)
+
+    def read(self, key):
+        '''
+        Returns the serialized data stored with the key, or None
+        '''
+
+        try:
+            with open(self._entry(key), 'rb') as f:
+                return f.read()
+        except OSError as e:
+            Logger.warning("Unable to read the cache entry \"%s\" (%s)"%(key, e))
+            return None
+
+    def store(self, key, data):
+        self.write(key, dumps(data))
+
+    def load(self, key):
+        '''
+        Returns the data stored with the key, or None if the entry is not
+        available or not compatible
+        '''
+
+        payload = self.read(key)
+        if payload is None:
+            return None
+
+        try:
+            return loads(payload)
+        except (EOFError, pickle.UnpicklingError) as e:
+            Logger.warning("Unable to load the cache entry \"%s\" (%s)"%(key, e))
+            return None
+
+def dumps(data):
+    '''
+    Serializes data containing formulae, in the format of the cache entries
+    '''
+
+    mgr = get_env().formula_manager
+
+    payload = io.BytesIO()
+    pickler = _ModelPickler(payload, mgr)
+    pickler.dump(data)
+
+    f = io.BytesIO()
+    pickle.dump(MODEL_CACHE_VERSION, f, pickle.HIGHEST_PROTOCOL)
+    pickle.dump((pickler.nodes, pickler.state_symbols()), f, pickle.HIGHEST_PROTOCOL)
+    f.write(payload.getvalue())
+    return f.getvalue()
+
+def loads(data):
+    '''
+    Deserializes the result of dumps, or returns None if not compatible
+    '''
+
+    return _load(io.BytesIO(data))
+
+def _load(f):
+    mgr = get_env().formula_manager
+
+    if pickle.load(f) != MODEL_CACHE_VERSION:
+        return None
+
+    (table, state_symbols) = pickle.load(f)
+
+    # the formulae were type checked when they were created, hence
+    # the check is skipped here and the types are computed lazily
+    type_check = mgr.__dict__.get("_do_type_check")
+    mgr._do_type_check = lambda formula: None
+
+    try:
+        nodes = []
+        for (node_type, payload, args) in table:
+            if node_type == SYMBOL:
+                nodes.append(mgr.Symbol(payload[0], payload[1]))
+            else:
+                nodes.append(mgr.create_node(node_type, tuple([nodes[i] for i in args]), payload))
+    finally:
+        if type_check is None:
+            del mgr._do_type_check
+        else:
+            mgr._do_type_check = type_check
+
+    for i in state_symbols:
+        mgr.state_symbols.add(nodes[i])
+
+    return _ModelUnpickler(f, mgr, nodes).load()
@@ -0,0 +1,298 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from cosa.utils.logger import Logger
+
+PROFILE_VERSION = 1
+
+PROFILE_JSON = "json"
+PROFILE_CHROME = "chrome"
+PROFILE_FORMATS = [PROFILE_JSON, PROFILE_CHROME]
+
+# name of the problem of the phases that are shared by all the problems
+GLOBAL = "global"
+
+# spans
+PARSING = "parsing"
+FLATTENING = "flattening"
+REDUCTION = "reduction"
+COI = "coi"
+PROBLEM = "problem"
+UNROLLING = "unrolling"
+ASSERTING = "asserting"
+SOLVING = "solving"
+TRACE_PRINTING = "trace printing"
+
+# counters
+ASSERTIONS = "assertions"
+ASSERTIONS_DAG = "assertions DAG nodes"
+SOLVER_CALLS = "solver calls"
+PUSHES = "pushes"
+POPS = "pops"
+
+# maxima
+PUSH_DEPTH = "push depth"
+ASSERTION_DAG = "assertion DAG nodes"
+PEAK_MEMORY = "peak memory (KB)"
+
+def peak_memory():
+    '''
+    Returns the peak resident memory of the process in KB, if available
+    '''
+
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def dag_size(formula):
+    '''
+    Returns the number of distinct nodes of the formula
+    '''
+
+    visited = set([])
+    stack = [formula]
+    while stack:
+        node = stack.pop()
+        if node in visited:
+            continue
+        visited.add(node)
+        stack += node.args()
+    return len(visited)
+
+class _Span(object):
+
+    name = None
+    start = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        Profiler._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        Profiler._depth -= 1
+        Profiler.spans.append((Profiler.problem, self.name, self.start, time.time()-self.start, Profiler._depth))
+        return False
+
+class _Total(object):
+
+    name = None
+    start = None
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        key = (Profiler.problem, self.name)
+        (calls, duration) = Profiler.totals.get(key, (0, 0.0))
+        Profiler.totals[key] = (calls+1, duration+time.time()-self.start)
+        return False
+
+class _NoSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+class Profiler(object):
+    '''
+    Instrumentation of the phases of a run
+
+    The phases (spans) are timed with the span context manager, while the
+    counters accumulate values (e.g., number of assertions or solver calls)
+    and the maxima keep the largest value observed (e.g., push depth). All
+    the measures are associated to the problem being solved, or to GLOBAL
+    for the shared phases such as parsing. The phases that are entered
+    very often (e.g., the unrolling of each formula) are timed with total,
+    which only accumulates their time instead of recording every span.
+    When not enabled, the instrumentation has no effect.
+
+    The profile is reported as a JSON object with the aggregated measures
+    of each problem, which is stable across runs (hence can be compared
+    between releases), or as a Chrome trace (chrome://tracing) with all
+    the spans.
+    '''
+
+    enabled = False
+    problem = GLOBAL
+    spans = []
+    totals = {}
+    counters = {}
+    maxima = {}
+    start = None
+
+    _depth = 0
+    _no_span = _NoSpan()
+
+    @staticmethod
+    def reset(enabled=False):
+        Profiler.enabled = enabled
+        Profiler.problem = GLOBAL
+        Profiler.spans = []
+        Profiler.totals = {}
+        Profiler.counters = {}
+        Profiler.maxima = {}
+        Profiler.start = time.time()
+        Profiler._depth = 0
+
+    @staticmethod
+    def span(name):
+        if not Profiler.enabled:
+            return Profiler._no_span
+        return _Span(name)
+
+    @staticmethod
+    def total(name):
+        if not Profiler.enabled:
+            return Profiler._no_span
+        return _Total(name)
+
+    @staticmethod
+    def set_problem(name):
+        '''
+        Sets the problem of the following measures, and returns the previous one
+        '''
+
+        previous = Profiler.problem
+        Profiler.problem = GLOBAL if name is None else name
+        return previous
+
+    @staticmethod
+    def count(name, value=1):
+        if not Profiler.enabled:
+            return
+        key = (Profiler.problem, name)
+        Profiler.counters[key] = Profiler.counters.get(key, 0) + value
+
+    @staticmethod
+    def maximum(name, value):
+        if (not Profiler.enabled) or (value is None):
+            return
+        key = (Profiler.problem, name)
+        Profiler.maxima[key] = max(Profiler.maxima.get(key, value), value)
+
+    @staticmethod
+    def take():
+        '''
+        Returns the measures collected so far and removes them, e.g., to send
+        them from a worker process to the parent
+        '''
+
+        Profiler.maximum(PEAK_MEMORY, peak_memory())
+        measures = (Profiler.spans, Profiler.totals, Profiler.counters, Profiler.maxima)
+        (Profiler.spans, Profiler.totals, Profiler.counters, Profiler.maxima) = ([], {}, {}, {})
+        return measures
+
+    @staticmethod
+    def merge(measures):
+        (spans, totals, counters, maxima) = measures
+        Profiler.spans += spans
+        for (key, (calls, duration)) in totals.items():
+            (prev_calls, prev_duration) = Profiler.totals.get(key, (0, 0.0))
+            Profiler.totals[key] = (prev_calls+calls, prev_duration+duration)
+        for (key, value) in counters.items():
+            Profiler.counters[key] = Profiler.counters.get(key, 0) + value
+        for (key, value) in maxima.items():
+            Profiler.maxima[key] = max(Profiler.maxima.get(key, value), value)
+
+    @staticmethod
+    def report():
+        Profiler.maximum(PEAK_MEMORY, peak_memory())
+
+        problems = {}
+        def problem(name):
+            return problems.setdefault(name, {"spans": {}, "counters": {}, "maxima": {}})
+
+        for (name, span, _, duration, _) in Profiler.spans:
+            measure = problem(name)["spans"].setdefault(span, {"calls": 0, "time": 0.0})
+            measure["calls"] += 1
+            measure["time"] += duration
+
+        for ((name, span), (calls, duration)) in Profiler.totals.items():
+            measure = problem(name)["spans"].setdefault(span, {"calls": 0, "time": 0.0})
+            measure["calls"] += calls
+            measure["time"] += duration
+
+        for ((name, counter), value) in Profiler.counters.items():
+            problem(name)["counters"][counter] = value
+
+        for ((name, maximum), value) in Profiler.maxima.items():
+            problem(name)["maxima"][maximum] = value
+
+        return {"version": PROFILE_VERSION, \
+                "time": time.time()-Profiler.start, \
+                "problems": problems}
+
+    @staticmethod
+    def chrome_trace():
+        pid = os.getpid()
+        events = []
+        # each problem is shown as a thread
+        tids = {}
+        def tid(name):
+            if name not in tids:
+                tids[name] = len(tids)
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tids[name], \
+                               "args": {"name": name}})
+            return tids[name]
+
+        for (name, span, start, duration, depth) in Profiler.spans:
+            events.append({"name": span, "cat": name, "ph": "X", "pid": pid, "tid": tid(name), \
+                           "ts": int((start-Profiler.start)*1e6), "dur": int(duration*1e6), \
+                           "args": {"depth": depth}})
+
+        # the totals have no position in time, hence they are shown as counters
+        end = int((time.time()-Profiler.start)*1e6)
+        totals = [((name, "%s (sec)"%span), duration) for ((name, span), (_, duration)) in Profiler.totals.items()]
+        for ((name, counter), value) in list(Profiler.counters.items()) + list(Profiler.maxima.items()) + totals:
+            events.append({"name": counter, "cat": name, "ph": "C", "pid": pid, "tid": tid(name), \
+                           "ts": end, "args": {counter: value}})
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    @staticmethod
+    def write(path, profile_format=PROFILE_JSON):
+        if profile_format not in PROFILE_FORMATS:
+            Logger.error("Unknown profile format \"%s\", use one of %s"%(profile_format, ", ".join(PROFILE_FORMATS)))
+
+        profile = Profiler.report() if profile_format == PROFILE_JSON else Profiler.chrome_trace()
+        with open(path, "w") as f:
+            json.dump(profile, f, indent=1, sort_keys=True)
+
+    @staticmethod
+    def print_report():
+        report = Profiler.report()
+        lines = ["\n*** PROFILE ***"]
+        for (name, measures) in sorted(report["problems"].items()):
+            lines.append("%s:"%name)
+            for (span, measure) in sorted(measures["spans"].items(), key=lambda m: -m[1]["time"]):
+                lines.append("  %-20s %8.3f sec (%d)"%(span, measure["time"], measure["calls"]))
+            for (counter, value) in sorted(list(measures["counters"].items()) + list(measures["maxima"].items())):
+                lines.append("  %-20s %8s"%(counter, value))
+        lines.append("Total time: %.3f sec"%report["time"])
+        Logger.log("\n".join(lines), 0)
@@ -0,0 +1,103 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import pickle
+import hashlib
+from pathlib import Path
+
+import cosa
+from cosa.utils.logger import Logger
+from cosa.utils.model_cache import CACHE_CONFIG_OPTIONS
+
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_EXT = "result"
+
+# general options that change the system or the traces of the problems
+RESULT_CONFIG_OPTIONS = CACHE_CONFIG_OPTIONS + ["clock_behaviors", "default_initial_value", "init", "vcd"]
+
+# problem options that do not change the result of the problem
+RESULT_IGNORED_OPTIONS = ["name", "description", "expected", "idx", "processes", "smt2_tracing", "trace_prefix"]
+
+class ResultCache(object):
+    '''
+    Content-addressed store of the results of the problems
+
+    The key of a problem is the hash of the fingerprint of the model (the
+    keys of its input files and the general options), and of the options of
+    the problem, including the content of the files they refer to (e.g.,
+    properties or assumptions given as files)
+    '''
+
+    cachedir = None
+    fingerprint = None
+    relative_path = None
+
+    def __init__(self, cachedir, model_keys, config, relative_path):
+        self.cachedir = cachedir
+        self.relative_path = relative_path
+
+        hash_key = hashlib.sha1()
+        hash_key.update(("%s-%s;"%(RESULT_CACHE_VERSION, cosa.__version__)).encode())
+        for model_key in model_keys:
+            hash_key.update(("model=%s;"%model_key).encode())
+        for option in RESULT_CONFIG_OPTIONS:
+            self._update(hash_key, option, getattr(config, option, None))
+
+        self.fingerprint = hash_key.hexdigest()
+
+    def _update(self, hash_key, option, value):
+        hash_key.update(("%s=%s;"%(option, value)).encode())
+
+        if isinstance(value, (str, Path)):
+            filepath = Path(value) if os.path.isabs(str(value)) else self.relative_path / value
+            if filepath.is_file():
+                with filepath.open('rb') as f:
+                    hash_key.update(f.read())
+
+    def key(self, problem):
+        hash_key = hashlib.sha1()
+        hash_key.update(self.fingerprint.encode())
+
+        for (option, value) in sorted(problem._asdict().items()):
+            if option not in RESULT_IGNORED_OPTIONS:
+                self._update(hash_key, option, value)
+
+        return hash_key.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(str(self.cachedir), "%s.%s"%(key, RESULT_CACHE_EXT))
+
+    def is_cached(self, key, clean=False):
+        entry = self._entry(key)
+
+        if clean and os.path.isfile(entry):
+            os.remove(entry)
+
+        return os.path.isfile(entry)
+
+    def store(self, key, result):
+        if not os.path.isdir(str(self.cachedir)):
+            os.makedirs(str(self.cachedir))
+
+        entry = self._entry(key)
+        tmp_entry = "%s.%s"%(entry, os.getpid())
+        with open(tmp_entry, 'wb') as f:
+            pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_entry, entry)
+
+    def load(self, key):
+        try:
+            with open(self._entry(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            Logger.warning("Unable to load the result \"%s\" (%s)"%(key, e))
+            return None
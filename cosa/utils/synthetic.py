@@ -0,0 +1,379 @@
+# Copyright 2018 Cristian Mattarei
+#
+# Licensed under the modified BSD (3-clause BSD) License.
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import inspect
+import os
+
+from cosa.problem import FILE_SP
+from cosa.utils.logger import Logger
+
+PROBLEM_FILE = "problem.txt"
+NL = "\n"
+
+STS = "sts"
+BTOR = "btor"
+FORMATS = [STS, BTOR]
+
+class SyntheticModel(object):
+    '''
+    Generated model, made of the model files and of the problem file that
+    verifies it. The problems are pairs (name, options), and the options of
+    the GENERAL section refer to all of them
+    '''
+
+    name = None
+    files = None
+    general = None
+    problems = None
+
+    def __init__(self, name):
+        self.name = name
+        self.files = []
+        self.general = []
+        self.problems = []
+
+    def add_file(self, filename, content):
+        self.files.append((filename, content))
+
+    def add_problem(self, name, **options):
+        self.problems.append((name, sorted(options.items())))
+
+    def problem_file(self):
+        lines = ["[GENERAL]", "model_files: %s"%(FILE_SP.join([f[0] for f in self.files]))]
+        lines += ["%s: %s"%(option, value) for (option, value) in self.general]
+        for (name, options) in self.problems:
+            lines += ["", "[%s]"%name]
+            lines += ["%s: %s"%(option, value) for (option, value) in options]
+        return NL.join(lines) + NL
+
+    def write(self, directory):
+        '''
+        Writes the model in the directory, and returns the path of its problem file
+        '''
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        for (filename, content) in self.files:
+            with open(os.path.join(directory, filename), "w") as f:
+                f.write(content)
+
+        problem_file = os.path.join(directory, PROBLEM_FILE)
+        with open(problem_file, "w") as f:
+            f.write(self.problem_file())
+
+        return problem_file
+
+class Btor2Writer(object):
+    '''
+    Writer of BTOR2 models, where each method adds a line and returns the
+    id of its node
+    '''
+
+    lines = None
+    sorts = None
+
+    def __init__(self):
+        self.lines = []
+        self.sorts = {}
+
+    def node(self, *args):
+        self.lines.append(" ".join([str(len(self.lines)+1)] + [str(a) for a in args]))
+        return len(self.lines)
+
+    def bitvec(self, width):
+        if width not in self.sorts:
+            self.sorts[width] = self.node("sort", "bitvec", width)
+        return self.sorts[width]
+
+    def array(self, index_width, elem_width):
+        key = (index_width, elem_width)
+        if key not in self.sorts:
+            self.sorts[key] = self.node("sort", "array", self.bitvec(index_width), self.bitvec(elem_width))
+        return self.sorts[key]
+
+    def const(self, value, width):
+        return self.node("constd", self.bitvec(width), value)
+
+    def op(self, op, width, *args):
+        return self.node(op, self.bitvec(width), *args)
+
+    def content(self):
+        return NL.join(self.lines) + NL
+
+def bv(value, width):
+    return "%d_%d"%(value, width)
+
+def counter(width, properties=1):
+    '''
+    Counter of the given width with an enable, wrapping around before its
+    maximum value. Each property is the reachability of one of its values
+    '''
+
+    limit = (2**width)-2
+
+    sts = ["INPUT", "en: BV(1);", "", \
+           "STATE", "out: BV(%d);"%width, "", \
+           "INIT", "out = %s;"%bv(0, width), "", \
+           "TRANS", \
+           "(out = %s) -> (next(out) = %s);"%(bv(limit, width), bv(0, width)), \
+           "(!(out = %s) & (en = 1_1)) -> (next(out) = (out + %s));"%(bv(limit, width), bv(1, width)), \
+           "(!(out = %s) & (en = 0_1)) -> (next(out) = out);"%(bv(limit, width))]
+
+    model = SyntheticModel("counter_%d"%width)
+    model.add_file("counter.sts", NL.join(sts) + NL)
+    for i in range(properties):
+        target = max(1, min(limit, 20-i))
+        model.add_problem("reach" if i == 0 else "reach_%d"%i, verification="safety", \
+                          properties="!(out = %s)"%bv(target, width), bmc_length=target, expected="False")
+    model.add_problem("bound", verification="safety", properties="out <= %s"%bv(limit, width), \
+                      bmc_length=10, prove="True", expected="True")
+    return model
+
+def chain(length, width=8, format=STS):
+    '''
+    Chain of registers, where each register takes the value of the previous
+    one and the first one the value of the input
+    '''
+
+    model = SyntheticModel("chain_%d"%length)
+
+    if format == STS:
+        sts = ["INPUT", "in: BV(%d);"%width, "", "STATE"]
+        sts += ["r%d: BV(%d);"%(i, width) for i in range(length)]
+        sts += ["", "INIT"]
+        sts += ["r%d = %s;"%(i, bv(0, width)) for i in range(length)]
+        sts += ["", "TRANS", "next(r0) = in;"]
+        sts += ["next(r%d) = r%d;"%(i, i-1) for i in range(1, length)]
+        model.add_file("chain.sts", NL.join(sts) + NL)
+    else:
+        btor = Btor2Writer()
+        prev = btor.op("input", width, "in")
+        zero = btor.op("zero", width)
+        for i in range(length):
+            reg = btor.op("state", width, "r%d"%i)
+            btor.op("init", width, reg, zero)
+            btor.op("next", width, reg, prev)
+            prev = reg
+        model.add_file("chain.btor", btor.content())
+
+    model.add_problem("propagate", verification="safety", properties="r%d = %s"%(length-1, bv(0, width)), \
+                      bmc_length=length, expected="False")
+    return model
+
+def fifo(depth, width=8):
+    '''
+    FIFO made of a chain of cells, checked with a scoreboard
+    '''
+
+    cells = ["cell_%d"%i for i in range(depth)]
+
+    sts = ["INPUT", "input: BV(%d);"%width, "", \
+           "OUTPUT", "output: BV(%d);"%width, "", \
+           "VAR", "clk: BV(1);", "fifo_1: FIFO(input, output, clk);", "", \
+           "INIT", "clk = 0_1;", "", \
+           "TRANS", "(clk = 0_1) <-> (next(clk) = 1_1);", "", \
+           "DEF FIFO(in: BV(%d), out: BV(%d), clk: BV(1)):"%(width, width), \
+           "  STATE"]
+    sts += ["  %s: BV(%d);"%(cell, width) for cell in cells]
+    sts += ["", "  INVAR", "  out = %s;"%cells[-1], "", "  TRANS"]
+    shift = ["(next(%s) = in)"%cells[0]] + ["(next(%s) = %s)"%(cells[i], cells[i-1]) for i in range(1, depth)]
+    sts += ["  posedge(clk) -> %s;"%(" & ".join(shift))]
+    sts += ["  !(posedge(clk)) -> %s;"%(" & ".join(["nochange(%s)"%cell for cell in cells]))]
+
+    model = SyntheticModel("fifo_%d"%depth)
+    model.add_file("fifo.sts", NL.join(sts) + NL)
+    model.add_problem("correctness", verification="safety", properties="sb.end -> (sb.packet = output)", \
+                      generators="sb=FixedScoreboard(input, %d, posedge(clk))"%depth, \
+                      bmc_length=(2*depth)+4, expected="Unknown")
+    return model
+
+def pipeline(depth, width=32, format=STS):
+    '''
+    Pipeline where each stage applies an arithmetic operation to the data of
+    the previous one, and propagates its valid bit
+    '''
+
+    operations = [("+", "add"), ("|", "or"), ("-", "sub")]
+    model = SyntheticModel("pipeline_%d"%depth)
+
+    if format == STS:
+        sts = ["INPUT", "in: BV(%d);"%width, "in_valid: BV(1);", "", "STATE"]
+        for i in range(depth):
+            sts += ["data_%d: BV(%d);"%(i, width), "valid_%d: BV(1);"%i]
+        sts += ["", "INIT"]
+        sts += ["valid_%d = 0_1;"%i for i in range(depth)]
+        sts += ["", "TRANS", "next(data_0) = in;", "next(valid_0) = in_valid;"]
+        for i in range(1, depth):
+            op = operations[i%len(operations)][0]
+            sts += ["next(data_%d) = (data_%d %s %s);"%(i, i-1, op, bv(i, width)), \
+                    "next(valid_%d) = valid_%d;"%(i, i-1)]
+        model.add_file("pipeline.sts", NL.join(sts) + NL)
+    else:
+        btor = Btor2Writer()
+        (data, valid) = (btor.op("input", width, "in"), btor.op("input", 1, "in_valid"))
+        zero = btor.op("zero", 1)
+        for i in range(depth):
+            (data_i, valid_i) = (btor.op("state", width, "data_%d"%i), btor.op("state", 1, "valid_%d"%i))
+            btor.op("init", 1, valid_i, zero)
+            if i > 0:
+                data = btor.op(operations[i%len(operations)][1], width, data, btor.const(i, width))
+            btor.op("next", width, data_i, data)
+            btor.op("next", 1, valid_i, valid)
+            (data, valid) = (data_i, valid_i)
+        model.add_file("pipeline.btor", btor.content())
+
+    model.add_problem("latency", verification="safety", properties="valid_%d = 0_1"%(depth-1), \
+                      bmc_length=depth, expected="False")
+    return model
+
+def datapath(width, operations=4):
+    '''
+    Accumulator of the given width, updated with a combination of wide
+    arithmetic and bitwise operations (among the ones of the STS format)
+    on its inputs
+    '''
+
+    terms = ["(a + b)", "(a & acc)", "(b - acc)", "(a | b)", "(acc - a)", "(b & acc)"]
+    update = " + ".join([terms[i%len(terms)] for i in range(operations)])
+
+    sts = ["INPUT", "a: BV(%d);"%width, "b: BV(%d);"%width, "", \
+           "STATE", "acc: BV(%d);"%width, "", \
+           "INIT", "acc = %s;"%bv(0, width), "", \
+           "TRANS", "next(acc) = (%s);"%update]
+
+    model = SyntheticModel("datapath_%d"%width)
+    model.add_file("datapath.sts", NL.join(sts) + NL)
+    model.add_problem("value", verification="safety", properties="!(acc = %s)"%bv(2**(width-1), width), \
+                      bmc_length=2, expected="False")
+    return model
+
+def memory(address_width, width=8, format=STS):
+    '''
+    Memory with a write port, checking that the last written value is read
+    back from its address
+    '''
+
+    model = SyntheticModel("memory_%d"%address_width)
+
+    if format == STS:
+        sts = ["INPUT", "we: BV(1);", "waddr: BV(%d);"%address_width, "wdata: BV(%d);"%width, "", \
+               "STATE", "mem: Array(BV(%d), BV(%d));"%(address_width, width), \
+               "last_addr: BV(%d);"%address_width, "last_data: BV(%d);"%width, "written: BV(1);", "", \
+               "INIT", "written = 0_1;", "", \
+               "TRANS", \
+               "(we = 1_1) -> ((next(mem) = mem[waddr := wdata]) & (next(last_addr) = waddr) & " \
+               "(next(last_data) = wdata) & (next(written) = 1_1));", \
+               "(we = 0_1) -> ((next(mem) = mem) & (next(last_addr) = last_addr) & " \
+               "(next(last_data) = last_data) & (next(written) = written));"]
+        model.add_file("memory.sts", NL.join(sts) + NL)
+    else:
+        btor = Btor2Writer()
+        sort = btor.array(address_width, width)
+        (we, waddr, wdata) = (btor.op("input", 1, "we"), btor.op("input", address_width, "waddr"), \
+                              btor.op("input", width, "wdata"))
+        mem = btor.node("state", sort, "mem")
+        (last_addr, last_data, written) = (btor.op("state", address_width, "last_addr"), \
+                                           btor.op("state", width, "last_data"), btor.op("state", 1, "written"))
+        btor.op("init", 1, written, btor.op("zero", 1))
+        btor.node("next", sort, mem, btor.node("ite", sort, we, btor.node("write", sort, mem, waddr, wdata), mem))
+        btor.op("next", address_width, last_addr, btor.op("ite", address_width, we, waddr, last_addr))
+        btor.op("next", width, last_data, btor.op("ite", width, we, wdata, last_data))
+        btor.op("next", 1, written, btor.op("ite", 1, we, btor.op("one", 1), written))
+        model.add_file("memory.btor", btor.content())
+
+    model.add_problem("readback", verification="safety", properties="(written = 1_1) -> (mem[last_addr] = last_data)", \
+                      bmc_length=5, prove="True", expected="True")
+    return model
+
+def clocks(domains, width=8):
+    '''
+    Counters in independent clock domains, each one with a property on the
+    reachability of one of its values
+    '''
+
+    sts = ["VAR"]
+    sts += ["clk_%d: BV(1);"%i for i in range(domains)]
+    sts += ["", "STATE"]
+    sts += ["cnt_%d: BV(%d);"%(i, width) for i in range(domains)]
+    sts += ["", "INIT"]
+    sts += ["cnt_%d = %s;"%(i, bv(0, width)) for i in range(domains)]
+    sts += ["", "TRANS"]
+    for i in range(domains):
+        sts += ["posedge(clk_%d) -> (next(cnt_%d) = (cnt_%d + %s));"%(i, i, i, bv(1, width)), \
+                "!(posedge(clk_%d)) -> (next(cnt_%d) = cnt_%d);"%(i, i, i)]
+
+    model = SyntheticModel("clocks_%d"%domains)
+    model.add_file("clocks.sts", NL.join(sts) + NL)
+    for i in range(domains):
+        target = (i%3)+1
+        model.add_problem("domain_%d"%i, verification="safety", properties="!(cnt_%d = %s)"%(i, bv(target, width)), \
+                          bmc_length=2*target, expected="False")
+    return model
+
+def explicit(states):
+    '''
+    Explicit transition system, made of a ring of states
+    '''
+
+    width = max(1, (states-1).bit_length())
+    ets = ["I: state = %s"%bv(0, width)]
+    ets += ["S%d: state = %s"%(i, bv(i, width)) for i in range(1, states)]
+    ets += [""]
+    ets += ["%s -> S%d"%("I" if i == 1 else "S%d"%(i-1), i) for i in range(1, states)]
+    ets += ["S%d -> I"%(states-1) if states > 1 else "I -> I"]
+
+    model = SyntheticModel("explicit_%d"%states)
+    model.add_file("ring.ets", NL.join(ets) + NL)
+    model.add_problem("last", verification="safety", properties="!(state = %s)"%bv(states-1, width), \
+                      bmc_length=states, expected="False")
+    return model
+
+FAMILIES = {"counter": counter, \
+            "chain": chain, \
+            "fifo": fifo, \
+            "pipeline": pipeline, \
+            "datapath": datapath, \
+            "memory": memory, \
+            "clocks": clocks, \
+            "explicit": explicit}
+
+def knobs(family):
+    '''
+    Returns the knobs of the family, with their default values
+    '''
+
+    parameters = list(inspect.signature(FAMILIES[family]).parameters.values())[1:]
+    return dict([(p.name, p.default) for p in parameters])
+
+def generate(family, size, **family_knobs):
+    '''
+    Generates the model of the family with the given size and knobs
+    '''
+
+    if family not in FAMILIES:
+        Logger.error("Unknown model family \"%s\", use one of %s"%(family, ", ".join(sorted(FAMILIES))))
+
+    defaults = knobs(family)
+    unknown = set(family_knobs) - set(defaults)
+    if unknown:
+        Logger.error("Unknown knobs %s of the model family \"%s\", use %s"%(", ".join(sorted(unknown)), family, \
+                                                                            ", ".join(sorted(defaults))))
+
+    if family_knobs.get("format", STS) not in FORMATS:
+        Logger.error("Unknown format \"%s\", use one of %s"%(family_knobs["format"], ", ".join(FORMATS)))
+
+    model = FAMILIES[family](size, **family_knobs)
+    # the knobs that differ from the default ones are part of the name
+    for (knob, value) in sorted(family_knobs.items()):
+        if value != defaults[knob]:
+            model.name += "-%s_%s"%(knob, value)
+
+    return model
@@ -45,7 +45,8 @@ setup(name='CoSA',
       install_requires=["six","pyparsing","pysmt","coreir","hwtypes"],
       entry_points={
           'console_scripts': [
-              'CoSA = cosa.shell:main'
+              'CoSA = cosa.shell:main',
+              'cosa-bench = cosa.benchmark:main'
           ],
       },
       zip_safe=True)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+
+from cosa.benchmark import compare, synthetic_files, run_benchmark, OK
+
+def result(time, status=OK, results=None):
+    return {"status": status, "results": {"p": "TRUE"} if results is None else results, \
+            "time": time, "parse": 0.0, "encode": 0.0, "solve": 0.0, "peak_rss": 1000}
+
+def test_compare():
+    baseline = {"runs": {"a": result(1.0), "b": result(1.0), "c": result(1.0), "d": result(1.0)}}
+    results = {"a": result(1.1), "b": result(2.0), "c": result(1.0, results={"p": "FALSE"})}
+
+    regressions = dict(compare(results, baseline, 0.25, 0.1, 1024))
+    # a is within the tolerance
+    assert "a" not in regressions
+    assert regressions["b"].startswith("time")
+    assert regressions["c"] == "p is FALSE (was TRUE)"
+    assert regressions["d"] == "missing run"
+
+def test_synthetic_runs():
+    with tempfile.TemporaryDirectory() as workdir:
+        files = synthetic_files(["counter:4", "chain:3,5"], workdir)
+        assert [name for (name, _) in files] == ["synthetic/counter_4", "synthetic/chain_3", "synthetic/chain_5"]
+        assert all([os.path.isfile(problem_file) for (_, problem_file) in files])
+
+        measures = run_benchmark(files[0][1], "z3", "FWD", os.path.join(workdir, "profile.json"))
+        assert measures["status"] == OK
+        assert measures["results"] == {"reach_0": "FALSE", "bound_0": "TRUE"}
+        assert measures["solver_calls"] > 0
+        assert measures["parse"] > 0
+
+if __name__ == "__main__":
+    test_compare()
+    test_synthetic_runs()
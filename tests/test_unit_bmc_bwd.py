@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.analyzers.bmc_safety import BMCSafety
+from cosa.analyzers.mcsolver import VerificationStrategy
+from cosa.representation import HTS, TS
+from cosa.problem import VerificationStatus
+from pysmt.shortcuts import Symbol, BV, BVAdd, BVULE, EqualsOrIff, Not, Ite
+from pysmt.typing import BVType, BOOL
+
+class Config(object):
+    smt2_tracing = None
+    solver_name = "z3"
+    solver_options = {}
+    incremental = True
+    strategy = VerificationStrategy.BWD
+    skip_solving = False
+    prove = False
+    simplify = False
+    portfolio = None
+
+def counter():
+    (en, out) = (Symbol("en", BOOL), Symbol("out", BVType(4)))
+    ts = TS("counter")
+    ts.add_input_var(en)
+    ts.add_state_var(out)
+    ts.init = EqualsOrIff(out, BV(0, 4))
+    ts.trans = EqualsOrIff(TS.get_prime(out), Ite(en, BVAdd(out, BV(1, 4)), out))
+
+    hts = HTS("")
+    hts.add_ts(ts)
+    return (hts, out)
+
+def test_bwd_multi():
+    reset_env()
+    (hts, out) = counter()
+    props = [Not(EqualsOrIff(out, BV(3, 4))), BVULE(out, BV(9, 4)), \
+             Not(EqualsOrIff(TS.get_prime(out), BV(2, 4))), BVULE(out, BV(15, 4))]
+    depths = [3, 10, 2, None]
+
+    # the properties share a single backward unrolling
+    results = BMCSafety(hts, Config()).safety_multi(props, 12, 0)
+    for (prop, depth, (status, trace, t)) in zip(props, depths, results):
+        (single_status, single_trace, single_t) = BMCSafety(hts, Config()).safety(prop, 12, 0)
+        assert status == single_status
+        if depth is None:
+            assert status == VerificationStatus.UNK
+            continue
+
+        assert status == VerificationStatus.FALSE
+        assert t == single_t == depth
+        # the backward model is remapped into the forward trace
+        values = [trace.model.get_value(out, i) for i in range(t+1)]
+        assert values == [single_trace.model.get_value(out, i) for i in range(t+1)]
+        assert values == list(range(depth+1))
+
+def test_zigzag():
+    reset_env()
+    (hts, out) = counter()
+    props = [Not(EqualsOrIff(out, BV(3, 4))), BVULE(out, BV(9, 4)), Not(EqualsOrIff(out, BV(0, 4))), \
+             Not(EqualsOrIff(TS.get_prime(out), BV(2, 4))), BVULE(out, BV(15, 4))]
+    depths = [3, 10, 0, 2, None]
+
+    config = Config()
+    config.strategy = VerificationStrategy.ZZ
+    for (prop, depth) in zip(props, depths):
+        bmc = BMCSafety(hts, config)
+        (status, trace, t) = bmc.safety(prop, 12, 0)
+        if depth is None:
+            assert (status, t) == (VerificationStatus.UNK, 12)
+            continue
+
+        assert (status, t) == (VerificationStatus.FALSE, depth)
+        assert 0 <= bmc.zz_forward <= t
+        # the forward and backward parts are joined in a single trace
+        assert [trace.model.get_value(out, i) for i in range(t+1)] == list(range(depth+1))
+
+if __name__ == "__main__":
+    test_bwd_multi()
+    test_zigzag()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.encoders.btor2 import BTOR2Parser
+from cosa.representation import TS
+from pysmt.shortcuts import Symbol, BV, BVAdd, BVUGT, EqualsOrIff, Ite, Not, TRUE, simplify
+from pysmt.typing import BVType
+
+BTOR2 = """; counter with enable
+1 sort bitvec 1
+2 sort bitvec 8
+3 input 1 $en
+4 state 2 top:cnt
+5 zero 2
+6 init 2 4 5
+7 one 2
+8 add 2 4 7 top\\inc
+9 ite 2 -3 4 8
+10 next 2 4 9
+11 constd 2 12
+12 ugt 1 4 11
+13 bad 12
+"""
+
+def test_btor2_parser():
+    reset_env()
+    (hts, invar_props, ltl_props) = BTOR2Parser().parse_string(BTOR2)
+
+    # special characters are removed from the names
+    en = Symbol("en", BVType(1))
+    cnt = Symbol("top_c_cnt", BVType(8))
+    inc = Symbol("top.inc", BVType(8))
+    assert hts.input_vars == set([en])
+    assert hts.state_vars == set([cnt])
+    assert hts.vars == set([en, cnt, inc])
+
+    assert simplify(hts.single_init()) == EqualsOrIff(cnt, BV(0, 8))
+    assert simplify(hts.single_invar()) == EqualsOrIff(inc, BVAdd(cnt, BV(1, 8)))
+
+    # negated node identifiers are the complement of the node
+    not_en = Ite(EqualsOrIff(en, BV(1, 1)), BV(0, 1), BV(1, 1))
+    next_cnt = Ite(EqualsOrIff(not_en, BV(1, 1)), cnt, BVAdd(cnt, BV(1, 8)))
+    assert hts.single_ftrans() == {TS.get_prime(cnt): [(TRUE(), next_cnt)]}
+
+    assert len(ltl_props) == 0
+    assert invar_props == [("embedded_assertion_0", "Embedded assertion number 0", Not(BVUGT(cnt, BV(12, 8))))]
+
+if __name__ == "__main__":
+    test_btor2_parser()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.representation import HTS, TS
+from cosa.modifiers.coi import ConeOfInfluence
+from pysmt.shortcuts import Symbol, BV, EqualsOrIff, And, BVULT, TRUE
+from pysmt.typing import BVType
+from pysmt.rewritings import conjunctive_partition
+
+def test_coi():
+    reset_env()
+    (x, y, z, w) = [Symbol(n, BVType(4)) for n in ["x", "y", "z", "w"]]
+
+    ts = TS("chain")
+    for v in [x, y, z, w]:
+        ts.add_state_var(v)
+    ts.init = And([EqualsOrIff(v, BV(0, 4)) for v in [x, y, z, w]])
+    ts.trans = And([EqualsOrIff(TS.get_prime(x), y), EqualsOrIff(TS.get_prime(y), z), \
+                    EqualsOrIff(TS.get_prime(w), w)])
+    hts = HTS("chain")
+    hts.add_ts(ts)
+
+    coi = ConeOfInfluence()
+    coi_hts = coi.compute(hts, BVULT(x, BV(3, 4)))
+    assert coi_hts.vars == set([x, y, z])
+    assert EqualsOrIff(TS.get_prime(w), w) not in coi_hts.single_trans().args()
+
+    coi_hts = coi.compute(hts, BVULT(w, BV(3, 4)))
+    assert coi_hts.vars == set([w])
+    assert coi_hts.state_vars == set([w])
+
+    coi_hts = coi.compute(hts, BVULT(y, BV(3, 4)))
+    assert coi_hts.vars == set([x, y, z])
+
+    # the index is built once per system, and problems with the same cone
+    # share the reduced system
+    assert len(coi.indexes) == 1
+    assert coi.compute(hts, BVULT(z, BV(3, 4))) is coi_hts
+
+def test_coi_ftrans():
+    reset_env()
+    (out, port, cell, other) = [Symbol(n, BVType(4)) for n in ["out", "port", "cell", "other"]]
+
+    # the functional transition drives the output with the port of a module,
+    # hence the constraints of the port are in the cone of the output
+    ts = TS("module")
+    for v in [out, port, cell, other]:
+        ts.add_var(v)
+    ts.add_func_trans(out, [(TRUE(), port)])
+    ts.invar = And(EqualsOrIff(port, cell), EqualsOrIff(other, BV(1, 4)))
+    hts = HTS("module")
+    hts.add_ts(ts)
+
+    coi_hts = ConeOfInfluence().compute(hts, BVULT(out, BV(3, 4)))
+    assert coi_hts.vars == set([out, port, cell])
+    assert EqualsOrIff(out, port) in conjunctive_partition(coi_hts.single_invar())
+
+def test_coi_driven_submodule():
+    reset_env()
+    (a, b, sub_in, sub_out) = [Symbol(n, BVType(4)) for n in ["a", "b", "sub.in", "sub.out"]]
+
+    # the input of the submodule is driven by a, but nothing depends on the
+    # submodule, hence it is not in the cone of a
+    ts = TS("top")
+    for v in [a, b, sub_in, sub_out]:
+        ts.add_var(v)
+    ts.add_func_trans(sub_in, [(TRUE(), a)])
+    ts.add_func_trans(sub_out, [(EqualsOrIff(sub_in, BV(0, 4)), b), (TRUE(), sub_in)])
+    ts.invar = EqualsOrIff(b, BV(1, 4))
+    hts = HTS("top")
+    hts.add_ts(ts)
+
+    coi_hts = ConeOfInfluence().compute(hts, BVULT(a, BV(3, 4)))
+    assert coi_hts.vars == set([a])
+    assert coi_hts.single_invar().simplify().is_true()
+    assert coi_hts.single_trans().simplify().is_true()
+
+    # the submodule is in the cone of its output, and the constraints of
+    # its output are in the cone of its driver
+    assert ConeOfInfluence().compute(hts, BVULT(sub_out, BV(3, 4))).vars == set([a, b, sub_in, sub_out])
+    ts.invar = And(EqualsOrIff(b, BV(1, 4)), EqualsOrIff(sub_out, BV(2, 4)))
+    hts = HTS("top")
+    hts.add_ts(ts)
+    assert ConeOfInfluence().compute(hts, BVULT(a, BV(3, 4))).vars == set([a, b, sub_in, sub_out])
+
+if __name__ == "__main__":
+    test_coi()
+    test_coi_ftrans()
+    test_coi_driven_submodule()
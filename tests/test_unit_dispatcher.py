@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+import os
+import shutil
+import tempfile
+import time
+
+from cosa.environment import reset_env
+from cosa.analyzers import dispatcher
+from cosa.analyzers.bmc_safety import BMCSafety
+from cosa.options import cosa_option_manager
+from cosa.problem import ProblemsManager
+from cosa.shell import run_problems
+
+MODEL = """
+VAR
+out: BV(4);
+
+INIT
+out = 0_4;
+
+TRANS
+next(out) = (out + 1_4);
+"""
+
+PROBLEMS = """
+[GENERAL]
+model_files: counter.sts
+
+[DEFAULT]
+bmc_length: 8
+verification: safety
+
+[three]
+properties: !(out = 3_4)
+
+[five]
+properties: !(out = 5_4)
+
+[next_two]
+properties: !(next(out) = 2_4)
+
+[bound]
+properties: out < 12_4
+"""
+
+REDUCED_PROBLEMS = """
+[GENERAL]
+model_files: counters.sts
+
+[out]
+bmc_length: 12
+properties: out < 6_8
+verification: safety
+strategy: FWD
+"""
+
+def write_problems(workdir):
+    with open(os.path.join(workdir, "counter.sts"), "w") as f:
+        f.write(MODEL)
+    with open(os.path.join(workdir, "problem.txt"), "w") as f:
+        f.write(PROBLEMS)
+    return os.path.join(workdir, "problem.txt")
+
+def solve(problem_file, **options):
+    '''
+    Returns the status and the length of the traces of each problem, in
+    the order in which the results were stored
+    '''
+
+    reset_env()
+    problems_manager = cosa_option_manager.read_problem_file(problem_file, solver_name="z3", verbosity=0, **options)
+    cosa_option_manager._option_handling(problems_manager)
+    problems_manager.freeze()
+    run_problems(problems_manager)
+
+    results = []
+    for problem in problems_manager.problems:
+        traces = None
+        if problems_manager.has_problem_trace(problem):
+            traces = [trace.length for trace in problems_manager.get_problem_traces(problem)]
+        results.append((problem.name, str(problems_manager.get_problem_status(problem)), traces))
+    return results
+
+def test_multi_property():
+    calls = []
+    safety_multi = BMCSafety.safety_multi
+
+    def counted_safety_multi(self, props, k, k_min):
+        calls.append(len(props))
+        return safety_multi(self, props, k, k_min)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        problem_file = write_problems(workdir)
+
+        BMCSafety.safety_multi = counted_safety_multi
+        try:
+            for strategy in ["FWD", "BWD"]:
+                expected = solve(problem_file, strategy=strategy)
+                assert [(status, traces) for (_, status, traces) in expected] == \
+                    [("FALSE", [3]), ("FALSE", [5]), ("FALSE", [2]), ("UNKNOWN", None)]
+                assert calls == []
+
+                # the properties share a single unrolling, with the same
+                # results of solving each problem on its own
+                assert solve(problem_file, strategy=strategy, multi_property=True) == expected
+                assert calls == [4]
+                calls.pop()
+        finally:
+            BMCSafety.safety_multi = safety_multi
+
+def test_parallel_problems():
+    stored = []
+    safety = BMCSafety.safety
+    set_problem_status = ProblemsManager.set_problem_status
+    process_pool = dispatcher.ProcessPool
+
+    def slow_safety(self, prop, k, k_min, processes=1):
+        # the first problem completes last
+        if "3_4" in str(prop):
+            time.sleep(1)
+        return safety(self, prop, k, k_min, processes)
+
+    def failing_safety(self, prop, k, k_min, processes=1):
+        if "5_4" in str(prop):
+            raise ValueError("solver crashed")
+        return safety(self, prop, k, k_min, processes)
+
+    def recorded_set_problem_status(self, problem, status):
+        stored.append(problem.name)
+        return set_problem_status(self, problem, status)
+
+    def no_process_pool(processes):
+        assert False, "The problems should be solved sequentially"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        problem_file = write_problems(workdir)
+
+        ProblemsManager.set_problem_status = recorded_set_problem_status
+        try:
+            expected = solve(problem_file)
+            names = [name for (name, _, _) in expected]
+            assert stored == names
+
+            # the results are stored in the order of the problems
+            del stored[:]
+            BMCSafety.safety = slow_safety
+            assert solve(problem_file, parallel_problems=True, processes=4) == expected
+            assert stored == names
+
+            # a worker that raises makes the problem fail
+            BMCSafety.safety = failing_safety
+            try:
+                solve(problem_file, parallel_problems=True, processes=4)
+                assert False
+            except RuntimeError as e:
+                assert "five_0" in str(e)
+                assert "solver crashed" in str(e)
+
+            # assume_if_true requires the sequential solving
+            BMCSafety.safety = safety
+            dispatcher.ProcessPool = no_process_pool
+            del stored[:]
+            assert solve(problem_file, parallel_problems=True, assume_if_true=True, processes=4) == expected
+            assert stored == names
+        finally:
+            BMCSafety.safety = safety
+            ProblemsManager.set_problem_status = set_problem_status
+            dispatcher.ProcessPool = process_pool
+
+def test_reduced_traces():
+    counters = os.path.join(os.path.dirname(os.path.abspath(__file__)), "counters-sts", "counters.sts")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        shutil.copy(counters, workdir)
+        with open(os.path.join(workdir, "problem.txt"), "w") as f:
+            f.write(REDUCED_PROBLEMS)
+
+        traces = []
+        for reduce_model in [False, True]:
+            reset_env()
+            problems_manager = cosa_option_manager.read_problem_file(os.path.join(workdir, "problem.txt"), \
+                                                                     solver_name="z3", verbosity=0, \
+                                                                     reduce_model=reduce_model)
+            cosa_option_manager._option_handling(problems_manager)
+            problems_manager.freeze()
+            run_problems(problems_manager)
+            [problem] = problems_manager.problems
+            traces.append(str(problems_manager.get_problem_traces(problem)[0]))
+
+        # the merged signals (e.g., adder.out) are not shown by the reduced trace
+        assert "adder.out" not in traces[1]
+        assert traces[0] == traces[1]
+
+if __name__ == "__main__":
+    test_multi_property()
+    test_parallel_problems()
+    test_reduced_traces()
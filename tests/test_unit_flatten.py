@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.representation import HTS, TS
+from pysmt.rewritings import conjunctive_partition
+from pysmt.shortcuts import Symbol, BV, BVAdd, EqualsOrIff
+from pysmt.typing import BVType
+
+def leaf():
+    (a, o) = [Symbol("leaf.%s"%n, BVType(4)) for n in ["a", "o"]]
+    ts = TS("leaf")
+    ts.add_input_var(a)
+    ts.add_output_var(o)
+    ts.add_state_var(o)
+    ts.init = EqualsOrIff(o, BV(0, 4))
+    ts.trans = EqualsOrIff(TS.get_prime(o), BVAdd(o, a))
+
+    hts = HTS("leaf")
+    hts.add_ts(ts)
+    hts.add_param(a)
+    hts.add_param(o)
+    return hts
+
+def mid():
+    (a, t, o) = [Symbol("mid.%s"%n, BVType(4)) for n in ["a", "t", "o"]]
+    ts = TS("mid")
+    ts.add_input_var(a)
+    ts.add_var(t)
+    ts.add_output_var(o)
+
+    hts = HTS("mid")
+    hts.add_ts(ts)
+    hts.add_param(a)
+    hts.add_param(o)
+    hts.add_sub("l0", leaf(), (a, t))
+    hts.add_sub("l1", leaf(), (t, o))
+    return hts
+
+def top():
+    (i, j, x, y, z) = [Symbol(n, BVType(4)) for n in ["i", "j", "x", "y", "z"]]
+    ts = TS("top")
+    ts.add_input_var(i)
+    ts.add_input_var(j)
+    for v in [x, y, z]:
+        ts.add_var(v)
+
+    hts = HTS("")
+    hts.add_ts(ts)
+    hts.add_sub("m0", mid(), (i, x))
+    hts.add_sub("m1", mid(), (x, y))
+    hts.add_sub("m2", mid(), (j, z))
+    return hts
+
+def flattened(memoize):
+    hts = top()
+    hts.flatten(memoize=memoize)
+    conjuncts = lambda f: set([c for c in conjunctive_partition(f) if not c.is_true()])
+    return (hts.vars, hts.state_vars, hts.input_vars, hts.output_vars, \
+            conjuncts(hts.single_init()), conjuncts(hts.single_invar()), conjuncts(hts.single_trans()))
+
+def test_flatten_templates():
+    reset_env()
+    # the instantiation of the templates is equivalent to the recursive flattening
+    assert flattened(True) == flattened(False)
+
+    (vars, state_vars, _, _, init, _, _) = flattened(True)
+    names = set([v.symbol_name() for v in vars])
+    for path in ["m0.l0", "m0.l1", "m1.l0", "m1.l1", "m2.l0", "m2.l1"]:
+        assert "%s.o"%path in names
+        assert Symbol("%s.o"%path, BVType(4)) in state_vars
+        assert EqualsOrIff(Symbol("%s.o"%path, BVType(4)), BV(0, 4)) in init
+
+def test_flatten_cone():
+    reset_env()
+    hts = top()
+    cone = hts.flatten_cone([Symbol("y", BVType(4))])
+    names = set([v.symbol_name() for v in cone.vars])
+    # m2 is not connected to y
+    assert "m1.l1.o" in names
+    assert "m0.l0.o" in names
+    assert len([n for n in names if n.startswith("m2.")]) == 0
+
+    # the system is not modified, and can be flattened again
+    hts.flatten()
+    assert "m2.l0.o" in set([v.symbol_name() for v in hts.vars])
+    assert "m2.l0.o" not in names
+
+if __name__ == "__main__":
+    test_flatten_templates()
+    test_flatten_cone()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+import pickle
+
+from cosa.environment import reset_env
+from cosa.utils.formula_mngm import substitute, get_free_variables, formula_caches, to_portable, from_portable, \
+    concrete_eval, ItePruner, mem_access
+from pysmt.shortcuts import Symbol, BV, BVAdd, BVExtract, BVSub, BVSLT, BVULT, EqualsOrIff, And, Array, Store, TRUE, FALSE, Ite
+from pysmt.typing import BVType, ArrayType
+
+def test_substitute():
+    reset_env()
+    x = Symbol("x", BVType(4))
+    y = Symbol("y", BVType(4))
+    f = And(EqualsOrIff(x, BVAdd(y, BV(1, 4))), EqualsOrIff(y, BV(2, 4)))
+
+    smap = {"x":"x@1", "y":"y@1"}
+    x1 = Symbol("x@1", BVType(4))
+    y1 = Symbol("y@1", BVType(4))
+    f1 = substitute(f, smap)
+    assert f1 == And(EqualsOrIff(x1, BVAdd(y1, BV(1, 4))), EqualsOrIff(y1, BV(2, 4)))
+    # the walker (and its memoization) is reused for the same map
+    assert substitute(f.arg(1), smap) == f1.arg(1)
+    assert len(formula_caches.walkers) == 1
+
+def test_free_variables():
+    reset_env()
+    x = Symbol("x", BVType(4))
+    y = Symbol("y", BVType(4))
+    f = EqualsOrIff(x, BVAdd(y, BV(1, 4)))
+
+    fv = get_free_variables(f)
+    assert fv == frozenset([x, y])
+    assert get_free_variables(f) is fv
+
+    reset_env()
+    assert len(formula_caches.free_variables) == 0
+
+def test_portable():
+    reset_env()
+    x = Symbol("x", BVType(4))
+    arr = Symbol("arr", ArrayType(BVType(4), BVType(4)))
+    formulae = [x, BV(3, 4), EqualsOrIff(x, BVAdd(x, BV(1, 4))), Store(arr, x, BV(2, 4)),
+                Array(BVType(4), BV(0, 4), {BV(1, 4):BV(2, 4)})]
+
+    for f in formulae:
+        assert from_portable(pickle.loads(pickle.dumps(to_portable(f)))) is f
+
+def test_concrete_eval():
+    reset_env()
+    i = Symbol("i", BVType(8))
+    n = Symbol("n", BVType(8))
+    values = {i: BV(255, 8)}
+
+    assert concrete_eval(BVAdd(i, BV(1, 8)), values) == BV(0, 8)
+    assert concrete_eval(BVSub(BV(0, 8), i), values) == BV(1, 8)
+    assert concrete_eval(BVULT(i, BV(16, 8)), values) == FALSE()
+    assert concrete_eval(BVSLT(i, BV(16, 8)), values) == TRUE()
+    # not constant
+    assert concrete_eval(BVULT(i, n), values) is None
+
+def test_ite_pruner():
+    reset_env()
+    i = Symbol("i", BVType(4))
+    n = Symbol("n", BVType(4))
+    mem = [Symbol("mem_%d"%idx, BVType(8)) for idx in range(16)]
+    pruner = ItePruner()
+
+    access = mem_access(i, mem, 4)
+    for idx in range(16):
+        assert pruner.prune(access, {i: BV(idx, 4)}) == mem[idx]
+
+    # the branches that depend on other variables are kept
+    f = Ite(BVULT(n, i), access, mem[0])
+    assert pruner.prune(f, {i: BV(3, 4)}) == Ite(BVULT(n, i), mem[3], mem[0])
+    assert pruner.prune(access, {n: BV(3, 4)}) is access
+
+    # the other operators are rebuilt on the pruned arguments
+    f = BVAdd(BVExtract(Ite(EqualsOrIff(i, BV(1, 4)), mem[1], mem[2]), 0, 3), n)
+    assert pruner.prune(f, {i: BV(1, 4)}) == BVAdd(BVExtract(mem[1], 0, 3), n)
+
+if __name__ == "__main__":
+    test_substitute()
+    test_free_variables()
+    test_portable()
+    test_concrete_eval()
+    test_ite_pruner()
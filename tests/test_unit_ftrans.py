@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.representation import TS, FTransCompiler, FTRANS_AUTO, FTRANS_IMPLIES, FTRANS_ITE
+from pysmt.rewritings import conjunctive_partition
+from pysmt.shortcuts import Symbol, BV, BVAdd, EqualsOrIff, And, Not, Iff, TRUE, is_valid
+from pysmt.typing import BVType, BOOL
+
+def system():
+    (s, x, y, z) = [Symbol(n, BVType(4)) for n in ["s", "x", "y", "z"]]
+    (en, rst) = [Symbol(n, BOOL) for n in ["en", "rst"]]
+
+    ts = TS("ftrans")
+    ts.add_state_var(x)
+    ts.add_state_var(y)
+    ts.add_state_var(z)
+    # case statement on s
+    ts.add_func_trans(TS.get_prime(x), [(EqualsOrIff(s, BV(i, 4)), BV(i+1, 4)) for i in range(4)])
+    # if/else chain
+    ts.add_func_trans(TS.get_prime(y), [(rst, BV(0, 4)), (And(Not(rst), en), BVAdd(y, BV(1, 4)))])
+    # overlapping conditions
+    ts.add_func_trans(TS.get_prime(z), [(rst, BV(0, 4)), (en, x)])
+    # combinational definition
+    ts.add_func_trans(s, [(TRUE(), BVAdd(x, y))])
+    return ts
+
+def size(formula):
+    return len(formula.get_atoms()) + len(list(conjunctive_partition(formula)))
+
+def test_ftrans_encodings():
+    reset_env()
+    ts = system()
+
+    (a_invar, a_trans) = ts.compile_ftrans(FTRANS_AUTO)
+    (i_invar, i_trans) = ts.compile_ftrans(FTRANS_IMPLIES)
+
+    # the auto encoding is equivalent to the implications, and smaller
+    assert is_valid(Iff(And(a_invar, a_trans), And(i_invar, i_trans)))
+    assert size(a_trans) < size(i_trans)
+    assert a_invar == EqualsOrIff(Symbol("s", BVType(4)), BVAdd(Symbol("x", BVType(4)), Symbol("y", BVType(4))))
+
+    # the priority encoding differs only on the overlapping conditions
+    ts.ftrans.pop(TS.get_prime(Symbol("z", BVType(4))))
+    (p_invar, p_trans) = ts.compile_ftrans(FTRANS_ITE)
+    (i_invar, i_trans) = ts.compile_ftrans(FTRANS_IMPLIES)
+    assert is_valid(Iff(And(p_invar, p_trans), And(i_invar, i_trans)))
+
+def test_ftrans_exclusive():
+    reset_env()
+    s = Symbol("s", BVType(4))
+    (a, b) = [Symbol(n, BOOL) for n in ["a", "b"]]
+    compiler = FTransCompiler()
+
+    exclusive = lambda conditions: compiler._exclusive([(c, None) for c in conditions])
+    assert exclusive([EqualsOrIff(s, BV(0, 4)), EqualsOrIff(s, BV(1, 4))])
+    assert exclusive([a, And(Not(a), b), And(Not(a), Not(b))])
+    assert not exclusive([a, b])
+    assert not exclusive([TRUE(), a])
+
+if __name__ == "__main__":
+    test_ftrans_encodings()
+    test_ftrans_exclusive()
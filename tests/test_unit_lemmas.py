@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.analyzers.bmc_safety import BMCSafety
+from cosa.analyzers.mcsolver import VerificationStrategy
+from cosa.representation import HTS, TS
+from cosa.problem import VerificationStatus
+from pysmt.shortcuts import Symbol, BV, BVAdd, BVULE, BVUGE, EqualsOrIff, Not, Ite, And
+from pysmt.typing import BVType, BOOL
+
+class Config(object):
+    smt2_tracing = None
+    solver_name = "z3"
+    solver_options = {}
+    incremental = True
+    strategy = VerificationStrategy.FWD
+    skip_solving = False
+    prove = False
+    simplify = False
+    portfolio = None
+
+def counter():
+    # counter from 0 to 5
+    (en, out) = (Symbol("en", BOOL), Symbol("out", BVType(4)))
+    ts = TS("counter")
+    ts.add_input_var(en)
+    ts.add_state_var(out)
+    ts.init = EqualsOrIff(out, BV(0, 4))
+    ts.trans = EqualsOrIff(TS.get_prime(out), Ite(EqualsOrIff(out, BV(5, 4)), BV(0, 4), \
+                                                  Ite(en, BVAdd(out, BV(1, 4)), out)))
+    hts = HTS("")
+    hts.add_ts(ts)
+    return (hts, out)
+
+def test_houdini():
+    for processes in [1, 2]:
+        reset_env()
+        (hts, out) = counter()
+        # out != 7 is only inductive together with out <= 5
+        lemmas = [BVULE(out, BV(9, 4)), BVUGE(out, BV(1, 4)), Not(EqualsOrIff(out, BV(7, 4))), \
+                  BVULE(out, BV(3, 4)), BVULE(out, BV(5, 4)), EqualsOrIff(out, BV(0, 4))]
+
+        bmc = BMCSafety(hts, Config())
+        bmc._init_at_time(hts.vars, 1)
+        invar = hts.single_invar()
+        init = And(hts.single_init(), invar)
+        trans = And(invar, hts.single_trans(), TS.to_next(invar))
+        assert sorted(bmc._houdini(init, trans, lemmas, processes)) == [0, 2, 4]
+
+        # the lemmas that hold are sufficient for the property
+        (hts, out) = counter()
+        for lemma in lemmas:
+            hts.add_lemma(lemma)
+        assert BMCSafety(hts, Config()).safety(Not(EqualsOrIff(out, BV(8, 4))), 5, 0, processes=processes) == \
+            (VerificationStatus.TRUE, None, 0)
+
+if __name__ == "__main__":
+    test_houdini()
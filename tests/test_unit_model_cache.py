@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+import tempfile
+from collections import namedtuple
+
+from cosa.environment import reset_env
+from cosa.representation import HTS, TS
+from cosa.utils.model_cache import ModelCache
+from pysmt.shortcuts import Symbol, BV, BVAdd, EqualsOrIff, get_env
+from pysmt.typing import BVType
+
+Config = namedtuple("Config", ["abstract_clock", "add_clock"])
+
+def build_model():
+    x = Symbol("x", BVType(4))
+    y = Symbol("y", BVType(4))
+    ts = TS("counter")
+    ts.add_state_var(x)
+    ts.add_var(y)
+    ts.init = EqualsOrIff(x, BV(0, 4))
+    ts.trans = EqualsOrIff(TS.get_prime(x), BVAdd(x, y))
+    ts.invar = EqualsOrIff(y, BV(1, 4))
+
+    hts = HTS("model")
+    hts.add_ts(ts)
+    return (hts, [("p", "desc", EqualsOrIff(x, BV(3, 4)))])
+
+def test_model_cache():
+    reset_env()
+    with tempfile.TemporaryDirectory() as cachedir:
+        (hts, props) = build_model()
+        trans = hts.single_trans().serialize()
+        invar = hts.single_invar().serialize()
+
+        cache = ModelCache(cachedir)
+        key = ModelCache.key([], Config(False, False), None)
+        assert not cache.is_cached(key)
+        cache.store(key, (hts, props))
+        assert cache.is_cached(key)
+
+        # the formulae are rebuilt in the new environment
+        reset_env()
+        (hts, props) = cache.load(key)
+        x = Symbol("x", BVType(4))
+        assert props[0][2] == EqualsOrIff(x, BV(3, 4))
+        assert hts.vars == set([x, Symbol("y", BVType(4))])
+        assert hts.state_vars == set([x])
+        assert get_env().formula_manager.is_state_symbol(x)
+        hts.reset_formulae()
+        assert hts.single_trans().serialize() == trans
+        assert hts.single_invar().serialize() == invar
+
+        assert ModelCache.key([], Config(True, False), None) != key
+        assert cache.is_cached(key, clean=True) == False
+
+if __name__ == "__main__":
+    test_model_cache()
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 from cosa.environment import reset_env
 from cosa.encoders.formulae import StringParser
-from pysmt.shortcuts import Symbol, Array, get_env
+from cosa.representation import TS
+from cosa.utils.formula_mngm import formula_caches
+from pysmt.shortcuts import Symbol, Array, get_env, BVULT, BVAdd, EqualsOrIff
 from pysmt.typing import BVType, ArrayType
 
 def test_next():
@@ -22,7 +24,20 @@ def test_prev():
     [(_, f, _)] = parser.parse_formulae(["prev(arr)[idx]"])
     assert (f.args()[1] == idx)
 
+def test_to_next_and_prev():
+    reset_env()
+    (x, y) = [Symbol(n, BVType(4)) for n in ["x", "y"]]
+
+    assert TS.to_next(BVULT(x, y)) == BVULT(TS.get_prime(x), TS.get_prime(y))
+    assert TS.to_prev(TS.to_next(BVULT(x, y))) == BVULT(x, y)
+
+    # formulae with the same variables share the substitution map, and
+    # hence the substitution walker
+    walkers = len(formula_caches.walkers)
+    assert TS.to_next(EqualsOrIff(BVAdd(x, y), x)) == EqualsOrIff(BVAdd(TS.get_prime(x), TS.get_prime(y)), TS.get_prime(x))
+    assert len(formula_caches.walkers) == walkers
 
 if __name__ == "__main__":
     test_next()
     test_prev()
+    test_to_next_and_prev()
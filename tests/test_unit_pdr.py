@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.analyzers.bmc_safety import BMCSafety
+from cosa.analyzers.mcsolver import VerificationStrategy
+from cosa.analyzers.pdr import PDR
+from cosa.representation import HTS, TS
+from pysmt.shortcuts import Symbol, And, Not, Iff
+from pysmt.typing import BOOL
+
+class Config(object):
+    smt2_tracing = None
+    solver_name = "z3"
+    solver_options = {}
+    incremental = True
+    strategy = VerificationStrategy.PDR
+    skip_solving = False
+    prove = True
+    simplify = False
+    portfolio = None
+
+def test_boolean_generalization():
+    reset_env()
+    (a, b, c, d) = [Symbol(n, BOOL) for n in ["a", "b", "c", "d"]]
+    ts = TS("bools")
+    for v in [a, b, c, d]:
+        ts.add_state_var(v)
+    ts.init = And([Not(v) for v in [a, b, c, d]])
+    ts.trans = And(Iff(TS.get_prime(a), a), Iff(TS.get_prime(b), Not(b)), \
+                   Iff(TS.get_prime(c), c), Iff(TS.get_prime(d), d))
+    hts = HTS("")
+    hts.add_ts(ts)
+
+    bmc = BMCSafety(hts, Config())
+    bmc._init_at_time(hts.vars, 5)
+    pdr = PDR(bmc, hts)
+    (_, res) = pdr.solve(Not(a), 5)
+    assert res == True
+
+    # the cubes over Boolean state are generalized to the literal of a
+    cubes = [cube for frame in pdr.frames for cube in frame]
+    assert len(cubes) > 0
+    assert all([len(cube) == 1 for cube in cubes])
+
+if __name__ == "__main__":
+    test_boolean_generalization()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import time
+
+from cosa.analyzers.portfolio import Portfolio
+
+def result(value, delay=0):
+    time.sleep(delay)
+    return value
+
+def touch_after(filename, delay):
+    time.sleep(delay)
+    with open(filename, "w") as f:
+        f.write("done")
+    return "slow"
+
+def die():
+    # the worker exits without sending its result
+    os._exit(1)
+
+def fail():
+    raise ValueError("failed")
+
+def test_portfolio_cancel():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        marker = os.path.join(tmpdir, "slow")
+
+        portfolio = Portfolio()
+        portfolio.add_task("slow", touch_after, marker, 2)
+        portfolio.add_task("unknown", result, "unknown")
+        portfolio.add_task("fast", result, "true", 0.5)
+
+        start = time.time()
+        results = portfolio.run(lambda r: r == "true")
+        # the inconclusive results collected before the conclusive one are
+        # returned in order of completion
+        assert results == [("unknown", "unknown"), ("fast", "true")]
+        assert time.time()-start < 2
+        assert portfolio.workers == {}
+
+        # the losing strategy was cancelled before completing
+        time.sleep(2.5)
+        assert not os.path.exists(marker)
+
+def test_portfolio_dead_worker():
+    portfolio = Portfolio()
+    portfolio.add_task("dead", die)
+    portfolio.add_task("error", fail)
+    portfolio.add_task("slow", result, "true", 0.5)
+
+    # the dead and the failing workers do not stop the others
+    assert portfolio.run(lambda r: r == "true") == [("slow", "true")]
+
+    portfolio = Portfolio()
+    portfolio.add_task("dead", die)
+    assert portfolio.run(lambda r: True) == []
+
+    try:
+        portfolio.add_task("dead", die)
+        assert False
+    except RuntimeError:
+        pass
+
+if __name__ == "__main__":
+    test_portfolio_cancel()
+    test_portfolio_dead_worker()
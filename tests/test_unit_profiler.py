@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import json
+import os
+import tempfile
+
+from cosa.environment import reset_env
+from cosa.utils.profiler import Profiler, PARSING, SOLVING, UNROLLING, SOLVER_CALLS, PUSH_DEPTH, GLOBAL, dag_size
+from pysmt.shortcuts import Symbol, And, Or, Not
+from pysmt.typing import BOOL
+
+def test_profiler():
+    Profiler.reset(enabled=True)
+    with Profiler.span(PARSING):
+        pass
+
+    previous = Profiler.set_problem("p1")
+    assert previous == GLOBAL
+    for i in range(3):
+        with Profiler.span(SOLVING):
+            Profiler.count(SOLVER_CALLS)
+            Profiler.maximum(PUSH_DEPTH, i)
+        for _ in range(100):
+            with Profiler.total(UNROLLING):
+                pass
+    Profiler.set_problem(previous)
+    # the totals are not recorded as spans
+    assert len(Profiler.spans) == 4
+
+    # the measures of a worker are merged in the parent
+    Profiler.set_problem("p2")
+    Profiler.count(SOLVER_CALLS, 2)
+    with Profiler.total(UNROLLING):
+        pass
+    measures = Profiler.take()
+    Profiler.set_problem(GLOBAL)
+    Profiler.merge(measures)
+
+    report = Profiler.report()
+    problems = report["problems"]
+    assert problems[GLOBAL]["spans"][PARSING]["calls"] == 1
+    assert problems["p1"]["spans"][SOLVING]["calls"] == 3
+    assert problems["p1"]["counters"][SOLVER_CALLS] == 3
+    assert problems["p1"]["maxima"][PUSH_DEPTH] == 2
+    assert problems["p2"]["counters"][SOLVER_CALLS] == 2
+    assert problems["p1"]["spans"][UNROLLING]["calls"] == 300
+    assert problems["p2"]["spans"][UNROLLING]["calls"] == 1
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "profile.json")
+        Profiler.write(path)
+        with open(path) as f:
+            assert json.load(f)["problems"]["p1"]["counters"] == {SOLVER_CALLS: 3}
+
+        path = os.path.join(tmpdir, "profile.trace")
+        Profiler.write(path, "chrome")
+        with open(path) as f:
+            events = json.load(f)["traceEvents"]
+        assert len([e for e in events if (e["ph"] == "X") and (e["name"] == SOLVING)]) == 3
+
+    # no measures are collected when the profiler is disabled
+    Profiler.reset()
+    with Profiler.span(PARSING):
+        Profiler.count(SOLVER_CALLS)
+    with Profiler.total(UNROLLING):
+        pass
+    assert (Profiler.spans, Profiler.totals, Profiler.counters) == ([], {}, {})
+
+def test_dag_size():
+    reset_env()
+    (a, b) = [Symbol(n, BOOL) for n in ["a", "b"]]
+    shared = Or(a, b)
+    assert dag_size(And(shared, Not(shared))) == 5
+
+if __name__ == "__main__":
+    test_profiler()
+    test_dag_size()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.representation import HTS, TS
+from cosa.modifiers.reduction import ModelReducer
+from cosa.problem import TraceModel
+from pysmt.shortcuts import Symbol, BV, BVAdd, EqualsOrIff, And, BVULT, Ite, TRUE
+from pysmt.typing import BVType, BOOL
+
+def test_reduction():
+    reset_env()
+    (cnt, tied, a, b, w, dead) = [Symbol(n, BVType(4)) for n in ["cnt", "tied", "a", "b", "w", "dead"]]
+    en = Symbol("en", BOOL)
+
+    ts = TS("model")
+    for v in [cnt, tied, a, b, dead]:
+        ts.add_state_var(v)
+    ts.add_input_var(en)
+    ts.add_var(w)
+    ts.init = And([EqualsOrIff(v, BV(0, 4)) for v in [cnt, tied, a, b, dead]])
+    ts.trans = And([EqualsOrIff(TS.get_prime(cnt), Ite(en, BVAdd(cnt, w), cnt)), \
+                    # tied-off register
+                    EqualsOrIff(TS.get_prime(tied), Ite(en, tied, BV(0, 4))), \
+                    # equivalent registers
+                    EqualsOrIff(TS.get_prime(a), BVAdd(a, cnt)), \
+                    EqualsOrIff(TS.get_prime(b), BVAdd(b, cnt)), \
+                    # register that is not observed
+                    EqualsOrIff(TS.get_prime(dead), BVAdd(dead, b))])
+    ts.invar = EqualsOrIff(w, BVAdd(tied, BV(1, 4)))
+    hts = HTS("model")
+    hts.add_ts(ts)
+
+    prop = BVULT(BVAdd(cnt, b), BV(10, 4))
+    (rhts, reduction) = ModelReducer().reduce(hts, [prop])
+    assert rhts.vars == set([cnt, a, en])
+    assert reduction.substitution[tied] == BV(0, 4)
+    assert reduction.substitution[w] == BV(1, 4)
+    assert reduction.substitution[b] == a
+    assert [d[0] for d in reduction.definitions] == [dead, dead]
+
+    assert reduction.apply(prop) == BVULT(BVAdd(cnt, a), BV(10, 4))
+
+    # the values of the eliminated signals are recovered in the traces
+    model = TraceModel(2)
+    for t in range(3):
+        model.set(cnt, t, BV(t, 4))
+        model.set(a, t, BV([0, 0, 1][t], 4))
+        model.set(en, t, TRUE())
+    reduction.extend_model(model, 2)
+    assert model.get(tied, 2) == BV(0, 4)
+    assert model.get(w, 1) == BV(1, 4)
+    assert model.get(b, 2) == BV(1, 4)
+    assert model.get(dead, 2) == BV(0, 4)
+
+    # the model is extended only on the visible signals
+    model = TraceModel(2)
+    for t in range(3):
+        model.set(cnt, t, BV(t, 4))
+        model.set(a, t, BV([0, 0, 1][t], 4))
+        model.set(en, t, TRUE())
+    reduction.extend_model(model, 2, set([cnt, a, en, dead]))
+    assert model.get(b, 2) is None
+    assert model.get(w, 1) is None
+    # the hidden signals are still used to compute the visible ones
+    assert model.get(dead, 2) == BV(0, 4)
+
+if __name__ == "__main__":
+    test_reduction()
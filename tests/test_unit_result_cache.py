@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from cosa.utils.result_cache import ResultCache
+
+Config = namedtuple("Config", ["abstract_clock", "vcd", "init"])
+Problem = namedtuple("Problem", ["name", "idx", "properties", "bmc_length"])
+
+def test_result_cache():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tmpdir = Path(tmpdir)
+        cache = ResultCache(tmpdir / "results", ["model"], Config(False, False, None), tmpdir)
+
+        problem = Problem("p", 0, "x < 2", 10)
+        key = cache.key(problem)
+        # name and index do not change the result
+        assert cache.key(Problem("q", 1, "x < 2", 10)) == key
+        assert cache.key(Problem("p", 0, "x < 2", 20)) != key
+        assert ResultCache(tmpdir / "results", ["other"], Config(False, False, None), tmpdir).key(problem) != key
+
+        # the content of the files referred by the options is part of the key
+        with (tmpdir / "prop.txt").open("w") as f:
+            f.write("x < 2")
+        file_key = cache.key(Problem("p", 0, "prop.txt", 10))
+        with (tmpdir / "prop.txt").open("w") as f:
+            f.write("x < 3")
+        assert cache.key(Problem("p", 0, "prop.txt", 10)) != file_key
+
+        # as well as the content of the init file (a Path)
+        with (tmpdir / "init.ssf").open("w") as f:
+            f.write("x = 0_4")
+        init_key = ResultCache(tmpdir / "results", ["model"], Config(False, False, Path("init.ssf")), tmpdir).key(problem)
+        with (tmpdir / "init.ssf").open("w") as f:
+            f.write("x = 1_4")
+        assert ResultCache(tmpdir / "results", ["model"], Config(False, False, Path("init.ssf")), tmpdir).key(problem) != init_key
+
+        assert not cache.is_cached(key)
+        cache.store(key, ("TRUE", None, None, 1.0))
+        assert cache.is_cached(key)
+        assert cache.load(key) == ("TRUE", None, None, 1.0)
+        assert not cache.is_cached(key, clean=True)
+
+if __name__ == "__main__":
+    test_result_cache()
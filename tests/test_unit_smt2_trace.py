@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import gzip
+import os
+import tempfile
+
+from cosa.environment import reset_env
+from cosa.analyzers.mcsolver import SMT2TraceWriter
+from pysmt.shortcuts import Symbol, BV, BVAdd, EqualsOrIff, And, BVULT
+from pysmt.typing import BVType
+import z3
+
+def test_smt2_trace_writer():
+    reset_env()
+    x = Symbol("x", BVType(4))
+    y = Symbol("y", BVType(4))
+    xy = BVAdd(x, y)
+    f = And(EqualsOrIff(xy, BV(1, 4)), BVULT(xy, y))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for filename in ["trace.smt2", "trace.smt2.gz"]:
+            filename = os.path.join(tmpdir, filename)
+            writer = SMT2TraceWriter(filename)
+            writer.reset("QF_BV")
+            writer.push()
+            writer.add_assertion(f)
+            writer.check_sat()
+            writer.pop()
+            # the declarations and definitions of the popped scope are repeated
+            writer.add_assertion(EqualsOrIff(xy, y))
+            writer.close()
+
+            with (gzip.open(filename, "rt") if filename.endswith(".gz") else open(filename)) as trace:
+                lines = trace.read().split("\n")
+
+            assert lines[0] == "(set-logic QF_BV)"
+            assert lines.count("(declare-fun x () (_ BitVec 4))") == 2
+            definitions = [l for l in lines if l.startswith("(define-fun")]
+            assert len(definitions) == 1
+            assert definitions[0].endswith("(_ BitVec 4) (bvadd x y))")
+            assert "(assert (bvult __def2 y))" in lines
+            assert "(assert (= (bvadd x y) y))" in lines
+
+def test_smt2_trace_reset():
+    reset_env()
+    x = Symbol("x", BVType(4))
+    y = Symbol("y", BVType(4))
+    xy = BVAdd(x, y)
+    f = And(EqualsOrIff(xy, BV(1, 4)), BVULT(xy, y))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "trace.smt2")
+        writer = SMT2TraceWriter(filename)
+        # each problem resets the trace, and the names of the previous
+        # problem are not used anymore
+        for _ in range(3):
+            writer.reset("QF_BV")
+            writer.add_assertion(f)
+            writer.check_sat()
+        writer.close()
+
+        with open(filename) as trace:
+            text = trace.read()
+
+        assert text.count("(define-fun") == 1
+        assert "sat" in z3.Z3_eval_smtlib2_string(z3.Context().ref(), text)
+
+if __name__ == "__main__":
+    test_smt2_trace_writer()
+    test_smt2_trace_reset()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+
+from cosa.benchmark import synthetic_files, run_benchmark, OK
+from cosa.utils.synthetic import generate, knobs, FAMILIES, BTOR
+
+def test_knobs():
+    assert knobs("pipeline") == {"width": 32, "format": "sts"}
+    assert generate("pipeline", 4).name == "pipeline_4"
+    # only the knobs that differ from the default ones are part of the name
+    assert generate("pipeline", 4, width=32, format=BTOR).name == "pipeline_4-format_btor"
+    assert generate("counter", 4, properties=3).problem_file().count("[reach") == 3
+
+    for (family, size, family_knobs) in [("wheel", 4, {}), ("counter", 4, {"depth": 2}), ("chain", 4, {"format": "v"})]:
+        try:
+            generate(family, size, **family_knobs)
+            assert False
+        except RuntimeError:
+            pass
+
+def test_families():
+    with tempfile.TemporaryDirectory() as workdir:
+        families = ["%s:3"%family for family in sorted(FAMILIES)] + \
+                   ["%s:3:format=btor"%family for family in sorted(FAMILIES) if "format" in knobs(family)]
+        files = synthetic_files(families, workdir)
+        assert "synthetic/memory_3-format_btor" in [name for (name, _) in files]
+
+        # each model is solved with the expected results
+        for (name, problem_file) in files:
+            measures = run_benchmark(problem_file, "z3", "FWD", os.path.join(workdir, "profile.json"))
+            assert measures["status"] == OK, name
+
+if __name__ == "__main__":
+    test_knobs()
+    test_families()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.representation import TS
+from cosa.problem import TraceModel
+from cosa.printers.trace import revise_abstract_clock, vcd_identifier, VCDTracePrinter
+from pysmt.shortcuts import Symbol, BV, TRUE, FALSE, Array, Store
+from pysmt.typing import BVType, BOOL, ArrayType
+from cosa.representation import HTS
+from six.moves import cStringIO
+
+def test_trace_model():
+    reset_env()
+    x = Symbol("x", BVType(8))
+    b = Symbol("b", BOOL)
+    w = Symbol("w", BVType(100))
+
+    model = {TS.get_timed(x, 0): BV(3, 8), TS.get_timed(x, 2): BV(255, 8), \
+             TS.get_timed(b, 1): TRUE(), TS.get_timed(w, 0): BV(2**99, 100), \
+             TS.get_timed(Symbol("other", BOOL), 0): FALSE()}
+    trace_model = TraceModel.from_model(model, [x, b, w], 2)
+
+    # only the given variables are stored
+    assert set(trace_model.variables()) == set([x, b, w])
+    assert trace_model.get_value(x, 2) == 255
+    assert trace_model.get_value(x, 1) is None
+    assert trace_model.get_value(b, 1) is True
+    assert trace_model.get(w, 0) == BV(2**99, 100)
+
+    # dictionary access on the timed variables
+    assert TS.get_timed(x, 0) in trace_model
+    assert TS.get_timed(x, 1) not in trace_model
+    assert trace_model[TS.get_timed(b, 1)] == TRUE()
+    assert len(trace_model) == 4
+
+    trace_model.set(x, 5, BV(1, 8))
+    assert trace_model.length == 5
+    assert trace_model.get(x, 5) == BV(1, 8)
+    assert TraceModel.convert(dict(trace_model.items()), 5).get(x, 5) == BV(1, 8)
+
+def test_abstract_clock():
+    reset_env()
+    clk = Symbol("clk", BVType(1))
+    x = Symbol("x", BVType(8))
+
+    trace_model = TraceModel(2)
+    for t in range(3):
+        trace_model.set(clk, t, BV(1, 1))
+        trace_model.set(x, t, BV(t, 8))
+
+    (model, length) = revise_abstract_clock(trace_model, [(clk, (BV(0, 1), BV(1, 1)))])
+    assert length == 4
+    assert [model.get_value(x, t) for t in range(5)] == [0, 1, 1, 2, 2]
+    assert [model.get_value(clk, t) for t in range(5)] == [0, 1, 0, 1, 0]
+
+def test_vcd_trace():
+    reset_env()
+    x = Symbol("x", BVType(8))
+    b = Symbol("b", BOOL)
+    mem = Symbol("mem", ArrayType(BVType(8), BVType(4)))
+
+    ts = TS("model")
+    for v in [x, b, mem]:
+        ts.add_state_var(v)
+    hts = HTS("model")
+    hts.add_ts(ts)
+
+    trace_model = TraceModel(2)
+    for t in range(3):
+        trace_model.set(x, t, BV(min(t, 1), 8))
+        trace_model.set(b, t, TRUE())
+        default = 0 if t < 2 else 1
+        trace_model.set(mem, t, Store(Array(BVType(8), BV(default, 4)), BV(3, 8), BV(t, 4)))
+
+    assert len(set([vcd_identifier(i) for i in range(100000)])) == 100000
+
+    printer = VCDTracePrinter()
+    printer.all_vars = True
+    stream = cStringIO()
+    printer.write_trace(stream, hts, trace_model, 2, lambda n: n)
+    vcd = stream.getvalue().split("\n")
+
+    # all the indices of the array are declared
+    codes = dict([(l.split()[4], l.split()[3]) for l in vcd if l.startswith("$var")])
+    assert len(codes) == 2 + 256
+    changes = vcd[vcd.index("#1"):]
+    # only the changed values are dumped
+    assert set(changes[1:3]) == set(["b00000001 %s"%codes["x[7:0]"], "b0001 %s"%codes["mem[3][3:0]"]])
+    # the change of the default value changes all the other indices
+    assert changes[3] == "#2"
+    assert changes[4+256:] == ["#3", ""]
+
+if __name__ == "__main__":
+    test_trace_model()
+    test_abstract_clock()
+    test_vcd_trace()
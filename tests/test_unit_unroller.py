@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+from cosa.environment import reset_env
+from cosa.analyzers.unroller import FrameUnroller
+from cosa.representation import TS
+from cosa.utils.formula_mngm import substitute
+from pysmt.shortcuts import Symbol, BV, BVAdd, EqualsOrIff, And, Ite, TRUE
+from pysmt.typing import BVType, BOOL
+
+def _timed_map(vars, t, backward=False):
+    timed = TS.get_ptimed_name if backward else TS.get_timed_name
+    (curr, nxt, prv) = (t+1, t, t+2) if backward else (t, t+1, t-1)
+    varmap = []
+    for v in vars:
+        name = v.symbol_name()
+        varmap.append((name, timed(name, curr)))
+        varmap.append((TS.get_prime_name(name), timed(name, nxt)))
+        varmap.append((TS.get_prev_name(name), timed(name, prv)))
+    return dict(varmap)
+
+def test_unroll():
+    reset_env()
+    x = Symbol("x", BVType(4))
+    y = Symbol("y", BVType(4))
+    en = Symbol("en", BOOL)
+    par = Symbol("par", BVType(4))
+    vars = [x, y, en]
+
+    trans = And(EqualsOrIff(TS.get_prime(x), Ite(en, BVAdd(x, BV(1, 4)), y)),
+                EqualsOrIff(y, BVAdd(TS.get_prev(x), par)))
+
+    unroller = FrameUnroller(vars)
+    for t in range(4):
+        assert unroller.at_time(trans, t) == substitute(trans, _timed_map(vars, t))
+        assert unroller.at_ptime(trans, t-1) == substitute(trans, _timed_map(vars, t-1, True))
+
+    assert unroller.at_time(x, 3) == TS.get_timed(x, 3)
+    assert unroller.at_time(par, 3) == par
+    assert unroller.at_time(TRUE(), 3) == TRUE()
+
+    # the backward frames are shifted into the forward ones
+    model = dict([(TS.get_ptimed(x, t), BV(t, 4)) for t in range(5)] + [(TS.get_timed(y, 1), BV(0, 4))])
+    remapped = unroller.remap_backward(model, 3)
+    assert remapped == dict([(TS.get_timed(x, t), BV(3-t, 4)) for t in range(4)])
+
+if __name__ == "__main__":
+    test_unroll()
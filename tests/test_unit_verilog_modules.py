@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+
+from cosa.environment import reset_env
+from cosa.encoders.verilog_hts import SpecVerilogParser, VerilogSTSWalker, ModuleEncodings
+from cosa.utils.model_cache import ModelCache
+from pysmt.rewritings import conjunctive_partition
+
+class Config(object):
+    abstract_clock = False
+    add_clock = False
+    symbolic_init = False
+    zero_init = False
+    no_clock = False
+
+SOURCE = """
+module inc(input clk, input [3:0] a, output reg [3:0] o);
+  always @(posedge clk) o <= a + %d;
+endmodule
+
+module dbl(input clk, input [3:0] a, output [3:0] o);
+  wire [3:0] t;
+  inc i0(.clk(clk), .a(a), .o(t));
+  inc i1(.clk(clk), .a(t), .o(o));
+endmodule
+
+module top(input clk, input [3:0] in, output [3:0] out);
+  wire [3:0] t;
+  dbl d0(.clk(clk), .a(in), .o(t));
+  dbl d1(.clk(clk), .a(t), .o(out));
+endmodule
+"""
+
+def encode(source, cachedir=None, processes=1):
+    reset_env()
+    ast = SpecVerilogParser().parse(source)
+    walker = VerilogSTSWalker()
+    walker.config = Config()
+    walker.encodings = ModuleEncodings(walker.modulesdic, None if cachedir is None else ModelCache(cachedir))
+    walker.processes = processes
+    hts = walker.walk(ast, "top")
+    hts.flatten()
+    return (hts, walker.encodings)
+
+def test_module_encodings():
+    (hts, encodings) = encode(SOURCE%1)
+    # each module is encoded once, and each instance has its own copy
+    assert len(encodings.encodings) == 2
+    names = set([v.symbol_name() for v in hts.vars])
+    for path in ["d0.i0", "d0.i1", "d1.i0", "d1.i1"]:
+        assert "%s.o"%path in names
+    trans = [f.serialize() for f in conjunctive_partition(hts.single_trans(include_ftrans=True))]
+    for path in ["d0.i0", "d0.i1", "d1.i0", "d1.i1"]:
+        assert len([f for f in trans if "%s.o__N"%path in f]) == 1
+
+    (phts, _) = encode(SOURCE%1, processes=2)
+    assert set([v.symbol_name() for v in phts.vars]) == names
+
+    with tempfile.TemporaryDirectory() as cachedir:
+        encode(SOURCE%1, cachedir)
+        assert len(os.listdir(cachedir)) == 2
+
+        # only the modified module (and the one instantiating it) is encoded again
+        encode(SOURCE%2, cachedir)
+        assert len(os.listdir(cachedir)) == 4
+
+        (chts, _) = encode(SOURCE%1, cachedir)
+        assert len(os.listdir(cachedir)) == 4
+        assert set([v.symbol_name() for v in chts.vars]) == names
+
+PART_SELECT = """
+module top(input clk, input [3:0] in, output reg [3:0] out);
+  always @(posedge clk) begin
+    out[1:0] <= in[1:0];
+    out[3:2] <= in[3:2];
+  end
+endmodule
+"""
+
+def test_part_select_assignment():
+    (hts, _) = encode(PART_SELECT)
+    assert set([v.symbol_name() for v in hts.vars]) == set(["clk", "in", "out"])
+
+if __name__ == "__main__":
+    test_module_encodings()
+    test_part_select_assignment()